@@ -1,25 +1,39 @@
 from Crypto.Cipher import AES
 from Crypto.Util.Padding import pad, unpad
+from functools import lru_cache
 import numpy as np
+from sbox_substitution import substitute_bytes_dynamic
 
 
-def generate_dynamic_sbox_butterfly():
+@lru_cache(maxsize=None)
+def butterfly_table():
     """
-    Generate a dynamic S-Box using a butterfly effect function.
+    The butterfly S-Box as a read-only uint8 array. It depends on no input, so it is
+    computed once and memoized.
     """
     sbox = list(range(256))
     for i in range(256):
         x = np.sin(i * np.pi / 256) * 256  # Chaos function
         idx = int(abs(x)) % 256
         sbox[i], sbox[idx] = sbox[idx], sbox[i]  # Swap positions
-    return sbox
+    table = np.array(sbox, dtype=np.uint8)
+    table.flags.writeable = False
+    return table
+
+
+def generate_dynamic_sbox_butterfly():
+    """
+    Generate a dynamic S-Box using a butterfly effect function.
+    """
+    return butterfly_table().tolist()
 
 
-def substitute_bytes_dynamic(block, sbox):
+def generate_dynamic_sboxes_butterfly(n):
     """
-    Perform substitution using the dynamic S-Box.
+    Return n butterfly S-Boxes as an [n, 256] uint8 array. Every row is the same
+    memoized table, so this is a zero-copy read-only view.
     """
-    return bytes([sbox[b] for b in block])
+    return np.broadcast_to(butterfly_table(), (n, 256))
 
 
 def aes_encrypt_dynamic(plaintext, key, dynamic_sbox):
@@ -4,6 +4,7 @@ import logging
 import time
 import argparse
 import sys
+import randomness_stats
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -12,6 +13,7 @@ def compare_encryption(plaintext, key):
     """
     Compare AES encryption using time-based and butterfly-based dynamic S-Boxes.
     Run the encryption 10 times and calculate average time.
+    For percentiles, size sweeps and stage breakdowns use Project/benchmark.py.
     """
     logging.info("Starting encryption comparison...")
 
@@ -21,16 +23,16 @@ def compare_encryption(plaintext, key):
     for _ in range(10):
         # Time-based dynamic S-Box
         sbox_time = time_aes.generate_dynamic_sbox_time()
-        start_time = time.time()  # Start time for encryption
+        start_time = time.perf_counter()  # Start time for encryption
         ciphertext_time = time_aes.aes_encrypt_dynamic(plaintext, key, sbox_time)
-        end_time = time.time()  # End time for encryption
+        end_time = time.perf_counter()  # End time for encryption
         time_based_times.append(end_time - start_time)
 
         # Butterfly effect-based dynamic S-Box
         sbox_butterfly = butterfly_aes.generate_dynamic_sbox_butterfly()
-        start_time = time.time()  # Start time for encryption
+        start_time = time.perf_counter()  # Start time for encryption
         ciphertext_butterfly = butterfly_aes.aes_encrypt_dynamic(plaintext, key, sbox_butterfly)
-        end_time = time.time()  # End time for encryption
+        end_time = time.perf_counter()  # End time for encryption
         butterfly_based_times.append(end_time - start_time)
 
     avg_time_based = sum(time_based_times) / 10
@@ -46,8 +48,9 @@ def compare_encryption(plaintext, key):
 
 def compare_entropy(ciphertext_hex):
     """
-    Compare entropy calculation for given ciphertext using both methods.
-    Run the entropy calculation 10 times and calculate average time.
+    Randomness statistics for the given ciphertext.
+    Both modules' calculate_entropy compute the same byte entropy, so it is computed
+    once; the statistics battery comes from randomness_stats (see its CLI for files).
     """
     logging.info("Starting entropy comparison...")
 
@@ -58,39 +61,46 @@ def compare_entropy(ciphertext_hex):
         print("Error: Invalid hex format.")
         return
 
-    time_based_times = []
-    butterfly_based_times = []
-
-    for _ in range(10):
-        # Calculate entropy for time-based method
-        start_time = time.time()  # Start time for entropy calculation
-        entropy_time = time_aes.calculate_entropy(ciphertext)
-        end_time = time.time()  # End time for entropy calculation
-        time_based_times.append(end_time - start_time)
-
-        # Calculate entropy for butterfly-based method
-        start_time = time.time()  # Start time for entropy calculation
-        entropy_butterfly = butterfly_aes.calculate_entropy(ciphertext)
-        end_time = time.time()  # End time for entropy calculation
-        butterfly_based_times.append(end_time - start_time)
-
-    avg_entropy_time = sum(time_based_times) / 10
-    avg_entropy_butterfly = sum(butterfly_based_times) / 10
+    start_time = time.perf_counter()
+    report = randomness_stats.StreamingStats().update(ciphertext).report()
+    elapsed = time.perf_counter() - start_time
 
     # Print results
     logging.info("\n[Entropy Comparison]")
     print(f"Ciphertext (Hex): {ciphertext_hex}")
-    print(f"Average Time-based Entropy: {entropy_time}")
-    print(f"Average Butterfly-based Entropy: {entropy_butterfly}")
-    print(f"Average Time-based Entropy Calculation Time: {avg_entropy_time:.5f} seconds")
-    print(f"Average Butterfly-based Entropy Calculation Time: {avg_entropy_butterfly:.5f} seconds")
+    print(f"Entropy: {report['entropy']:.5f} bits per byte")
+    print(f"Chi-square: {report['chi_square']['statistic']:.2f} (p={report['chi_square']['p_value']:.4f})")
+    print(f"Monobit p-value: {report['monobit']['p_value']:.4f}")
+    print(f"Runs p-value: {report['runs']['p_value']:.4f}")
+    print(f"Serial correlation: {report['serial_correlation']:.5f}")
+    print(f"Statistics Calculation Time: {elapsed:.5f} seconds")
+
+def compare_avalanche(key, trials=256):
+    """
+    Compare bit-level avalanche of both S-Box methods, each with one fixed S-Box.
+    Ideal block values are close to 0.5.
+    """
+    logging.info("Starting avalanche comparison...")
+    sbox_time = time_aes.generate_dynamic_sbox_time()
+    sbox_butterfly = butterfly_aes.generate_dynamic_sbox_butterfly()
+    results = {
+        'Time-based': randomness_stats.avalanche(
+            lambda data: time_aes.aes_encrypt_dynamic(data, key, sbox_time), trials),
+        'Butterfly-based': randomness_stats.avalanche(
+            lambda data: butterfly_aes.aes_encrypt_dynamic(data, key, sbox_butterfly), trials)
+    }
+
+    logging.info("\n[Avalanche Comparison]")
+    for name, result in results.items():
+        print(f"{name} Avalanche: {result['block_mean']:.4f} "
+              f"(min {result['block_min']:.4f}, max {result['block_max']:.4f}, std {result['block_std']:.4f})")
 
 def main():
     """
     Main function to let users choose between encryption and entropy comparison.
     """
     if len(sys.argv) < 2:
-        print("Please provide an option (1 for Encryption, 2 for Entropy Calculation).")
+        print("Please provide an option (1 for Encryption, 2 for Entropy Calculation, 3 for Avalanche).")
         sys.exit(1)
 
     choice = sys.argv[1]  # Argument from command line
@@ -112,9 +122,18 @@ def main():
         ciphertext_hex = input("Enter ciphertext in hex format: ")
         compare_entropy(ciphertext_hex)
 
+    elif choice == "3":
+        # Compare avalanche
+        key_input = input("Enter 16-byte key: ")
+        if len(key_input) != 16:
+            logging.error("Key must be exactly 16 bytes.")
+            print("Error: Key must be exactly 16 bytes.")
+            return
+        compare_avalanche(key_input.encode('utf-8'))
+
     else:
-        logging.error("Invalid option. Please choose either 1 or 2.")
-        print("Invalid choice. Please choose either 1 or 2.")
+        logging.error("Invalid option. Please choose either 1, 2 or 3.")
+        print("Invalid choice. Please choose either 1, 2 or 3.")
 
 if __name__ == "__main__":
     main()
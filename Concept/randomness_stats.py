@@ -0,0 +1,239 @@
+import argparse
+import json
+import math
+import sys
+import numpy as np
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_WINDOW = 4096
+DEFAULT_STEP = 1024
+
+# Set bits per byte value, and bit transitions inside a byte read MSB first
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.int64)
+INNER_TRANSITIONS = np.array([bin((i ^ (i >> 1)) & 0x7F).count("1") for i in range(256)], dtype=np.int64)
+
+
+def entropy_of_histograms(histograms, total):
+    """
+    Shannon entropy in bits per byte for each row of a [n, 256] histogram array.
+    """
+    p = histograms / total
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(p > 0, p * np.log2(p), 0.0)
+    return -terms.sum(axis=-1)
+
+
+def chi_square_pvalue(chi2, df):
+    """
+    Upper-tail p-value via the Wilson-Hilferty normal approximation (accurate for df=255).
+    """
+    z = ((chi2 / df) ** (1 / 3) - (1 - 2 / (9 * df))) / math.sqrt(2 / (9 * df))
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+class StreamingStats:
+    """
+    Randomness statistics over a byte stream fed in chunks, in constant memory.
+    Keeps a byte histogram, bit transition count and serial correlation sums, plus
+    sliding-window entropy over `window` bytes every `step` bytes.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, step=DEFAULT_STEP):
+        if window % step:
+            raise ValueError("window must be a multiple of step")
+        self.window = window
+        self.step = step
+        self.histogram = np.zeros(256, dtype=np.int64)
+        self.length = 0
+        self.transitions = 0
+        self.sum_xy = 0
+        self.first = None
+        self.last = None
+        # Sliding windows: histograms of the last window // step - 1 complete steps
+        self._step_histograms = np.zeros((0, 256), dtype=np.int64)
+        self._partial = np.zeros(0, dtype=np.uint8)
+        self.windows = 0
+        self.window_entropy_min = math.inf
+        self.window_entropy_max = -math.inf
+        self.window_entropy_sum = 0.0
+
+    def update(self, chunk):
+        """
+        Add one chunk (bytes, bytearray, memoryview or uint8 array).
+        """
+        data = np.frombuffer(chunk, dtype=np.uint8) if not isinstance(chunk, np.ndarray) else chunk
+        if not len(data):
+            return self
+        counts = np.bincount(data, minlength=256)
+        self.histogram += counts
+
+        # Within-byte transitions follow from the histogram; only byte boundaries need the data
+        self.transitions += int(counts @ INNER_TRANSITIONS)
+        self.transitions += int(np.count_nonzero((data[:-1] & 1) ^ (data[1:] >> 7)))
+        # float64 products are exact here: each chunk sum stays far below 2**53
+        wide = data.astype(np.float64)
+        self.sum_xy += int(np.dot(wide[:-1], wide[1:]))
+        if self.last is not None:
+            self.transitions += (self.last & 1) ^ (int(data[0]) >> 7)
+            self.sum_xy += self.last * int(data[0])
+        else:
+            self.first = int(data[0])
+        self.last = int(data[-1])
+        self.length += len(data)
+
+        self._update_windows(data)
+        return self
+
+    def _update_windows(self, data):
+        data = np.concatenate([self._partial, data]) if len(self._partial) else data
+        steps = len(data) // self.step
+        self._partial = data[steps * self.step:].copy()
+        if not steps:
+            return
+
+        # One histogram per step-sized block, all from a single bincount
+        blocks = data[:steps * self.step].reshape(steps, self.step).astype(np.int64)
+        blocks += (np.arange(steps, dtype=np.int64) * 256)[:, None]
+        step_histograms = np.bincount(blocks.ravel(), minlength=steps * 256).reshape(steps, 256)
+
+        per_window = self.window // self.step
+        history = np.concatenate([self._step_histograms, step_histograms])
+        if len(history) >= per_window:
+            cumulative = np.cumsum(np.concatenate([np.zeros((1, 256), dtype=np.int64), history]), axis=0)
+            window_histograms = cumulative[per_window:] - cumulative[:-per_window]
+            entropies = entropy_of_histograms(window_histograms, self.window)
+            self.windows += len(entropies)
+            self.window_entropy_min = min(self.window_entropy_min, float(entropies.min()))
+            self.window_entropy_max = max(self.window_entropy_max, float(entropies.max()))
+            self.window_entropy_sum += float(entropies.sum())
+        self._step_histograms = history[-(per_window - 1):] if per_window > 1 else history[:0]
+
+    def entropy(self):
+        return float(entropy_of_histograms(self.histogram, max(self.length, 1)))
+
+    def chi_square(self):
+        expected = self.length / 256
+        chi2 = float(((self.histogram - expected) ** 2).sum() / expected) if expected else 0.0
+        return {'statistic': chi2, 'p_value': chi_square_pvalue(chi2, 255) if expected else 0.0}
+
+    def monobit(self):
+        """
+        NIST SP 800-22 frequency test over all bits.
+        """
+        bits = self.length * 8
+        ones = int((self.histogram * POPCOUNT).sum())
+        s = abs(2 * ones - bits) / math.sqrt(bits) if bits else 0.0
+        return {'ones_fraction': ones / bits if bits else 0.0, 'p_value': math.erfc(s / math.sqrt(2)) if bits else 0.0}
+
+    def runs(self):
+        """
+        NIST SP 800-22 runs test; p_value is 0 when the monobit prerequisite fails.
+        """
+        bits = self.length * 8
+        if not bits:
+            return {'runs': 0, 'p_value': 0.0}
+        pi = int((self.histogram * POPCOUNT).sum()) / bits
+        observed = self.transitions + 1
+        if abs(pi - 0.5) >= 2 / math.sqrt(bits):
+            return {'runs': observed, 'p_value': 0.0}
+        expected = 2 * bits * pi * (1 - pi)
+        p = math.erfc(abs(observed - expected) / (2 * math.sqrt(2 * bits) * pi * (1 - pi)))
+        return {'runs': observed, 'p_value': p}
+
+    def serial_correlation(self):
+        """
+        Lag-1 serial correlation coefficient of the bytes (0 for uncorrelated data).
+        """
+        n = self.length
+        if n < 2:
+            return 0.0
+        values = np.arange(256, dtype=np.float64)
+        total = float((self.histogram * values).sum())
+        total_sq = float((self.histogram * values ** 2).sum())
+        # Close the sequence circularly, as the ent tool does
+        sum_xy = self.sum_xy + self.last * self.first
+        denominator = n * total_sq - total ** 2
+        return (n * sum_xy - total ** 2) / denominator if denominator else 0.0
+
+    def report(self):
+        return {
+            'bytes': self.length,
+            'entropy': self.entropy(),
+            'chi_square': self.chi_square(),
+            'monobit': self.monobit(),
+            'runs': self.runs(),
+            'serial_correlation': self.serial_correlation(),
+            'window_entropy': {
+                'window': self.window,
+                'step': self.step,
+                'windows': self.windows,
+                'min': self.window_entropy_min if self.windows else None,
+                'max': self.window_entropy_max if self.windows else None,
+                'mean': self.window_entropy_sum / self.windows if self.windows else None
+            }
+        }
+
+
+def analyze_stream(source, chunk_size=DEFAULT_CHUNK_SIZE, window=DEFAULT_WINDOW, step=DEFAULT_STEP):
+    """
+    Run StreamingStats over a binary file object, reading chunk_size bytes at a time.
+    """
+    stats = StreamingStats(window, step)
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        stats.update(chunk)
+    return stats.report()
+
+
+def avalanche(encrypt, trials=256, message_size=64, seed=None):
+    """
+    Bit-level avalanche: encrypt random plaintexts and the same plaintexts with one random
+    bit flipped, then measure the fraction of ciphertext bits that change.
+    `block` covers only the 16-byte block holding the flipped bit (ECB-style ciphers
+    cannot spread a change further); ideal values are close to 0.5.
+    """
+    rng = np.random.default_rng(seed)
+    plaintexts = rng.integers(0, 256, size=(trials, message_size), dtype=np.uint8)
+    flip_bits = rng.integers(0, message_size * 8, size=trials)
+    related = plaintexts.copy()
+    related[np.arange(trials), flip_bits // 8] ^= (0x80 >> (flip_bits % 8)).astype(np.uint8)
+
+    whole = np.empty(trials)
+    block = np.empty(trials)
+    for i in range(trials):
+        a = np.frombuffer(encrypt(plaintexts[i].tobytes()), dtype=np.uint8)
+        b = np.frombuffer(encrypt(related[i].tobytes()), dtype=np.uint8)
+        changed = POPCOUNT[a ^ b]
+        whole[i] = changed.sum() / (len(a) * 8)
+        start = (flip_bits[i] // 128) * 16
+        block[i] = changed[start:start + 16].sum() / 128
+    return {
+        'trials': trials,
+        'whole_mean': float(whole.mean()),
+        'block_mean': float(block.mean()),
+        'block_min': float(block.min()),
+        'block_max': float(block.max()),
+        'block_std': float(block.std())
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Streaming randomness statistics for ciphertext files")
+    parser.add_argument('input', help="Ciphertext file, or - for stdin")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--window', type=int, default=DEFAULT_WINDOW)
+    parser.add_argument('--step', type=int, default=DEFAULT_STEP)
+    args = parser.parse_args(argv)
+
+    if args.input == '-':
+        report = analyze_stream(sys.stdin.buffer, args.chunk_size, args.window, args.step)
+    else:
+        with open(args.input, 'rb') as f:
+            report = analyze_stream(f, args.chunk_size, args.window, args.step)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
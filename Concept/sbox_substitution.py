@@ -0,0 +1,18 @@
+import numpy as np
+
+
+def substitute_bytes_dynamic(block, sbox):
+    """
+    Perform substitution using the dynamic S-Box.
+    sbox may be a list, a 256-entry uint8 array, or an [n, 256] array from the batch
+    generators, in which case row i substitutes the i-th of n segments of block. Segments
+    are ceil(len(block) / n) bytes, so the last one may be shorter (or rows left unused).
+    The [n, 256] array is indexed directly, so broadcast views are never copied.
+    """
+    if isinstance(sbox, np.ndarray) and sbox.ndim == 2:
+        data = np.frombuffer(block, dtype=np.uint8)  # Zero-copy view of the input
+        segment = -(-len(data) // len(sbox)) or 1
+        rows = np.arange(len(data), dtype=np.intp) // segment
+        return sbox[rows, data].astype(np.uint8, copy=False).tobytes()
+    table = sbox.astype(np.uint8).tobytes() if isinstance(sbox, np.ndarray) else bytes(sbox)
+    return bytes(block).translate(table)
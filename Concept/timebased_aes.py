@@ -2,26 +2,43 @@ from Crypto.Cipher import AES
 from Crypto.Util.Padding import pad, unpad
 import numpy as np
 import time
+from sbox_substitution import substitute_bytes_dynamic
+
+
+def time_seed(ts=None):
+    """
+    Derive the S-Box seed from a timestamp in milliseconds (default: now).
+    """
+    if ts is None:
+        ts = int(time.time() * 1000)  # Current time in milliseconds
+    random_values = [ts ^ (ts >> i) & 0xFF for i in range(8)]  # XOR shifting
+    return sum(random_values) % (2**32)  # Ensure seed is within valid range
 
 
 def generate_dynamic_sbox_time():
     """
     Generate a dynamic S-Box based on system time.
+    Uses its own RandomState, so concurrent callers do not reseed each other; the
+    permutation is the same one np.random.seed + np.random.shuffle produced.
     """
-    ts = int(time.time() * 1000)  # Current time in milliseconds
-    random_values = [ts ^ (ts >> i) & 0xFF for i in range(8)]  # XOR shifting
-    seed_value = sum(random_values) % (2**32)  # Ensure seed is within valid range
-    sbox = list(range(256))
-    np.random.seed(seed_value)  # Use XOR result as seed
-    np.random.shuffle(sbox)  # Shuffle to create dynamic S-Box
-    return sbox
+    rng = np.random.RandomState(time_seed())  # Use XOR result as seed
+    sbox = np.arange(256)
+    rng.shuffle(sbox)  # Shuffle to create dynamic S-Box
+    return sbox.tolist()
 
 
-def substitute_bytes_dynamic(block, sbox):
+def generate_dynamic_sboxes_time(n, seed=None):
     """
-    Perform substitution using the dynamic S-Box.
+    Generate n independent S-Boxes as one [n, 256] uint8 array.
+    Each call uses an isolated np.random.Generator seeded from seed (default: the
+    time-based seed). Every row is sorted by random 56-bit keys packed above the byte
+    value, so one vectorized sort yields n uniform permutations.
     """
-    return bytes([sbox[b] for b in block])
+    rng = np.random.default_rng(time_seed() if seed is None else seed)
+    keys = rng.integers(0, 2**56, size=(n, 256), dtype=np.uint64) << np.uint64(8)
+    keys |= np.arange(256, dtype=np.uint64)
+    keys.sort(axis=1)
+    return keys.astype(np.uint8)  # Low byte is the value
 
 
 def aes_encrypt_dynamic(plaintext, key, dynamic_sbox):
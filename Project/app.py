@@ -1,304 +1,157 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Request, render_template, request, jsonify, url_for, Response, stream_with_context
 import os
-import secrets
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad, unpad
-from PyPDF2 import PdfReader, PdfWriter
+import csprng
 import psutil
 import time
-import hashlib
-import struct
-from concurrent.futures import ThreadPoolExecutor
 import math
-from datetime import datetime
 import json
+from page_workers import get_backend, iter_page_batches
+from storage import (
+    DEFAULT_PAGE_SIZE, DEFAULT_SERIES_POINTS, MAX_PAGE_SIZE, MAX_SERIES_POINTS, BUCKET_NAMES, PerformanceStorage
+)
+from page_text_cache import page_text_cache
+from sbox_cache import butterfly_sbox_cache, lede_table_cache
+import tracing
+from resource_sampler import resource_sampler
+import memory_profile
+import energy
+from jobs import STATUS_DONE, STATUS_FAILED, JobQueue, JobStore, QueueFullError
+import cipher_mode
+import ingest
+import serving
+import shared_tables
+import batch
+from cipher_mode import CIPHER_BUTTERFLY, CIPHER_LEDE, CIPHERS
 
-class ButterflyAES:
-    def __init__(self):
-        self.rounds = 12  # Increased rounds for better comparison
-        
-    def generate_butterfly_sbox(self, key, round_number):
-        """Generate more complex S-box using butterfly effect"""
-        sbox = bytearray(range(256))
-        
-        # Add round-specific complexity
-        round_key = bytes([(b + round_number) % 256 for b in key])
-        
-        # Multiple transformation passes
-        for pass_num in range(3):
-            # Forward transformation
-            for i in range(256):
-                j = (i + round_key[i % 16] + pass_num) % 256
-                sbox[i], sbox[j] = sbox[j], sbox[i]
-                
-                # Add butterfly effect
-                k = (sbox[i] + sbox[j] + round_number) % 256
-                sbox[k] = (sbox[k] * 7 + round_number) % 256
-            
-            # Reverse transformation
-            for i in range(255, -1, -1):
-                j = (sbox[i] + round_key[(i * round_number) % 16]) % 256
-                sbox[i], sbox[j] = sbox[j], sbox[i]
-        
-        return bytes(sbox)
-
-    def encrypt_block(self, block, key, round_number):
-        """Encrypt a single block with round-specific S-box"""
-        sbox = self.generate_butterfly_sbox(key, round_number)
-        cipher = AES.new(key, AES.MODE_ECB)
-        
-        # Apply multiple rounds
-        result = block
-        for _ in range(self.rounds):
-            result = bytes(sbox[b] for b in result)
-            result = cipher.encrypt(result)
-        
-        return result
-
-    def encrypt(self, plaintext, key):
-        """Perform enhanced butterfly-based encryption"""
-        try:
-            padded_data = pad(plaintext, AES.block_size)
-            blocks = [padded_data[i:i+AES.block_size] for i in range(0, len(padded_data), AES.block_size)]
-            
-            encrypted_blocks = []
-            for i, block in enumerate(blocks):
-                encrypted_block = self.encrypt_block(block, key, i + 1)
-                encrypted_blocks.append(encrypted_block)
-            
-            return b''.join(encrypted_blocks)
-        except Exception as e:
-            print(f"Butterfly encryption error: {str(e)}")
-            raise
-
-class LEDECipher:
-    def __init__(self):
-        self.rounds = 12
-        
-    def generate_time_arrays(self, system_time, alpha, beta, gamma, round_number):
-        """Generate time arrays with round-specific modifications"""
-        time_bytes = struct.pack('>Q', system_time * round_number) * 16
-        
-        KA = bytearray(time_bytes)
-        KB = bytearray(time_bytes)
-        KC = bytearray(128)
-        
-        for pass_num in range(3):
-            for i in range(64):
-                KB[i] = (KB[i] + alpha + round_number * pass_num) % 256
-                KB[127-i] = (KB[127-i] + beta + round_number * pass_num) % 256
-                KB[i], KB[127-i] = KB[127-i], KB[i]
-                
-                mid = (KB[i] * KB[127-i] + gamma) % 256
-                KB[i] = (KB[i] + mid) % 256
-                KB[127-i] = (KB[127-i] ^ mid) % 256
-            
-            for i in range(128):
-                KC[i] = (KA[i] * KB[i] + gamma * round_number + pass_num) % 256
-                KA[i] = (KA[i] + KC[i]) % 256
-        
-        return KA, KB, KC
+class IngestRequest(Request):
+    """Request whose uploaded files are streamed straight into job-scoped upload directories"""
 
-    def generate_sbox(self, KA, KB, KC, round_number):
-        """Generate dynamic S-box"""
-        sbox = []
-        used_values = set()
-        
-        for pass_num in range(3):
-            for arr in [KA, KB, KC]:
-                for i, value in enumerate(arr):
-                    modified_value = (value * round_number + pass_num) % 256
-                    if modified_value not in used_values:
-                        sbox.append(modified_value)
-                        used_values.add(modified_value)
-        
-        remaining = set(range(256)) - used_values
-        for value in sorted(remaining, reverse=bool(round_number % 2)):
-            sbox.append(value)
-            
-        return bytes(sbox[:256])
-
-    def encrypt_block(self, block, key, system_time, params, round_number):
-        """Encrypt a single block"""
-        alpha, beta, gamma = params
-        KA, KB, KC = self.generate_time_arrays(system_time, alpha, beta, gamma, round_number)
-        sbox = self.generate_sbox(KA, KB, KC, round_number)
-        
-        cipher = AES.new(key, AES.MODE_ECB)
-        result = block
-        
-        for round_idx in range(self.rounds):
-            round_sbox = self.generate_sbox(KA, KB, KC, round_idx + 1)
-            result = bytes(round_sbox[b] for b in result)
-            result = cipher.encrypt(result)
-        
-        return result
-
-    def encrypt(self, plaintext, key):
-        """Perform LEDE encryption"""
-        try:
-            alpha = secrets.randbelow(256)
-            beta = secrets.randbelow(256)
-            gamma = secrets.randbelow(256)
-            system_time = int(time.time() * 1000)
-            
-            padded_data = pad(plaintext, AES.block_size)
-            blocks = [padded_data[i:i+AES.block_size] for i in range(0, len(padded_data), AES.block_size)]
-            
-            encrypted_blocks = []
-            for i, block in enumerate(blocks):
-                encrypted_block = self.encrypt_block(block, key, system_time, (alpha, beta, gamma), i + 1)
-                encrypted_blocks.append(encrypted_block)
-            
-            return {
-                'ciphertext': b''.join(encrypted_blocks),
-                'system_time': system_time,
-                'params': (alpha, beta, gamma),
-                've': hashlib.sha256(f"{system_time}{alpha}{beta}{gamma}".encode()).hexdigest()
-            }
-        except Exception as e:
-            print(f"LEDE encryption error: {str(e)}")
-            raise
-
-class PerformanceStorage:
-    def __init__(self):
-        self.data_file = "encryption_results.json"
-        self.load_data()
-    
-    def load_data(self):
-        if os.path.exists(self.data_file):
-            with open(self.data_file, 'r') as f:
-                self.data = json.load(f)
-        else:
-            self.data = []
-    
-    def save_run(self, butterfly_time, lede_time, cpu_usage, memory_usage, file_size):
-        run_data = {
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'butterfly_time': butterfly_time,
-            'lede_time': lede_time,
-            'cpu_usage': cpu_usage,
-            'memory_usage': memory_usage,
-            'file_size': file_size,
-            'efficiency_gain': ((butterfly_time - lede_time) / butterfly_time * 100) if butterfly_time > 0 else 0
-        }
-        self.data.append(run_data)
-        
-        with open(self.data_file, 'w') as f:
-            json.dump(self.data, f, indent=2)
-    
-    def get_all_runs(self):
-        return self.data
-
-def process_page_chunk(chunk_data):
-    """Process a chunk of pages in parallel"""
-    pages, key, butterfly_aes, lede = chunk_data
-    chunk_butterfly_time = 0
-    chunk_time_based_time = 0
-    
-    for page in pages:
-        content = page.extract_text()
-        if content:
-            content_bytes = content.encode('utf-8')
-            
-            butterfly_start = time.perf_counter()
-            butterfly_aes.encrypt(content_bytes, key)
-            butterfly_end = time.perf_counter()
-            chunk_butterfly_time += (butterfly_end - butterfly_start)
-            
-            time_start = time.perf_counter()
-            lede.encrypt(content_bytes, key)
-            time_end = time.perf_counter()
-            chunk_time_based_time += (time_end - time_start)
-    
-    return chunk_butterfly_time, chunk_time_based_time
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return ingest.IngestFile(filename)
 
 app = Flask(__name__)
+app.request_class = IngestRequest
 storage = PerformanceStorage()
+job_queue = JobQueue(store=JobStore(storage.db_file))
+# Shadow comparisons in single-cipher mode: one worker, and samples are dropped when it
+# falls behind rather than competing with production jobs
+shadow_queue = JobQueue(workers=1, max_queued=4)
+
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+# Every upload gets a fresh random key. Only with PDF_FIXED_KEY=1 is every upload encrypted
+# under the PDF_KEY_FILE key instead (whose S-boxes serving.py precomputes in shared memory)
+FIXED_KEY = None
+if os.environ.get('PDF_FIXED_KEY') == '1':
+    FIXED_KEY = next(iter(shared_tables.read_key_files(os.environ.get('PDF_KEY_FILE'))), None)
+    if FIXED_KEY is None:
+        raise ValueError("PDF_FIXED_KEY=1 needs PDF_KEY_FILE")
+RESULT_KEYS = {CIPHER_BUTTERFLY: 'butterfly', CIPHER_LEDE: 'time_based'}
+
+def upload_key():
+    """Key for one upload or batch: random, unless PDF_FIXED_KEY is set"""
+    return FIXED_KEY or csprng.token_bytes(16)
 
-def monitor_performance():
-    """Monitor system performance metrics"""
+def battery_percent():
+    """Battery charge, or 'N/A' without a battery"""
     try:
-        cpu_usage = psutil.cpu_percent(interval=0.1)
-        memory = psutil.virtual_memory()
         battery = psutil.sensors_battery()
-        
-        return {
-            'cpu': cpu_usage,
-            'memory': memory.percent,
-            'battery': battery.percent if battery else 'N/A'
-        }
+        return battery.percent if battery else 'N/A'
     except Exception as e:
         print(f"Performance monitoring error: {str(e)}")
-        return {'cpu': 0, 'memory': 0, 'battery': 'N/A'}
+        return 'N/A'
 
-def encrypt_pdf_with_comparison(input_pdf, key):
-    """Encrypt PDF using both methods with parallel processing"""
+def encrypt_pdf(input_pdf, key, ciphers=CIPHERS, backend=None, progress=None, write_outputs=True):
+    """Encrypt PDF with the given ciphers using parallel processing.
+
+    progress(pages, total_pages) is called as pages finish, starting with (0, total_pages).
+    The result has a 'butterfly' and/or 'time_based' entry for the ciphers that ran;
+    with write_outputs=False no output PDFs are written (shadow comparisons).
+    """
     try:
-        reader = PdfReader(input_pdf)
-        writer_butterfly = PdfWriter()
-        writer_time = PdfWriter()
-        
-        butterfly_aes = ButterflyAES()
-        lede = LEDECipher()
+        backend = get_backend(backend)
+        reader = ingest.open_pdf(input_pdf)
+        total_pages = len(reader.pages)
         
-        pages = list(reader.pages)
-        total_pages = len(pages)
+        page_progress = None
+        if progress:
+            progress(0, total_pages)
+            page_progress = lambda done: progress(done, total_pages)
         
-        num_chunks = min(os.cpu_count() or 1, max(1, total_pages // 2))
-        chunk_size = max(1, total_pages // num_chunks)
-        
-        chunks = [
-            (pages[i:i + chunk_size], key, butterfly_aes, lede)
-            for i in range(0, total_pages, chunk_size)
-        ]
+        workers = min(os.cpu_count() or 1, max(1, total_pages // 2))
         
         butterfly_total_time = 0
         time_based_total_time = 0
-        
-        with ThreadPoolExecutor(max_workers=num_chunks) as executor:
-            results = list(executor.map(process_page_chunk, chunks))
-            
-            for butterfly_time, time_based_time in results:
-                butterfly_total_time += butterfly_time
-                time_based_total_time += time_based_time
-        
-        for page in pages:
-            writer_butterfly.add_page(page)
-            writer_time.add_page(page)
-        
-        butterfly_output = os.path.join("uploads", f"butterfly_encrypted_{os.path.basename(input_pdf)}")
-        time_output = os.path.join("uploads", f"time_encrypted_{os.path.basename(input_pdf)}")
-        
-        with open(butterfly_output, "wb") as f:
-            writer_butterfly.write(f)
-        with open(time_output, "wb") as f:
-            writer_time.write(f)
+        butterfly_cpu_time = 0
+        time_based_cpu_time = 0
+        worker_cpu_time = 0
+        text_bytes = 0
+        
+        job_energy = energy.start_job()
+        worker_stats = {}
+        pipeline_start = time.perf_counter()
+        for chunk in iter_page_batches(
+            input_pdf, reader, key, backend, workers, page_progress, worker_stats, ciphers
+        ):
+            butterfly_total_time += chunk['butterfly_time']
+            time_based_total_time += chunk['lede_time']
+            butterfly_cpu_time += chunk['butterfly_cpu_time']
+            time_based_cpu_time += chunk['lede_cpu_time']
+            worker_cpu_time += chunk['cpu_time']
+            text_bytes += chunk['bytes']
+        pipeline_time = time.perf_counter() - pipeline_start
+        
+        energy_summary = None
+        if job_energy:
+            energy_summary = job_energy.summarize(butterfly_cpu_time, time_based_cpu_time, text_bytes, total_pages)
+        
+        # Share of the pipeline's wall time each worker spent on pages; a low minimum
+        # next to a high maximum means a straggler
+        for stats in worker_stats.values():
+            stats['utilization'] = stats['busy_time'] / pipeline_time if pipeline_time > 0 else 0
+        
+        # Outputs go next to the input, in its upload directory
+        outputs = {
+            cipher: os.path.join(os.path.dirname(input_pdf), cipher_mode.output_name(cipher, input_pdf))
+            for cipher in ciphers
+        }
+        if write_outputs:
+            # The outputs carry the original pages unchanged, so copy the document in
+            # fixed-size buffers rather than rebuilding it page by page in PdfWriters
+            with tracing.span('pdf_write'):
+                ingest.copy_file(input_pdf, outputs.values(), OUTPUT_BUFFER_SIZE)
         
         avg_butterfly_time = butterfly_total_time / max(total_pages, 1)
         avg_time_based_time = time_based_total_time / max(total_pages, 1)
         
-        print(f"Debug - Butterfly time: {avg_butterfly_time:.6f}s")
-        print(f"Debug - Time-based time: {avg_time_based_time:.6f}s")
-        
-        return {
-            'butterfly': {
-                'output': butterfly_output,
+        results = {
+            'workers': worker_stats,
+            'pipeline_time': pipeline_time,
+            'cpu_time': worker_cpu_time,
+            'energy': energy_summary
+        }
+        if CIPHER_BUTTERFLY in ciphers:
+            results['butterfly'] = {
+                'output': outputs[CIPHER_BUTTERFLY],
                 'avg_time': avg_butterfly_time,
                 'total_time': butterfly_total_time,
                 'pages': total_pages
-            },
-            'time_based': {
-                'output': time_output,
+            }
+        if CIPHER_LEDE in ciphers:
+            results['time_based'] = {
+                'output': outputs[CIPHER_LEDE],
                 'avg_time': avg_time_based_time,
                 'total_time': time_based_total_time,
                 'pages': total_pages
             }
-        }
+        return results
     except Exception as e:
         print(f"PDF encryption error: {str(e)}")
         raise
 
+def encrypt_pdf_with_comparison(input_pdf, key, backend=None, progress=None):
+    """Encrypt PDF using both methods with parallel processing"""
+    return encrypt_pdf(input_pdf, key, CIPHERS, backend, progress)
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -306,69 +159,304 @@ def index():
 @app.route('/encrypt_pdf', methods=['POST'])
 def encrypt_pdf_route():
     try:
-        if 'pdf_file' not in request.files:
+        # Parsing the form streams each file into its upload directory (IngestRequest)
+        with tracing.span('upload_save'):
+            files = request.files
+        if 'pdf_file' not in files:
             return "No file uploaded!", 400
         
-        file = request.files['pdf_file']
+        file = files['pdf_file']
+        upload = ingest.finish_upload(file)
         if file.filename == '':
+            upload.discard()
             return "No file selected!", 400
             
-        if not file.filename.lower().endswith('.pdf'):
+        if not file.filename.lower().endswith('.pdf') or not upload.size:
+            upload.discard()
             return "Please upload a PDF file!", 400
         
-        key = secrets.token_bytes(16)
-        
-        os.makedirs("uploads", exist_ok=True)
-        input_pdf = os.path.join("uploads", file.filename)
-        file.save(input_pdf)
-        
-        start_metrics = monitor_performance()
-        start_time = time.perf_counter()
-        
-        results = encrypt_pdf_with_comparison(input_pdf, key)
-        
-        end_time = time.perf_counter()
-        end_metrics = monitor_performance()
-        
-        total_time = end_time - start_time
-        cpu_usage = max(0, end_metrics['cpu'] - start_metrics['cpu'])
-        memory_usage = max(0, end_metrics['memory'] - start_metrics['memory'])
-        
-        file_size = os.path.getsize(input_pdf) / 1024  # Convert to KB
-        
-        storage.save_run(
-            butterfly_time=results['butterfly']['avg_time'],
-            lede_time=results['time_based']['avg_time'],
-            cpu_usage=cpu_usage,
-            memory_usage=memory_usage,
-            file_size=file_size
+        profile = memory_profile.is_enabled(request.form.get('profile_memory') == '1')
+        try:
+            job = job_queue.submit(
+                run_encryption_job, upload, upload_key(), profile, cipher_mode.get_mode()
+            )
+        except QueueFullError:
+            upload.discard()
+            raise
+        return jsonify({
+            'job_id': job.id,
+            'status_url': url_for('job_status', job_id=job.id),
+            'result_url': url_for('job_result', job_id=job.id)
+        }), 202
+    
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 429
+    except Exception as e:
+        print(f"Route error: {str(e)}")
+        return f"An error occurred: {str(e)}", 500
+
+def run_encryption_job(upload, key, profile, mode, job):
+    """Job body for /encrypt_pdf; returns the result.html context.
+
+    In compare mode both ciphers run and the run is stored. In single-cipher mode only
+    that cipher runs; a sampled share of uploads (and every memory-profiled one) is handed
+    to run_shadow_comparison, which stores the comparison once the other cipher has run.
+    """
+    input_pdf = upload.path
+    window_start = resource_sampler.open_window()
+    cpu_start = time.thread_time()
+    start_time = time.perf_counter()
+    
+    try:
+        results = encrypt_pdf(input_pdf, key, cipher_mode.mode_ciphers(mode), progress=job.report_progress)
+    except Exception:
+        resource_sampler.close_window(window_start)
+        raise
+    
+    end_time = time.perf_counter()
+    # The job's own CPU time (this thread and its page workers' threads), so jobs that
+    # overlap are not charged for each other's CPU
+    resources = resource_sampler.close_window(window_start, time.thread_time() - cpu_start + results['cpu_time'])
+    
+    total_time = end_time - start_time
+    # Job CPU over its window as a share of all cores, and peak RSS (process-wide, see
+    # resources['concurrent_jobs']) as a share of system memory, so history keeps its 0-100 scale
+    cpu_usage = resources['cpu_percent'] if resources else 0
+    memory_usage = resources['rss_peak'] / psutil.virtual_memory().total * 100 if resources else 0
+    
+    file_size = upload.size / 1024  # Convert to KB
+    
+    extra = {
+        'upload': upload.to_dict(),
+        'worker_utilization': {
+            worker: round(stats['utilization'], 4) for worker, stats in results['workers'].items()
+        },
+        'resources': resources,
+        'energy': results['energy']
+    }
+    times = {
+        cipher: results[RESULT_KEYS[cipher]]['avg_time']
+        for cipher in CIPHERS if RESULT_KEYS[cipher] in results
+    }
+    
+    shadow_job = None
+    if mode == cipher_mode.MODE_COMPARE:
+        extra['run_type'] = cipher_mode.RUN_COMPARE
+        if profile:
+            extra['memory_profile'] = memory_profile.profile_pdf(input_pdf, key)
+        with tracing.span('storage_write'):
+            storage.save_run(
+                butterfly_time=times[CIPHER_BUTTERFLY],
+                lede_time=times[CIPHER_LEDE],
+                cpu_usage=cpu_usage,
+                memory_usage=memory_usage,
+                file_size=file_size,
+                extra=extra
+            )
+    elif profile or cipher_mode.should_shadow():
+        primary_run = {
+            'times': times,
+            'cpu_usage': cpu_usage,
+            'memory_usage': memory_usage,
+            'file_size': file_size,
+            'extra': extra
+        }
+        try:
+            shadow_job = shadow_queue.submit(run_shadow_comparison, input_pdf, key, mode, primary_run, profile)
+        except QueueFullError as e:
+            print(f"Shadow comparison skipped: {str(e)}")
+    
+    butterfly_time = times.get(CIPHER_BUTTERFLY)
+    timebased_time = times.get(CIPHER_LEDE)
+    
+    if butterfly_time and timebased_time is not None:
+        efficiency_gain = ((butterfly_time - timebased_time) / butterfly_time) * 100
+    else:
+        efficiency_gain = 0
+        
+    return {
+        'mode': mode,
+        'shadow_job_id': shadow_job.id if shadow_job else None,
+        'butterfly_time': butterfly_time,
+        'timebased_time': timebased_time,
+        'cpu_usage': cpu_usage,
+        'memory_usage': memory_usage,
+        'battery_percent': battery_percent(),
+        'efficiency_gain': efficiency_gain,
+        'butterfly_pdf': results['butterfly']['output'] if 'butterfly' in results else None,
+        'timebased_pdf': results['time_based']['output'] if 'time_based' in results else None,
+        'total_pages': next(results[RESULT_KEYS[cipher]]['pages'] for cipher in times),
+        'file_size': file_size
+    }
+
+def run_shadow_comparison(input_pdf, key, primary, primary_run, profile, job):
+    """Shadow job for single-cipher mode: encrypt with the other cipher, without writing
+    outputs, and store the comparison tagged run_type='shadow'.
+
+    CPU, memory and worker figures are the primary run's, as measured on the request path.
+    """
+    shadow = cipher_mode.other_cipher(primary)
+    results = encrypt_pdf(input_pdf, key, (shadow,), write_outputs=False)
+    
+    times = dict(primary_run['times'])
+    times[shadow] = results[RESULT_KEYS[shadow]]['avg_time']
+    extra = dict(primary_run['extra'])
+    extra.update({
+        'run_type': cipher_mode.RUN_SHADOW,
+        'primary_cipher': primary,
+        'shadow_cipher': shadow,
+        'shadow_pipeline_time': results['pipeline_time']
+    })
+    if extra['energy'] and results['energy']:
+        # Each run measured one cipher; take the shadow cipher's figures from the shadow run
+        extra['energy'] = dict(extra['energy'])
+        extra['energy'].update({
+            name: value for name, value in results['energy'].items() if name.startswith(shadow + '_')
+        })
+        for name in ('total_joules', 'cpu_time', 'joules_per_cpu_second'):
+            extra['energy'].pop(name, None)
+    if profile:
+        extra['memory_profile'] = memory_profile.profile_pdf(input_pdf, key)
+    
+    with tracing.span('storage_write'):
+        return storage.save_run(
+            butterfly_time=times[CIPHER_BUTTERFLY],
+            lede_time=times[CIPHER_LEDE],
+            cpu_usage=primary_run['cpu_usage'],
+            memory_usage=primary_run['memory_usage'],
+            file_size=primary_run['file_size'],
+            extra=extra
         )
-        
-        butterfly_time = results['butterfly']['avg_time']
-        timebased_time = results['time_based']['avg_time']
-        
-        if butterfly_time > 0:
-            efficiency_gain = ((butterfly_time - timebased_time) / butterfly_time) * 100
-        else:
-            efficiency_gain = 0
-            
-        return render_template('result.html',
-                             butterfly_time=results['butterfly']['avg_time'],
-                             timebased_time=results['time_based']['avg_time'],
-                             cpu_usage=cpu_usage,
-                             memory_usage=memory_usage,
-                             battery_percent=end_metrics['battery'],
-                             efficiency_gain=efficiency_gain,
-                             butterfly_pdf=results['butterfly']['output'],
-                             timebased_pdf=results['time_based']['output'],
-                             total_pages=results['butterfly']['pages'],
-                             file_size=file_size,
-                             all_runs=storage.get_all_runs())
-                             
+
+@app.route('/encrypt_batch', methods=['POST'])
+def encrypt_batch_route():
+    """Encrypt every file of the pdf_files field in one job, on one shared worker pool"""
+    uploads = []
+    try:
+        with tracing.span('upload_save'):
+            files = request.files.getlist('pdf_files')
+        uploads = [ingest.finish_upload(file) for file in files]
+        if not files or any(file.filename == '' for file in files):
+            raise ValueError("No files selected!")
+        if any(not file.filename.lower().endswith('.pdf') or not upload.size for file, upload in zip(files, uploads)):
+            raise ValueError("Please upload only PDF files!")
+        
+        # Each document is encrypted into its own upload directory
+        documents = [(f"{upload.id}/{upload.filename}", upload.path, upload.directory) for upload in uploads]
+        job = job_queue.submit(
+            run_batch_job, documents, upload_key(), cipher_mode.get_mode()
+        )
+        return jsonify({
+            'job_id': job.id,
+            'documents': len(documents),
+            'status_url': url_for('job_status', job_id=job.id),
+            'result_url': url_for('job_result', job_id=job.id)
+        }), 202
+    
+    except ValueError as e:
+        for upload in uploads:
+            upload.discard()
+        return str(e), 400
+    except QueueFullError as e:
+        for upload in uploads:
+            upload.discard()
+        return jsonify({'error': str(e)}), 429
     except Exception as e:
         print(f"Route error: {str(e)}")
         return f"An error occurred: {str(e)}", 500
 
+def run_batch_job(documents, key, mode, job):
+    """Job body for /encrypt_batch; the result is the batch aggregate with per-document results"""
+    aggregate = batch.encrypt_batch(documents, key, mode, progress=job.report_progress, storage=storage)
+    aggregate['run_type'] = cipher_mode.RUN_BATCH
+    aggregate.pop('workers')
+    return aggregate
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    status = job.to_dict()
+    status['result_url'] = url_for('job_result', job_id=job_id)
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return "Unknown job!", 404
+    if job.status == STATUS_FAILED:
+        return f"An error occurred: {job.error}", 500
+    if job.status != STATUS_DONE:
+        return jsonify(job.to_dict()), 202
+    if job.result.get('run_type') == cipher_mode.RUN_BATCH:
+        return jsonify(job.result)
+    return render_template(
+        'result.html', series=storage.series(), summary=storage.summary(), recent_runs=storage.recent_runs(),
+        **job.result
+    )
+
 @app.route('/api/performance_history')
 def get_performance_history():
-    return jsonify
\ No newline at end of file
+    """Runs oldest first, filtered by ?start=&end= timestamps and ?bucket=, paged by ?after_id=&limit="""
+    start = request.args.get('start')
+    end = request.args.get('end')
+    bucket = request.args.get('bucket')
+    after_id = request.args.get('after_id', type=int)
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    if bucket and bucket not in BUCKET_NAMES:
+        return f"Unknown size bucket: {bucket}", 400
+
+    def generate():
+        yield '{"runs": ['
+        last_id = None
+        count = 0
+        for run in storage.iter_runs(start, end, bucket, after_id, limit):
+            yield (',' if count else '') + json.dumps(run)
+            last_id = run['id']
+            count += 1
+        next_after_id = last_id if count == limit else None
+        yield '], "next_after_id": ' + json.dumps(next_after_id) + '}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+@app.route('/api/performance_summary')
+def get_performance_summary():
+    """Rollup statistics (count, mean, variance, percentiles) overall and per size bucket,
+    for all time or ?start=&end= (whole hours)"""
+    bucket = request.args.get('bucket')
+    if bucket and bucket not in BUCKET_NAMES:
+        return f"Unknown size bucket: {bucket}", 400
+    return jsonify(storage.summary(request.args.get('start'), request.args.get('end'), bucket))
+
+@app.route('/api/performance_series')
+def get_performance_series():
+    """Per-window metric means over time, downsampled to at most ?points= points"""
+    bucket = request.args.get('bucket')
+    if bucket and bucket not in BUCKET_NAMES:
+        return f"Unknown size bucket: {bucket}", 400
+    points = min(max(request.args.get('points', DEFAULT_SERIES_POINTS, type=int), 1), MAX_SERIES_POINTS)
+    return jsonify({
+        'points': storage.series(points, request.args.get('start'), request.args.get('end'), bucket)
+    })
+
+@app.route('/api/cache_stats')
+def get_cache_stats():
+    """Cache statistics of this server process (process-backend workers keep their own)"""
+    return jsonify({
+        'page_text': page_text_cache.stats(),
+        'butterfly_sbox': butterfly_sbox_cache.stats(),
+        'lede_tables': lede_table_cache.stats(),
+        'shared_tables': shared_tables.stats()
+    })
+
+@app.route('/api/memory')
+def get_memory():
+    """Memory of all server processes (rss, uss, pss) and the shared table segment"""
+    return jsonify(serving.memory_report())
+
+@app.route('/metrics')
+def metrics():
+    """Per-stage duration histograms in the Prometheus text format (enable with PDF_METRICS=1)"""
+    return Response(tracing.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,368 @@
+"""Encrypt many PDFs on one shared worker pool.
+
+Usage:
+    python batch.py reports/ extra.pdf --output-dir encrypted/
+    python batch.py reports/ --output-dir encrypted/ --mode butterfly --backend process
+
+Pages of all documents are scheduled together (see page_workers.schedule_documents), so
+the pool is started once and small documents fill the gaps left by large ones. Documents
+are opened in windows of WINDOW_DOCUMENTS as the pool works through them, so thousands of
+inputs are never all open at once.
+
+Each finished document is appended to a JSON-lines manifest (default:
+OUTPUT_DIR/manifest.jsonl). Rerunning the same command resumes: documents the manifest
+lists as done, with unchanged size and modification time, are skipped. The batch as a
+whole is stored as one run in the performance history (run_type 'batch') when both
+ciphers ran; the aggregate is also appended to the manifest.
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+import psutil
+import cipher_mode
+import energy
+import ingest
+import tracing
+from cipher_mode import CIPHER_BUTTERFLY, CIPHER_LEDE, CIPHERS
+from page_workers import BACKENDS, get_backend, iter_document_batches, resolve_workers, schedule_documents
+from resource_sampler import resource_sampler
+
+WINDOW_DOCUMENTS = 32  # Documents opened and scheduled together
+MANIFEST_NAME = 'manifest.jsonl'
+KEY_NAME = 'batch.key'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+
+def find_pdfs(inputs, output_dir):
+    """(document, input_pdf, output_dir) for PDF files and the PDFs under directories.
+
+    document is the file's absolute path, which identifies it in the manifest. With one
+    INPUT, outputs go to output_dir and keep a directory's layout. With several, each INPUT
+    gets its own subdirectory of output_dir, named after it (repeated names get a -2, -3
+    suffix), so same-named files from different inputs never overwrite each other.
+    Files already inside output_dir are skipped, so outputs are not re-encrypted.
+    """
+    output_root = os.path.realpath(output_dir)
+    documents = []
+    labels = set()
+    for path in inputs:
+        target = output_dir
+        if len(inputs) > 1:
+            base = os.path.basename(os.path.realpath(path))
+            label = base if os.path.isdir(path) else os.path.splitext(base)[0]
+            suffix = 1
+            while label in labels:
+                suffix += 1
+                label = f"{base}-{suffix}"
+            labels.add(label)
+            target = os.path.join(output_dir, label)
+        if not os.path.isdir(path):
+            documents.append((os.path.realpath(path), path, target))
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            if os.path.realpath(root) == output_root or os.path.realpath(root).startswith(output_root + os.sep):
+                dirs[:] = []
+                continue
+            output = os.path.normpath(os.path.join(target, os.path.relpath(root, path)))
+            for filename in sorted(files):
+                if filename.lower().endswith('.pdf'):
+                    input_pdf = os.path.join(root, filename)
+                    documents.append((os.path.realpath(input_pdf), input_pdf, output))
+    return documents
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class Manifest:
+    """Append-only JSON-lines record of finished documents; the last entry per document wins"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        torn = False
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    torn = not line.endswith('\n')
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # Torn last line from an interrupted run
+                    if 'document' in entry:
+                        self.entries[entry['document']] = entry
+        self._file = open(path, 'a')
+        if torn:
+            self._file.write('\n')  # Keep the next entry off the torn line
+
+    def is_done(self, name, input_pdf):
+        """True if the document was encrypted and has not changed since"""
+        entry = self.entries.get(name)
+        if not entry or entry['status'] != STATUS_DONE:
+            return False
+        try:
+            return (entry['size'], entry['mtime_ns']) == file_signature(input_pdf)
+        except OSError:
+            return False
+
+    def append(self, entry):
+        if 'document' in entry:
+            self.entries[entry['document']] = entry
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def _document_result(name, input_pdf, output_dir):
+    size, mtime_ns = file_signature(input_pdf)
+    return {
+        'document': name,
+        'input': input_pdf,
+        'output_dir': output_dir,
+        'size': size,
+        'mtime_ns': mtime_ns,
+        'status': STATUS_DONE,
+        'pages': 0,
+        'bytes': 0,
+        'butterfly_time': 0,
+        'lede_time': 0,
+        'butterfly_cpu_time': 0,
+        'lede_cpu_time': 0
+    }
+
+
+def run_batch(documents, key, ciphers=CIPHERS, backend=None, workers=None, manifest=None, progress=None,
+              window=WINDOW_DOCUMENTS):
+    """Encrypt documents, a list of (document, input_pdf, output_dir), on one worker pool.
+
+    document is a unique id for the manifest. Outputs are written to output_dir, named as
+    for /encrypt_pdf, as soon as all pages of their document are done. Documents the
+    manifest lists as done are skipped. A document that fails to open, or whose pages
+    raise, is recorded as failed (its remaining pages are skipped) and the batch carries on.
+    progress(pages, total_pages) is called as pages finish; total_pages grows as documents
+    are opened. Returns the aggregate with the per-document results under 'documents'.
+    """
+    try:
+        backend = get_backend(backend)
+        workers = resolve_workers(backend, workers)
+        results = []
+        skipped = []
+        active = {}
+        opened = {'pages': 0}
+
+        def finish(result):
+            if result['status'] == STATUS_DONE:
+                outputs = {
+                    cipher: os.path.join(result['output_dir'], cipher_mode.output_name(cipher, result['input']))
+                    for cipher in ciphers
+                }
+                os.makedirs(result['output_dir'], exist_ok=True)
+                with tracing.span('pdf_write'):
+                    ingest.copy_file(result['input'], outputs.values())
+                result['outputs'] = outputs
+            result['finished'] = time.time()
+            results.append(result)
+            if manifest:
+                manifest.append(result)
+
+        def open_window(window_documents):
+            """Open a window of documents and schedule their pages"""
+            readers = []
+            for name, input_pdf, output_dir in window_documents:
+                try:
+                    result = _document_result(name, input_pdf, output_dir)
+                    reader = ingest.open_pdf(input_pdf)
+                    result['pages'] = len(reader.pages)
+                except Exception as e:
+                    print(f"Batch document error ({name}): {str(e)}")
+                    finish({'document': name, 'input': input_pdf, 'status': STATUS_FAILED, 'error': str(e)})
+                    continue
+                if not result['pages']:
+                    finish(result)
+                    continue
+                result['remaining'] = result['pages']
+                active[name] = result
+                opened['pages'] += result['pages']
+                readers.append((name, input_pdf, reader))
+            return schedule_documents(readers, workers) if readers else []
+
+        def advance(result, pages):
+            result['remaining'] -= pages
+            if not result['remaining']:
+                del active[result['document']], result['remaining']
+                finish(result)
+
+        def skip_failed(batches):
+            """Drop the batches of documents that have already failed"""
+            for batch in batches:
+                result = active[batch[0]]
+                if result['status'] == STATUS_FAILED:
+                    advance(result, len(batch[3]))
+                else:
+                    yield batch
+
+        pending = []
+        seen = set()
+        for document in documents:
+            if document[0] in seen:
+                continue  # Listed twice, e.g. as a file and under its directory
+            seen.add(document[0])
+            if manifest and manifest.is_done(document[0], document[1]):
+                skipped.append(document[0])
+            else:
+                pending.append(document)
+        windows = (pending[i:i + window] for i in range(0, len(pending), window))
+        batches = skip_failed(itertools.chain.from_iterable(open_window(w) for w in windows))
+
+        page_progress = (lambda done: progress(done, opened['pages'])) if progress else None
+        job_energy = energy.start_job()
+        worker_stats = {}
+        worker_cpu_time = 0
+        pipeline_start = time.perf_counter()
+        for name, indices, chunk in iter_document_batches(
+            batches, key, backend, workers, page_progress, worker_stats, ciphers, return_errors=True
+        ):
+            result = active[name]
+            if isinstance(chunk, Exception):
+                if result['status'] != STATUS_FAILED:
+                    print(f"Batch document error ({name}): {str(chunk)}")
+                    result['status'] = STATUS_FAILED
+                    result['error'] = str(chunk)
+            else:
+                for field in ('butterfly_time', 'lede_time', 'butterfly_cpu_time', 'lede_cpu_time', 'bytes'):
+                    result[field] += chunk[field]
+                worker_cpu_time += chunk['cpu_time']
+            advance(result, len(indices))
+        pipeline_time = time.perf_counter() - pipeline_start
+
+        done = [result for result in results if result['status'] == STATUS_DONE]
+        pages = sum(result['pages'] for result in done)
+        text_bytes = sum(result['bytes'] for result in done)
+        aggregate = {
+            'documents': results,
+            'done': len(done),
+            'failed': len(results) - len(done),
+            'skipped': len(skipped),
+            'pages': pages,
+            'bytes': text_bytes,
+            'input_bytes': sum(result['size'] for result in done),
+            'pipeline_time': pipeline_time,
+            'cpu_time': worker_cpu_time,
+            'workers': worker_stats,
+            'energy': None
+        }
+        for cipher in ciphers:
+            total_time = sum(result[f'{cipher}_time'] for result in done)
+            aggregate[f'{cipher}_total_time'] = total_time
+            aggregate[f'{cipher}_time'] = total_time / max(pages, 1)
+        for stats in worker_stats.values():
+            stats['utilization'] = stats['busy_time'] / pipeline_time if pipeline_time > 0 else 0
+        if job_energy:
+            # Per-document energy is the document's cipher CPU time times joules_per_cpu_second
+            aggregate['energy'] = job_energy.summarize(
+                sum(result['butterfly_cpu_time'] for result in done),
+                sum(result['lede_cpu_time'] for result in done),
+                text_bytes, pages
+            )
+        return aggregate
+    except Exception as e:
+        print(f"Batch encryption error: {str(e)}")
+        raise
+
+
+def encrypt_batch(documents, key, mode=None, backend=None, workers=None, manifest=None, progress=None,
+                  storage=None):
+    """run_batch in the given cipher mode, measured like a single upload.
+
+    If storage is given and both ciphers ran, the batch is saved as one run with
+    run_type 'batch', per-page average times and the total input size. The summary
+    (without per-document results) is appended to the manifest.
+    """
+    mode = cipher_mode.get_mode(mode)
+    window_start = resource_sampler.open_window()
+    cpu_start = time.thread_time()
+    try:
+        aggregate = run_batch(documents, key, cipher_mode.mode_ciphers(mode), backend, workers, manifest, progress)
+    except Exception:
+        resource_sampler.close_window(window_start)
+        raise
+    # This thread's and the page workers' CPU time, as for a single upload
+    resources = resource_sampler.close_window(window_start, time.thread_time() - cpu_start + aggregate['cpu_time'])
+
+    aggregate['mode'] = mode
+    aggregate['cpu_usage'] = resources['cpu_percent'] if resources else 0
+    aggregate['memory_usage'] = resources['rss_peak'] / psutil.virtual_memory().total * 100 if resources else 0
+    summary = {name: value for name, value in aggregate.items() if name != 'documents'}
+    summary['worker_utilization'] = {
+        worker: round(stats['utilization'], 4) for worker, stats in summary.pop('workers').items()
+    }
+    if manifest:
+        manifest.append({'batch': summary, 'finished': time.time()})
+
+    if storage is not None and mode == cipher_mode.MODE_COMPARE and aggregate['pages']:
+        extra = {
+            'run_type': cipher_mode.RUN_BATCH,
+            'batch': {name: summary[name] for name in ('done', 'failed', 'skipped', 'pages', 'pipeline_time')},
+            'worker_utilization': summary['worker_utilization'],
+            'resources': resources,
+            'energy': aggregate['energy']
+        }
+        with tracing.span('storage_write'):
+            aggregate['run_id'] = storage.save_run(
+                butterfly_time=aggregate[f'{CIPHER_BUTTERFLY}_time'],
+                lede_time=aggregate[f'{CIPHER_LEDE}_time'],
+                cpu_usage=aggregate['cpu_usage'],
+                memory_usage=aggregate['memory_usage'],
+                file_size=aggregate['input_bytes'] / 1024,  # KB
+                extra=extra
+            )['id']
+    return aggregate
+
+
+def main(argv=None):
+    from encrypt_file import load_or_create_key
+    from storage import PerformanceStorage
+
+    parser = argparse.ArgumentParser(description="Encrypt PDF files and directories on one worker pool")
+    parser.add_argument('inputs', nargs='+', metavar='INPUT', help="PDF files or directories of PDFs")
+    parser.add_argument('--output-dir', required=True)
+    parser.add_argument('--manifest', help=f"Resume manifest (default: OUTPUT_DIR/{MANIFEST_NAME})")
+    parser.add_argument('--key-file', help=f"Raw key file (default: OUTPUT_DIR/{KEY_NAME})")
+    parser.add_argument('--mode', choices=cipher_mode.MODES, help="Ciphers to run (default: PDF_CIPHER_MODE)")
+    parser.add_argument('--backend', choices=BACKENDS, help="Worker backend (default: PDF_WORKER_BACKEND)")
+    parser.add_argument('--workers', type=int, help="Pages in flight (default: the pool size)")
+    parser.add_argument('--no-history', action='store_true', help="Do not save the batch to the run history")
+    args = parser.parse_args(argv)
+
+    for path in args.inputs:
+        if not os.path.exists(path):
+            parser.error(f"Input not found: {path}")
+    os.makedirs(args.output_dir, exist_ok=True)
+    key = load_or_create_key(args.key_file or os.path.join(args.output_dir, KEY_NAME))
+    documents = find_pdfs(args.inputs, args.output_dir)
+    manifest = Manifest(args.manifest or os.path.join(args.output_dir, MANIFEST_NAME))
+    try:
+        aggregate = encrypt_batch(
+            documents, key, args.mode, args.backend, args.workers, manifest,
+            storage=None if args.no_history else PerformanceStorage()
+        )
+    finally:
+        manifest.close()
+
+    print(f"Encrypted {aggregate['done']} documents ({aggregate['pages']} pages) in "
+          f"{aggregate['pipeline_time']:.2f}s; {aggregate['skipped']} already done, {aggregate['failed']} failed")
+    if aggregate['failed']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad, unpad
+from time import perf_counter_ns
+import numpy as np
+
+BATCH_BLOCKS = 4096  # Blocks per slab; bounds the per-slab S-box table memory
+VECTORIZE_MIN_SBOXES = 32  # Below this, the per-sbox Python loop is cheaper than numpy overhead
+STREAM_CHUNK_SIZE = 1024 * 1024  # Bytes buffered before a streaming slab is encrypted
+
+
+class NonInvertibleSBoxError(ValueError):
+    """Raised when decryption needs the inverse of an S-box that is not a permutation"""
+
+    def __init__(self, message, round_numbers):
+        super().__init__(message)
+        self.round_numbers = round_numbers
+
+
+def as_blocks(data):
+    """View a padded byte string as an [nblocks, 16] uint8 array without copying"""
+    return np.frombuffer(data, dtype=np.uint8).reshape(-1, AES.block_size)
+
+
+def iter_slabs(nblocks, slab_size=BATCH_BLOCKS):
+    """Yield (start, stop) block ranges covering nblocks"""
+    for start in range(0, nblocks, slab_size):
+        yield start, min(start + slab_size, nblocks)
+
+
+def stack_sboxes(sboxes):
+    """Stack a list of 256-byte S-boxes into an [n, 256] uint8 table"""
+    return np.frombuffer(b''.join(sboxes), dtype=np.uint8).reshape(-1, 256)
+
+
+def butterfly_sboxes(key, round_numbers):
+    """Generate butterfly S-boxes for many round numbers at once.
+
+    Runs the same three forward/reverse passes as ButterflyAES.generate_butterfly_sbox,
+    one step at a time across every requested round, and returns an [n, 256] uint8 table
+    whose rows are byte-identical to the scalar version.
+    """
+    rn = np.asarray(round_numbers, dtype=np.int64)
+    n = len(rn)
+    base = np.arange(n, dtype=np.int64) * 256
+    key_arr = np.frombuffer(bytes(key), dtype=np.uint8).astype(np.int64)
+    round_key = ((key_arr[None, :16] + rn[:, None]) % 256).ravel()
+    key_base = np.arange(n, dtype=np.int64) * min(len(key_arr), 16)
+
+    sbox = np.tile(np.arange(256, dtype=np.int64), n)
+
+    for pass_num in range(3):
+        # Forward transformation
+        for i in range(256):
+            idx_i = base + i
+            idx_j = base + (i + round_key[key_base + (i % 16)] + pass_num) % 256
+            si = sbox[idx_i]
+            sj = sbox[idx_j]
+            sbox[idx_i] = sj
+            sbox[idx_j] = si
+
+            # Butterfly effect
+            idx_k = base + (si + sj + rn) % 256
+            sbox[idx_k] = (sbox[idx_k] * 7 + rn) % 256
+
+        # Reverse transformation
+        for i in range(255, -1, -1):
+            idx_i = base + i
+            si = sbox[idx_i]
+            idx_j = base + (si + round_key[key_base + (i * rn) % 16]) % 256
+            sj = sbox[idx_j]
+            sbox[idx_i] = sj
+            sbox[idx_j] = si
+
+    return sbox.reshape(n, 256).astype(np.uint8)
+
+
+def invert_sboxes(tables, round_numbers):
+    """Invert an [n, 256] table of S-boxes row by row.
+
+    Raises NonInvertibleSBoxError naming the block round numbers whose S-boxes are not
+    bijections, i.e. where some output value is missing because another appears twice.
+    """
+    n = len(tables)
+    inverse = np.full((n, 256), -1, dtype=np.int16)
+    rows = np.arange(n)[:, None]
+    inverse[rows, tables] = np.arange(256, dtype=np.int16)
+    bad = np.flatnonzero((inverse < 0).any(axis=1))
+    if len(bad):
+        bad_rounds = [round_numbers[row] for row in bad]
+        distinct = len(np.unique(tables[bad[0]]))
+        raise NonInvertibleSBoxError(
+            f"S-box for round_number {bad_rounds[0]} is not a bijection "
+            f"({distinct} distinct outputs; {len(bad)} of {n} S-boxes in this slab affected), "
+            f"so the ciphertext cannot be decrypted",
+            bad_rounds
+        )
+    return inverse.astype(np.uint8)
+
+
+def add_stage_time(stage_times, stage, started_ns):
+    """Accumulate nanoseconds since started_ns under stage; returns the current time"""
+    now = perf_counter_ns()
+    stage_times[stage] = stage_times.get(stage, 0) + now - started_ns
+    return now
+
+
+def encrypt_rounds(cipher, blocks, tables, rounds, stage_times=None):
+    """Run `rounds` of per-block substitution followed by one ECB call over the whole slab.
+
+    `tables` is either an [n, 256] array applied in every round, or a callable taking the
+    round index and returning that round's [n, 256] array. Returns the ciphertext bytes.
+    If a `stage_times` dict is given, nanoseconds spent in 'substitution' and 'aes' are
+    added to it.
+    """
+    n = len(blocks)
+    offsets = np.repeat(np.arange(n, dtype=np.intp) * 256, AES.block_size)
+    state = np.array(blocks, dtype=np.uint8).reshape(-1)
+    out = np.empty_like(state)
+
+    for round_idx in range(rounds):
+        if stage_times is not None:
+            started = perf_counter_ns()
+        table = tables(round_idx) if callable(tables) else tables
+        substituted = table.ravel()[offsets + state]
+        if stage_times is not None:
+            started = add_stage_time(stage_times, 'substitution', started)
+        cipher.encrypt(memoryview(substituted), output=memoryview(out))
+        if stage_times is not None:
+            add_stage_time(stage_times, 'aes', started)
+        state, out = out, state
+
+    return state.tobytes()
+
+
+def encrypt_message(key, padded_data, tables_for_slab, rounds, slab_size=BATCH_BLOCKS, first_block=0,
+                    stage_times=None):
+    """Encrypt a padded message slab by slab.
+
+    `tables_for_slab(start, stop)` returns the table argument of encrypt_rounds for
+    blocks [start, stop); block i uses round_number i + 1 as in the per-block path.
+    `first_block` offsets the block indices when the data continues an earlier stream.
+    With `stage_times`, time spent in tables_for_slab is added under 'sbox_generation'.
+    """
+    cipher = AES.new(key, AES.MODE_ECB)
+    blocks = as_blocks(padded_data)
+    encrypted = []
+
+    for start, stop in iter_slabs(len(blocks), slab_size):
+        if stage_times is not None:
+            started = perf_counter_ns()
+        tables = tables_for_slab(first_block + start, first_block + stop)
+        if stage_times is not None:
+            add_stage_time(stage_times, 'sbox_generation', started)
+        encrypted.append(encrypt_rounds(cipher, blocks[start:stop], tables, rounds, stage_times))
+
+    return b''.join(encrypted)
+
+
+def decrypt_rounds(cipher, blocks, inverse_tables, rounds):
+    """Undo encrypt_rounds: one ECB decryption over the slab, then the inverse substitution.
+
+    `inverse_tables` has the same shape conventions as the `tables` of encrypt_rounds.
+    """
+    n = len(blocks)
+    offsets = np.repeat(np.arange(n, dtype=np.intp) * 256, AES.block_size)
+    state = np.array(blocks, dtype=np.uint8).reshape(-1)
+    out = np.empty_like(state)
+
+    for round_idx in range(rounds - 1, -1, -1):
+        table = inverse_tables(round_idx) if callable(inverse_tables) else inverse_tables
+        cipher.decrypt(memoryview(state), output=memoryview(out))
+        state = table.ravel()[offsets + out]
+
+    return state.tobytes()
+
+
+def decrypt_message(key, ciphertext, inverse_tables_for_slab, rounds, slab_size=BATCH_BLOCKS, first_block=0):
+    """Decrypt whole blocks slab by slab; the result is still padded"""
+    if len(ciphertext) % AES.block_size:
+        raise ValueError("Ciphertext length is not a multiple of the block size")
+    cipher = AES.new(key, AES.MODE_ECB)
+    blocks = as_blocks(ciphertext)
+    return b''.join(
+        decrypt_rounds(
+            cipher, blocks[start:stop],
+            inverse_tables_for_slab(first_block + start, first_block + stop), rounds
+        )
+        for start, stop in iter_slabs(len(blocks), slab_size)
+    )
+
+
+def iter_chunks(source, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield byte chunks from a readable binary stream or an iterable of chunks"""
+    if hasattr(source, 'read'):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        for chunk in source:
+            if chunk:
+                yield chunk
+
+
+def encrypt_stream(key, source, tables_for_slab, rounds, chunk_size=STREAM_CHUNK_SIZE):
+    """Encrypt a stream in bounded memory, yielding ciphertext chunks.
+
+    Whole blocks are encrypted as soon as about chunk_size bytes are buffered, with block
+    indices continuing across chunks. PKCS7 padding is applied only to the trailing
+    partial block, so the concatenated output equals encrypt_message over pad(data).
+    """
+    pending = bytearray()
+    next_block = 0
+
+    for chunk in iter_chunks(source, chunk_size):
+        pending += chunk
+        if len(pending) < chunk_size:
+            continue
+        full = len(pending) - len(pending) % AES.block_size
+        yield encrypt_message(
+            key, bytes(pending[:full]), tables_for_slab, rounds, first_block=next_block
+        )
+        del pending[:full]
+        next_block += full // AES.block_size
+
+    yield encrypt_message(
+        key, pad(bytes(pending), AES.block_size), tables_for_slab, rounds, first_block=next_block
+    )
+
+
+def decrypt_stream(key, source, inverse_tables_for_slab, rounds, chunk_size=STREAM_CHUNK_SIZE):
+    """Decrypt a stream produced by encrypt_stream, yielding plaintext chunks.
+
+    The final block is held back until the stream ends so its padding can be removed.
+    """
+    pending = bytearray()
+    next_block = 0
+
+    for chunk in iter_chunks(source, chunk_size):
+        pending += chunk
+        if len(pending) < chunk_size + AES.block_size:
+            continue
+        full = len(pending) - len(pending) % AES.block_size - AES.block_size
+        yield decrypt_message(
+            key, bytes(pending[:full]), inverse_tables_for_slab, rounds, first_block=next_block
+        )
+        del pending[:full]
+        next_block += full // AES.block_size
+
+    if not pending:
+        raise ValueError("Ciphertext is empty")
+    padded = decrypt_message(
+        key, bytes(pending), inverse_tables_for_slab, rounds, first_block=next_block
+    )
+    yield unpad(padded, AES.block_size)
@@ -0,0 +1,346 @@
+"""Benchmark harness for the Concept prototypes, ButterflyAES and LEDECipher.
+
+Usage:
+    python benchmark.py run [--sizes 16,4096,1048576] [--repetitions 20] [--output results.json]
+    python benchmark.py run --baseline baseline.json        # run, then flag regressions
+    python benchmark.py compare baseline.json results.json [--threshold 0.10]
+    python benchmark.py decrypt [--size BYTES] [--repeat N]
+    python benchmark.py random [--count N]                   # csprng pool vs secrets
+
+Every measurement uses time.perf_counter_ns after warmup runs. Each repetition encrypts
+a message from scratch, S-box generation included, so all targets are measured alike;
+the per-stage breakdown splits that total into S-box generation, substitution and AES.
+"""
+import argparse
+import json
+import os
+import platform
+import secrets
+import sys
+import time
+from datetime import datetime
+import numpy as np
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad
+import csprng
+from ciphers import ButterflyAES, LEDECipher
+from batch_engine import NonInvertibleSBoxError, encrypt_message
+from sbox_cache import SBoxCache, butterfly_sbox_cache, lede_table_cache
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Concept'))
+import timebased_aes  # noqa: E402
+import butterflybased_aes  # noqa: E402
+
+KB = 1024
+MB = 1024 * KB
+DEFAULT_SIZES = [16, 256, 4 * KB, 64 * KB, 1 * MB, 16 * MB, 64 * MB]
+DEFAULT_REPETITIONS = 20
+DEFAULT_WARMUP = 2
+DEFAULT_MAX_SECONDS = 30.0  # Per target and size; repetitions stop early past this budget
+DEFAULT_THRESHOLD = 0.10
+STAGES = ('sbox_generation', 'substitution', 'aes')
+
+
+def concept_target(generate_sbox, module):
+    """Concept prototypes: one S-box per message, one substitution pass, one AES pass"""
+    def run(plaintext, key, stage_times):
+        started = time.perf_counter_ns()
+        sbox = generate_sbox()
+        after_sbox = time.perf_counter_ns()
+        substituted = module.substitute_bytes_dynamic(pad(plaintext, AES.block_size), sbox)
+        after_substitution = time.perf_counter_ns()
+        AES.new(key, AES.MODE_ECB).encrypt(substituted)
+        finished = time.perf_counter_ns()
+
+        stage_times['sbox_generation'] = after_sbox - started
+        stage_times['substitution'] = after_substitution - after_sbox
+        stage_times['aes'] = finished - after_substitution
+    return run
+
+
+def butterfly_target(plaintext, key, stage_times):
+    """ButterflyAES with a cold S-box cache, as for the first page under a new key"""
+    butterfly = ButterflyAES(sbox_cache=SBoxCache())
+    encrypt_message(
+        key, pad(plaintext, AES.block_size), butterfly.slab_tables(key), butterfly.rounds,
+        stage_times=stage_times
+    )
+
+
+def lede_target(plaintext, key, stage_times):
+    """LEDECipher with fresh parameters and table set, as for every encrypt() call"""
+    lede = LEDECipher(table_cache=SBoxCache())
+    system_time, params = lede.generate_params()
+    encrypt_message(
+        key, pad(plaintext, AES.block_size), lede.slab_tables(system_time, params), lede.rounds,
+        stage_times=stage_times
+    )
+
+
+TARGETS = {
+    'concept_time': concept_target(timebased_aes.generate_dynamic_sbox_time, timebased_aes),
+    'concept_butterfly': concept_target(
+        butterflybased_aes.generate_dynamic_sbox_butterfly, butterflybased_aes
+    ),
+    'butterfly': butterfly_target,
+    'lede': lede_target,
+}
+
+
+def percentiles(samples):
+    values = np.asarray(samples, dtype=np.float64)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'p50': float(p50),
+        'p95': float(p95),
+        'p99': float(p99),
+        'mean': float(values.mean()),
+        'min': float(values.min()),
+        'max': float(values.max())
+    }
+
+
+def measure(target, size, repetitions, warmup, max_seconds):
+    """Time one target at one message size; returns a result record"""
+    key = os.urandom(16)
+    plaintext = os.urandom(size)
+    run = TARGETS[target]
+
+    for _ in range(warmup):
+        run(plaintext, key, {})
+
+    totals = []
+    stages = {stage: [] for stage in STAGES}
+    deadline = time.perf_counter() + max_seconds
+    for _ in range(repetitions):
+        stage_times = {}
+        started = time.perf_counter_ns()
+        run(plaintext, key, stage_times)
+        totals.append(time.perf_counter_ns() - started)
+        for stage in STAGES:
+            stages[stage].append(stage_times.get(stage, 0))
+        if time.perf_counter() > deadline:
+            break
+
+    latency = percentiles(totals)
+    return {
+        'target': target,
+        'size': size,
+        'repetitions': len(totals),
+        'latency_ns': latency,
+        'throughput_mb_s': size / MB / (latency['p50'] / 1e9) if latency['p50'] else 0,
+        'stages_ns': {stage: percentiles(samples) for stage, samples in stages.items()}
+    }
+
+
+def run_benchmarks(targets, sizes, repetitions, warmup, max_seconds, progress=None):
+    results = []
+    for target in targets:
+        for size in sizes:
+            result = measure(target, size, repetitions, warmup, max_seconds)
+            results.append(result)
+            if progress:
+                progress(result)
+    return {
+        'meta': {
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'cpu_count': os.cpu_count(),
+            'repetitions': repetitions,
+            'warmup': warmup,
+            'max_seconds': max_seconds
+        },
+        'results': results
+    }
+
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Pair results by (target, size) and flag p50 latency increases beyond threshold"""
+    previous = {(r['target'], r['size']): r for r in baseline['results']}
+    comparisons = []
+    for result in current['results']:
+        before = previous.get((result['target'], result['size']))
+        if before is None:
+            continue
+        old_p50 = before['latency_ns']['p50']
+        new_p50 = result['latency_ns']['p50']
+        change = (new_p50 - old_p50) / old_p50 if old_p50 else 0
+        comparisons.append({
+            'target': result['target'],
+            'size': result['size'],
+            'baseline_p50_ns': old_p50,
+            'current_p50_ns': new_p50,
+            'change': change,
+            'regression': change > threshold
+        })
+    return comparisons
+
+
+def format_size(size):
+    for unit, scale in (('MB', MB), ('KB', KB)):
+        if size >= scale:
+            return f"{size / scale:g} {unit}"
+    return f"{size} B"
+
+
+def print_result(result):
+    latency = result['latency_ns']
+    stages = ' '.join(
+        f"{stage}={result['stages_ns'][stage]['p50'] / 1e6:.3f}ms" for stage in STAGES
+    )
+    print(f"{result['target']:18s} {format_size(result['size']):>8s} "
+          f"p50={latency['p50'] / 1e6:10.3f}ms p95={latency['p95'] / 1e6:10.3f}ms "
+          f"p99={latency['p99'] / 1e6:10.3f}ms {result['throughput_mb_s']:9.3f} MB/s "
+          f"n={result['repetitions']} {stages}", file=sys.stderr)
+
+
+def print_comparisons(comparisons):
+    for c in comparisons:
+        flag = 'REGRESSION' if c['regression'] else 'ok'
+        print(f"{c['target']:18s} {format_size(c['size']):>8s} "
+              f"{c['baseline_p50_ns'] / 1e6:10.3f}ms -> {c['current_p50_ns'] / 1e6:10.3f}ms "
+              f"({c['change'] * 100:+.1f}%) {flag}", file=sys.stderr)
+
+
+def throughput(func, size, repeat):
+    """Best-of-repeat throughput of func() in MB/s"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return size / best / (1024 * 1024)
+
+
+def run_decrypt_benchmark(size, repeat):
+    key = os.urandom(16)
+    plaintext = os.urandom(size)
+    results = {}
+
+    butterfly = ButterflyAES()
+    butterfly_ct = butterfly.encrypt(plaintext, key)
+    results['butterfly_encrypt'] = throughput(lambda: butterfly.encrypt(plaintext, key), size, repeat)
+    try:
+        results['butterfly_decrypt'] = throughput(lambda: butterfly.decrypt(butterfly_ct, key), size, repeat)
+    except NonInvertibleSBoxError as e:
+        results['butterfly_decrypt'] = f"unsupported ({e})"
+
+    lede = LEDECipher()
+    encrypted = lede.encrypt(plaintext, key)
+    args = (key, encrypted['system_time'], encrypted['params'])
+    results['lede_encrypt'] = throughput(lambda: lede.encrypt(plaintext, key), size, repeat)
+    results['lede_decrypt'] = throughput(lambda: lede.decrypt(encrypted['ciphertext'], *args), size, repeat)
+
+    results['butterfly_cache'] = butterfly_sbox_cache.stats()
+    results['lede_cache'] = lede_table_cache.stats()
+    return results
+
+
+def run_random_benchmark(count, batch=1000):
+    """Keys and LEDE parameter triples per second: per-call secrets vs the csprng pool"""
+    cases = {
+        'secrets_key': lambda: secrets.token_bytes(16),
+        'pool_key': lambda: csprng.token_bytes(16),
+        'secrets_params': lambda: (secrets.randbelow(256), secrets.randbelow(256), secrets.randbelow(256)),
+        'pool_params': csprng.lede_params,
+    }
+    batched = {
+        'pool_keys_batch': lambda: csprng.token_keys(batch),
+        'pool_params_batch': lambda: csprng.lede_params(batch),
+    }
+    results = {}
+    for name, func in cases.items():
+        started = time.perf_counter_ns()
+        for _ in range(count):
+            func()
+        results[name] = count / ((time.perf_counter_ns() - started) / 1e9)
+    for name, func in batched.items():
+        started = time.perf_counter_ns()
+        for _ in range(max(1, count // batch)):
+            func()
+        results[name] = max(1, count // batch) * batch / ((time.perf_counter_ns() - started) / 1e9)
+    return results
+
+
+def parse_sizes(value):
+    return [int(size) for size in value.split(',') if size]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cipher benchmark harness")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="Run the benchmark sweep and emit JSON")
+    run.add_argument('--targets', default=','.join(TARGETS),
+                     help=f"Comma-separated subset of {', '.join(TARGETS)}")
+    run.add_argument('--sizes', type=parse_sizes, default=DEFAULT_SIZES,
+                     help="Comma-separated message sizes in bytes (default: 16 B to 64 MB)")
+    run.add_argument('--repetitions', type=int, default=DEFAULT_REPETITIONS)
+    run.add_argument('--warmup', type=int, default=DEFAULT_WARMUP)
+    run.add_argument('--max-seconds', type=float, default=DEFAULT_MAX_SECONDS,
+                     help="Time budget per target and size")
+    run.add_argument('--output', help="Write JSON here instead of stdout")
+    run.add_argument('--baseline', help="Compare against this earlier JSON output")
+    run.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+
+    compare = commands.add_parser('compare', help="Flag regressions between two JSON outputs")
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+
+    decrypt = commands.add_parser('decrypt', help="Encrypt/decrypt throughput")
+    decrypt.add_argument('--size', type=int, default=256 * 1024)
+    decrypt.add_argument('--repeat', type=int, default=3)
+
+    random_cmd = commands.add_parser('random', help="CSPRNG pool vs secrets throughput")
+    random_cmd.add_argument('--count', type=int, default=200000)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'random':
+        for name, value in run_random_benchmark(args.count).items():
+            print(f"{name:20s} {value:14.0f} ops/s")
+        return
+
+    if args.command == 'decrypt':
+        for name, value in run_decrypt_benchmark(args.size, args.repeat).items():
+            if isinstance(value, float):
+                print(f"{name:20s} {value:10.3f} MB/s")
+            else:
+                print(f"{name:20s} {value}")
+        return
+
+    if args.command == 'compare':
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        targets = [target for target in args.targets.split(',') if target]
+        unknown = set(targets) - set(TARGETS)
+        if unknown:
+            parser.error(f"Unknown targets: {', '.join(sorted(unknown))}")
+        current = run_benchmarks(
+            targets, args.sizes, args.repetitions, args.warmup, args.max_seconds, print_result
+        )
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(current, f, indent=2)
+        else:
+            json.dump(current, sys.stdout, indent=2)
+            print()
+        if not args.baseline:
+            return
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    comparisons = compare_results(baseline, current, args.threshold)
+    print_comparisons(comparisons)
+    if any(c['regression'] for c in comparisons):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
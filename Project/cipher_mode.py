@@ -0,0 +1,56 @@
+"""Which ciphers run on the request path, and how often the other one is shadow-compared.
+
+PDF_CIPHER_MODE=compare (default) encrypts every upload with both ciphers, as before.
+PDF_CIPHER_MODE=butterfly or lede serves only that cipher; a PDF_SHADOW_SAMPLE_RATE share
+of uploads is then re-encrypted with the other cipher by a background shadow job, and
+only those sampled comparisons are added to the run history.
+"""
+import os
+import random
+
+CIPHER_BUTTERFLY = 'butterfly'
+CIPHER_LEDE = 'lede'
+CIPHERS = (CIPHER_BUTTERFLY, CIPHER_LEDE)
+MODE_COMPARE = 'compare'
+MODES = (MODE_COMPARE,) + CIPHERS
+
+# History tags in the run's extra fields
+RUN_COMPARE = 'compare'  # Both ciphers on the request path
+RUN_SHADOW = 'shadow'  # Primary cipher on the request path, the other in a shadow job
+RUN_BATCH = 'batch'  # Aggregate of a multi-document batch (batch.py, /encrypt_batch)
+
+DEFAULT_SHADOW_SAMPLE_RATE = 0.05
+OUTPUT_PREFIXES = {CIPHER_BUTTERFLY: 'butterfly', CIPHER_LEDE: 'time'}
+
+
+def get_mode(mode=None):
+    """Resolve the execution mode from the argument or PDF_CIPHER_MODE"""
+    mode = (mode or os.environ.get('PDF_CIPHER_MODE', MODE_COMPARE)).lower()
+    if mode not in MODES:
+        raise ValueError(f"Unknown cipher mode: {mode}")
+    return mode
+
+
+def mode_ciphers(mode):
+    """Ciphers run on the request path in this mode"""
+    return CIPHERS if mode == MODE_COMPARE else (mode,)
+
+
+def output_name(cipher, input_pdf):
+    """File name of a cipher's encrypted copy of input_pdf"""
+    return f"{OUTPUT_PREFIXES[cipher]}_encrypted_{os.path.basename(input_pdf)}"
+
+
+def other_cipher(cipher):
+    return CIPHER_LEDE if cipher == CIPHER_BUTTERFLY else CIPHER_BUTTERFLY
+
+
+def shadow_sample_rate():
+    rate = float(os.environ.get('PDF_SHADOW_SAMPLE_RATE', DEFAULT_SHADOW_SAMPLE_RATE))
+    return min(max(rate, 0.0), 1.0)
+
+
+def should_shadow(rate=None):
+    """Sampling decision for one upload (not security sensitive, so plain random)"""
+    rate = shadow_sample_rate() if rate is None else rate
+    return rate > 0 and random.random() < rate
@@ -0,0 +1,313 @@
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad, unpad
+import csprng
+import shared_tables
+import time
+import hashlib
+import struct
+from sbox_cache import butterfly_sbox_cache, key_fingerprint, lede_table_cache
+from lede_tables import LEDETableSet
+from batch_engine import (
+    STREAM_CHUNK_SIZE, VECTORIZE_MIN_SBOXES, butterfly_sboxes,
+    decrypt_message, decrypt_stream, encrypt_message, encrypt_stream, invert_sboxes, stack_sboxes
+)
+
+class ButterflyAES:
+    def __init__(self, sbox_cache=None):
+        self.rounds = 12  # Increased rounds for better comparison
+        self.sbox_cache = sbox_cache if sbox_cache is not None else butterfly_sbox_cache
+        
+    def generate_butterfly_sbox(self, key, round_number):
+        """Generate more complex S-box using butterfly effect"""
+        sbox = bytearray(range(256))
+        
+        # Add round-specific complexity
+        round_key = bytes([(b + round_number) % 256 for b in key])
+        
+        # Multiple transformation passes
+        for pass_num in range(3):
+            # Forward transformation
+            for i in range(256):
+                j = (i + round_key[i % 16] + pass_num) % 256
+                sbox[i], sbox[j] = sbox[j], sbox[i]
+                
+                # Add butterfly effect
+                k = (sbox[i] + sbox[j] + round_number) % 256
+                sbox[k] = (sbox[k] * 7 + round_number) % 256
+            
+            # Reverse transformation
+            for i in range(255, -1, -1):
+                j = (sbox[i] + round_key[(i * round_number) % 16]) % 256
+                sbox[i], sbox[j] = sbox[j], sbox[i]
+        
+        return bytes(sbox)
+
+    def get_sbox(self, key, round_number, fingerprint=None):
+        """Return the S-box for (key, round_number), generating it only on a cache miss"""
+        if fingerprint is None:
+            fingerprint = key_fingerprint(key)
+        shared = shared_tables.lookup(fingerprint, range(round_number, round_number + 1))
+        if shared is not None:
+            return shared[0].tobytes()
+        return self.sbox_cache.get_or_create(
+            (fingerprint, round_number),
+            lambda: self.generate_butterfly_sbox(key, round_number)
+        )
+
+    def get_sboxes(self, key, round_numbers, fingerprint=None):
+        """Return an [n, 256] table of S-boxes, batch-generating all cache misses at once.
+
+        Keys precomputed in the shared table segment are served from it without copying.
+        """
+        if fingerprint is None:
+            fingerprint = key_fingerprint(key)
+        if not isinstance(round_numbers, range):
+            round_numbers = list(round_numbers)
+        shared = shared_tables.lookup(fingerprint, round_numbers)
+        if shared is not None:
+            return shared
+        round_numbers = list(round_numbers)
+        cache_keys = [(fingerprint, round_number) for round_number in round_numbers]
+        sboxes = self.sbox_cache.get_many(cache_keys)
+        missing = [idx for idx, sbox in enumerate(sboxes) if sbox is None]
+        
+        if len(missing) >= VECTORIZE_MIN_SBOXES:
+            generated = butterfly_sboxes(key, [round_numbers[idx] for idx in missing])
+            for idx, row in zip(missing, generated):
+                sboxes[idx] = row.tobytes()
+                self.sbox_cache.put(cache_keys[idx], sboxes[idx])
+        else:
+            for idx in missing:
+                sboxes[idx] = self.generate_butterfly_sbox(key, round_numbers[idx])
+                self.sbox_cache.put(cache_keys[idx], sboxes[idx])
+        
+        return stack_sboxes(sboxes)
+
+    def slab_tables(self, key):
+        """Return the tables_for_slab callback used by the batch engine for this key"""
+        fingerprint = key_fingerprint(key)
+        return lambda start, stop: self.get_sboxes(key, range(start + 1, stop + 1), fingerprint)
+
+    def inverse_slab_tables(self, key):
+        """Return the batch engine callback producing inverse S-boxes for decryption.
+
+        generate_butterfly_sbox overwrites entries in place, so its S-boxes usually repeat
+        some outputs; decryption then raises NonInvertibleSBoxError.
+        """
+        fingerprint = key_fingerprint(key)
+        
+        def inverse_tables(start, stop):
+            round_numbers = range(start + 1, stop + 1)
+            return invert_sboxes(self.get_sboxes(key, round_numbers, fingerprint), round_numbers)
+        
+        return inverse_tables
+
+    def encrypt_block(self, block, key, round_number, fingerprint=None):
+        """Encrypt a single block with round-specific S-box"""
+        sbox = self.get_sbox(key, round_number, fingerprint)
+        cipher = AES.new(key, AES.MODE_ECB)
+        
+        # Apply multiple rounds
+        result = block
+        for _ in range(self.rounds):
+            result = bytes(sbox[b] for b in result)
+            result = cipher.encrypt(result)
+        
+        return result
+
+    def encrypt(self, plaintext, key, stage_times=None):
+        """Perform enhanced butterfly-based encryption (stage_times: see encrypt_message)"""
+        try:
+            padded_data = pad(plaintext, AES.block_size)
+            
+            # Block i still uses round_number i + 1, but each slab of blocks goes
+            # through substitution and AES together
+            return encrypt_message(key, padded_data, self.slab_tables(key), self.rounds, stage_times=stage_times)
+        except Exception as e:
+            print(f"Butterfly encryption error: {str(e)}")
+            raise
+
+    def encrypt_stream(self, source, key, chunk_size=STREAM_CHUNK_SIZE):
+        """Encrypt a binary stream or iterable of chunks, yielding ciphertext chunks"""
+        return encrypt_stream(key, source, self.slab_tables(key), self.rounds, chunk_size)
+
+    def decrypt(self, ciphertext, key):
+        """Reverse encrypt(); fails with NonInvertibleSBoxError if any S-box is not a bijection"""
+        try:
+            padded_data = decrypt_message(key, ciphertext, self.inverse_slab_tables(key), self.rounds)
+            return unpad(padded_data, AES.block_size)
+        except Exception as e:
+            print(f"Butterfly decryption error: {str(e)}")
+            raise
+
+    def decrypt_stream(self, source, key, chunk_size=STREAM_CHUNK_SIZE):
+        """Decrypt a stream produced by encrypt_stream, yielding plaintext chunks"""
+        return decrypt_stream(key, source, self.inverse_slab_tables(key), self.rounds, chunk_size)
+
+class LEDECipher:
+    def __init__(self, table_cache=None):
+        self.rounds = 12
+        self.table_cache = table_cache if table_cache is not None else lede_table_cache
+        
+    def generate_time_arrays(self, system_time, alpha, beta, gamma, round_number):
+        """Generate time arrays with round-specific modifications"""
+        # Counters past 2**64 wrap instead of overflowing, so very long streams stay encryptable
+        time_bytes = struct.pack('>Q', (system_time * round_number) % (1 << 64)) * 16
+        
+        KA = bytearray(time_bytes)
+        KB = bytearray(time_bytes)
+        KC = bytearray(128)
+        
+        for pass_num in range(3):
+            for i in range(64):
+                KB[i] = (KB[i] + alpha + round_number * pass_num) % 256
+                KB[127-i] = (KB[127-i] + beta + round_number * pass_num) % 256
+                KB[i], KB[127-i] = KB[127-i], KB[i]
+                
+                mid = (KB[i] * KB[127-i] + gamma) % 256
+                KB[i] = (KB[i] + mid) % 256
+                KB[127-i] = (KB[127-i] ^ mid) % 256
+            
+            for i in range(128):
+                KC[i] = (KA[i] * KB[i] + gamma * round_number + pass_num) % 256
+                KA[i] = (KA[i] + KC[i]) % 256
+        
+        return KA, KB, KC
+
+    def generate_sbox(self, KA, KB, KC, round_number):
+        """Generate dynamic S-box"""
+        sbox = []
+        used_values = set()
+        
+        for pass_num in range(3):
+            for arr in [KA, KB, KC]:
+                for i, value in enumerate(arr):
+                    modified_value = (value * round_number + pass_num) % 256
+                    if modified_value not in used_values:
+                        sbox.append(modified_value)
+                        used_values.add(modified_value)
+        
+        remaining = set(range(256)) - used_values
+        for value in sorted(remaining, reverse=bool(round_number % 2)):
+            sbox.append(value)
+            
+        return bytes(sbox[:256])
+
+    def generate_params(self):
+        """Draw fresh alpha, beta, gamma and the current system time in milliseconds"""
+        alpha, beta, gamma = csprng.lede_params()
+        system_time = int(time.time() * 1000)
+        return system_time, (alpha, beta, gamma)
+
+    def generate_params_batch(self, count):
+        """generate_params for count messages at once, sharing one system time"""
+        system_time = int(time.time() * 1000)
+        return [(system_time, params) for params in csprng.lede_params(count)]
+
+    def verification_message(self, system_time, params):
+        alpha, beta, gamma = params
+        return hashlib.sha256(f"{system_time}{alpha}{beta}{gamma}".encode()).hexdigest()
+
+    def get_tables(self, system_time, params):
+        """Return the shared LEDETableSet for (system_time, params), building it on first use"""
+        cache_key = (system_time, tuple(params), self.rounds)
+        return self.table_cache.get_or_create(
+            cache_key, lambda: LEDETableSet(system_time, params, self.rounds)
+        )
+
+    def slab_tables(self, system_time, params):
+        """Return the batch engine callback producing round tables for these parameters"""
+        tables = self.get_tables(system_time, params)
+        return lambda start, stop: tables.round_tables(start, stop).__getitem__
+
+    def inverse_slab_tables(self, system_time, params):
+        """Return the batch engine callback producing inverse round tables for decryption"""
+        tables = self.get_tables(system_time, params)
+        return lambda start, stop: tables.inverse_round_tables(start, stop).__getitem__
+
+    def encrypt_block(self, block, key, system_time, params, round_number):
+        """Encrypt a single block"""
+        alpha, beta, gamma = params
+        KA, KB, KC = self.generate_time_arrays(system_time, alpha, beta, gamma, round_number)
+        
+        cipher = AES.new(key, AES.MODE_ECB)
+        result = block
+        
+        for round_idx in range(self.rounds):
+            round_sbox = self.generate_sbox(KA, KB, KC, round_idx + 1)
+            result = bytes(round_sbox[b] for b in result)
+            result = cipher.encrypt(result)
+        
+        return result
+
+    def encrypt(self, plaintext, key, stage_times=None):
+        """Perform LEDE encryption (stage_times: see encrypt_message)"""
+        try:
+            system_time, params = self.generate_params()
+            padded_data = pad(plaintext, AES.block_size)
+            tables = self.get_tables(system_time, params)
+            
+            ciphertext = encrypt_message(
+                key, padded_data,
+                lambda start, stop: tables.round_tables(start, stop).__getitem__,
+                self.rounds, stage_times=stage_times
+            )
+            # Re-insert so the cache accounts for the time arrays retained during encryption
+            self.table_cache.put((system_time, params, self.rounds), tables)
+            
+            return {
+                'ciphertext': ciphertext,
+                'system_time': system_time,
+                'params': params,
+                've': self.verification_message(system_time, params)
+            }
+        except Exception as e:
+            print(f"LEDE encryption error: {str(e)}")
+            raise
+
+    def encrypt_stream(self, source, key, system_time, params, chunk_size=STREAM_CHUNK_SIZE):
+        """Encrypt a binary stream or iterable of chunks under fixed LEDE parameters.
+
+        Yields ciphertext chunks. Draw system_time and params with generate_params and keep
+        them (with verification_message) alongside the output, as encrypt() returns them.
+        """
+        params = tuple(params)
+        tables = self.get_tables(system_time, params)
+        yield from encrypt_stream(
+            key, source,
+            lambda start, stop: tables.round_tables(start, stop).__getitem__,
+            self.rounds, chunk_size
+        )
+        self.table_cache.put((system_time, params, self.rounds), tables)
+
+    def check_verification(self, system_time, params, ve):
+        if ve is not None and ve != self.verification_message(system_time, params):
+            raise ValueError("Verification message does not match system_time and params")
+
+    def decrypt(self, ciphertext, key, system_time, params, ve=None):
+        """Reverse encrypt() using the system_time, params (and optionally ve) it returned"""
+        try:
+            self.check_verification(system_time, params, ve)
+            params = tuple(params)
+            tables = self.get_tables(system_time, params)
+            padded_data = decrypt_message(
+                key, ciphertext,
+                lambda start, stop: tables.inverse_round_tables(start, stop).__getitem__,
+                self.rounds
+            )
+            # Re-insert so the cache accounts for the inverse tables kept for later reads
+            self.table_cache.put((system_time, params, self.rounds), tables)
+            return unpad(padded_data, AES.block_size)
+        except Exception as e:
+            print(f"LEDE decryption error: {str(e)}")
+            raise
+
+    def decrypt_stream(self, source, key, system_time, params, ve=None, chunk_size=STREAM_CHUNK_SIZE):
+        """Decrypt a stream produced by encrypt_stream, yielding plaintext chunks"""
+        self.check_verification(system_time, params, ve)
+        tables = self.get_tables(system_time, tuple(params))
+        return decrypt_stream(
+            key, source,
+            lambda start, stop: tables.inverse_round_tables(start, stop).__getitem__,
+            self.rounds, chunk_size
+        )
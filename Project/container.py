@@ -0,0 +1,315 @@
+"""Seekable container format for LEDE ciphertext.
+
+Each block is encrypted with round_number = block index + 1 and does not depend on its
+neighbours, so any byte range can be decrypted from just the blocks that cover it.
+
+Layout:
+    header   HEADER (fixed size, see below)
+    frames   the encrypt_stream output, split into frames of frame_blocks blocks
+    index    frame_count big-endian uint64 file offsets, one per frame
+
+Usage:
+    python container.py pack lede archive.tar archive.cspc --key-file archive.key
+    python container.py read archive.cspc --key-file archive.key --offset 1048576 --length 4096
+    python container.py unpack archive.cspc archive.tar --key-file archive.key --workers 8
+"""
+import argparse
+import os
+import struct
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from Crypto.Cipher import AES
+from ciphers import ButterflyAES, LEDECipher
+from batch_engine import STREAM_CHUNK_SIZE, decrypt_message, iter_chunks
+from page_workers import BACKEND_PROCESS, get_backend, get_process_pool
+
+MAGIC = b'CSPC'
+VERSION = 1
+CIPHER_IDS = {'butterfly': 0, 'lede': 1}
+CIPHER_NAMES = {cipher_id: name for name, cipher_id in CIPHER_IDS.items()}
+# Butterfly S-boxes are not bijections, so a butterfly container could never be read back
+PACK_CIPHERS = ('lede',)
+DEFAULT_FRAME_BLOCKS = 4096  # 64 KB frames, one batch engine slab each
+
+# magic, version, cipher id, block size, frame blocks, frame count, plaintext length,
+# index offset, LEDE system_time, alpha, beta, gamma, LEDE ve (sha256 digest)
+HEADER = struct.Struct('>4sBBHIIQQQ3B32s')
+INDEX_ENTRY = struct.Struct('>Q')
+
+
+class ContainerError(ValueError):
+    """Raised for files that are not valid containers"""
+
+
+def write_container(dst, source, key, cipher_name='lede', frame_blocks=DEFAULT_FRAME_BLOCKS,
+                    chunk_size=STREAM_CHUNK_SIZE):
+    """Encrypt source (stream or iterable of chunks) into a container on seekable dst.
+
+    Returns the header fields as a dict.
+    """
+    if cipher_name not in CIPHER_IDS:
+        raise ValueError(f"Unknown cipher: {cipher_name}")
+    if cipher_name not in PACK_CIPHERS:
+        raise ValueError(f"{cipher_name} containers cannot be decrypted (its S-boxes are not "
+                         f"bijections); use one of: {', '.join(PACK_CIPHERS)}")
+
+    plaintext_length = 0
+
+    def counted(chunks):
+        nonlocal plaintext_length
+        for chunk in chunks:
+            plaintext_length += len(chunk)
+            yield chunk
+
+    start = dst.tell()
+    dst.write(b'\0' * HEADER.size)
+    source = counted(iter_chunks(source, chunk_size))
+
+    system_time, params, ve = 0, (0, 0, 0), b'\0' * 32
+    if cipher_name == 'lede':
+        lede = LEDECipher()
+        system_time, params = lede.generate_params()
+        ve = bytes.fromhex(lede.verification_message(system_time, params))
+        chunks = lede.encrypt_stream(source, key, system_time, params, chunk_size)
+    else:
+        chunks = ButterflyAES().encrypt_stream(source, key, chunk_size)
+
+    ciphertext_length = 0
+    for chunk in chunks:
+        dst.write(chunk)
+        ciphertext_length += len(chunk)
+
+    frame_bytes = frame_blocks * AES.block_size
+    frame_count = -(-ciphertext_length // frame_bytes)
+    index_offset = HEADER.size + ciphertext_length
+    for frame in range(frame_count):
+        dst.write(INDEX_ENTRY.pack(HEADER.size + frame * frame_bytes))
+    end = dst.tell()
+
+    fields = {
+        'cipher': cipher_name,
+        'block_size': AES.block_size,
+        'frame_blocks': frame_blocks,
+        'frame_count': frame_count,
+        'plaintext_length': plaintext_length,
+        'index_offset': index_offset,
+        'system_time': system_time,
+        'params': tuple(params),
+        've': ve.hex()
+    }
+    dst.seek(start)
+    dst.write(HEADER.pack(
+        MAGIC, VERSION, CIPHER_IDS[cipher_name], AES.block_size, frame_blocks, frame_count,
+        plaintext_length, index_offset, system_time, *params, ve
+    ))
+    dst.seek(end)
+    return fields
+
+
+class ContainerReader:
+    """Random-access decryption of a container file"""
+
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+        self._file = open(path, 'rb')
+        self._lock = threading.Lock()
+        try:
+            self._load(key)
+        except Exception:
+            self._file.close()
+            raise
+
+    def _load(self, key):
+        """Parse and check the header and index, and build the inverse tables"""
+        raw = self._file.read(HEADER.size)
+        if len(raw) != HEADER.size:
+            raise ContainerError(f"{self.path} is too short to be a container")
+        (magic, version, cipher_id, block_size, self.frame_blocks, self.frame_count,
+         self.plaintext_length, index_offset, self.system_time,
+         alpha, beta, gamma, ve) = HEADER.unpack(raw)
+        if magic != MAGIC:
+            raise ContainerError(f"{self.path} is not a container")
+        if version != VERSION or block_size != AES.block_size or cipher_id not in CIPHER_NAMES:
+            raise ContainerError(f"{self.path} uses an unsupported container version or cipher")
+
+        # The padded plaintext always has at least one more byte than the plaintext
+        total_blocks = -(-(self.plaintext_length + 1) // AES.block_size)
+        if (not self.frame_blocks or self.frame_count != -(-total_blocks // self.frame_blocks)
+                or index_offset != HEADER.size + total_blocks * AES.block_size):
+            raise ContainerError(f"{self.path} has a frame index that does not match its length")
+
+        self.cipher_name = CIPHER_NAMES[cipher_id]
+        self.params = (alpha, beta, gamma)
+        self.ve = ve.hex()
+
+        index = self._read_at(index_offset, self.frame_count * INDEX_ENTRY.size)
+        if len(index) != self.frame_count * INDEX_ENTRY.size:
+            raise ContainerError(f"{self.path} is truncated")
+        self.frame_offsets = [offset for (offset,) in INDEX_ENTRY.iter_unpack(index)]
+
+        if self.cipher_name == 'lede':
+            lede = LEDECipher()
+            lede.check_verification(self.system_time, self.params, self.ve)
+            self._inverse_tables = lede.inverse_slab_tables(self.system_time, self.params)
+            self._rounds = lede.rounds
+        else:
+            butterfly = ButterflyAES()
+            self._inverse_tables = butterfly.inverse_slab_tables(key)
+            self._rounds = butterfly.rounds
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.plaintext_length
+
+    def _read_at(self, position, size):
+        if hasattr(os, 'pread'):
+            return os.pread(self._file.fileno(), size, position)
+        with self._lock:
+            self._file.seek(position)
+            return self._file.read(size)
+
+    def _read_blocks(self, first, last):
+        """Ciphertext of blocks [first, last], located through the frame index"""
+        parts = []
+        block = first
+        while block <= last:
+            frame, within = divmod(block, self.frame_blocks)
+            count = min(last + 1, (frame + 1) * self.frame_blocks) - block
+            parts.append(self._read_at(
+                self.frame_offsets[frame] + within * AES.block_size, count * AES.block_size
+            ))
+            block += count
+        return b''.join(parts)
+
+    def read_range(self, offset, length):
+        """Decrypt plaintext bytes [offset, offset + length) without touching other blocks"""
+        if offset < 0 or length < 0:
+            raise ValueError("offset and length must be non-negative")
+        length = min(length, self.plaintext_length - offset)
+        if length <= 0:
+            return b''
+
+        first = offset // AES.block_size
+        last = (offset + length - 1) // AES.block_size
+        plaintext = decrypt_message(
+            self.key, self._read_blocks(first, last), self._inverse_tables, self._rounds,
+            first_block=first
+        )
+        skip = offset - first * AES.block_size
+        return plaintext[skip:skip + length]
+
+    def read_frame(self, frame):
+        """Decrypt one whole frame (padding stripped from the last one)"""
+        start = frame * self.frame_blocks * AES.block_size
+        return self.read_range(start, self.frame_blocks * AES.block_size)
+
+    def iter_parallel(self, max_workers=None, backend=None):
+        """Yield decrypted frames in order, decrypting up to 2 * max_workers at once.
+
+        The process backend sends workers only the path, key and frame number.
+        """
+        max_workers = max_workers or os.cpu_count() or 1
+        if get_backend(backend) == BACKEND_PROCESS:
+            executor = None
+            submit = lambda frame: get_process_pool().submit(
+                decrypt_container_frame, (self.path, self.key, frame)
+            )
+        else:
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+            submit = lambda frame: executor.submit(self.read_frame, frame)
+
+        try:
+            pending = deque()
+            for frame in range(self.frame_count):
+                pending.append(submit(frame))
+                if len(pending) >= 2 * max_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    def decrypt_to(self, dst, max_workers=None, backend=None):
+        """Decrypt the whole container into dst across a worker pool; returns bytes written"""
+        written = 0
+        for plaintext in self.iter_parallel(max_workers, backend):
+            dst.write(plaintext)
+            written += len(plaintext)
+        return written
+
+
+# Per worker process: the last opened container, reused across its frames
+_worker_container = None
+
+
+def decrypt_container_frame(task):
+    """Process-pool entry point: (path, key, frame) -> plaintext of that frame"""
+    global _worker_container
+    path, key, frame = task
+    if _worker_container is None or (_worker_container.path, _worker_container.key) != (path, key):
+        if _worker_container is not None:
+            _worker_container.close()
+        _worker_container = ContainerReader(path, key)
+    return _worker_container.read_frame(frame)
+
+
+def main(argv=None):
+    from encrypt_file import load_or_create_key
+
+    parser = argparse.ArgumentParser(description="Seekable encrypted containers")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    pack = commands.add_parser('pack', help="Encrypt a file into a container")
+    pack.add_argument('cipher', choices=PACK_CIPHERS)
+    pack.add_argument('input')
+    pack.add_argument('output')
+    pack.add_argument('--frame-blocks', type=int, default=DEFAULT_FRAME_BLOCKS)
+
+    read = commands.add_parser('read', help="Decrypt a byte range to stdout")
+    read.add_argument('input')
+    read.add_argument('--offset', type=int, default=0)
+    read.add_argument('--length', type=int, required=True)
+
+    unpack = commands.add_parser('unpack', help="Decrypt a whole container in parallel")
+    unpack.add_argument('input')
+    unpack.add_argument('output')
+    unpack.add_argument('--workers', type=int)
+    unpack.add_argument('--backend', choices=('thread', 'process'))
+
+    for command in (pack, read, unpack):
+        command.add_argument('--key-file', help="Raw key file (default: CONTAINER.key)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'pack':
+        key = load_or_create_key(args.key_file or f"{args.output}.key")
+        with open(args.input, 'rb') as src, open(args.output, 'wb') as dst:
+            fields = write_container(dst, src, key, args.cipher, args.frame_blocks)
+        print(f"Packed {fields['plaintext_length']} bytes into {fields['frame_count']} frames -> {args.output}")
+        return
+
+    key_file = args.key_file or f"{args.input}.key"
+    if not os.path.exists(key_file):
+        parser.error(f"Key file not found: {key_file}")
+    with ContainerReader(args.input, load_or_create_key(key_file)) as reader:
+        if args.command == 'read':
+            sys.stdout.buffer.write(reader.read_range(args.offset, args.length))
+        else:
+            with open(args.output, 'wb') as dst:
+                written = reader.decrypt_to(dst, args.workers, args.backend)
+            print(f"Unpacked {written} bytes -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
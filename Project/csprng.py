@@ -0,0 +1,76 @@
+"""Buffered CSPRNG: per-thread pools of os.urandom bytes, refilled in large reads.
+
+Bytes are handed out once and never reused. Each pool remembers the process it was
+filled in, and a fork handler bumps a generation counter, so a child process never
+serves bytes buffered by its parent; it discards them and reads fresh kernel randomness.
+"""
+import os
+import threading
+
+POOL_SIZE = 64 * 1024
+KEY_SIZE = 16
+
+_local = threading.local()
+_generation = 0
+
+
+def _after_fork_in_child():
+    global _generation
+    _generation += 1
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def token_bytes(n):
+    """n random bytes, like secrets.token_bytes"""
+    local = _local
+    try:
+        if local.generation != _generation or local.pid != os.getpid():
+            raise AttributeError
+        buffer, position = local.buffer, local.position
+    except AttributeError:
+        # New thread, or a forked child: never serve bytes buffered before the fork
+        local.generation, local.pid = _generation, os.getpid()
+        buffer, position = b'', 0
+    end = position + n
+    if end > len(buffer):
+        if n > POOL_SIZE // 4:
+            local.buffer, local.position = buffer, position
+            return os.urandom(n)  # Large requests gain nothing from the pool
+        buffer, position, end = os.urandom(POOL_SIZE), 0, n
+        local.buffer = buffer
+    local.position = end
+    return buffer[position:end]
+
+
+def token_keys(count, size=KEY_SIZE):
+    """count independent random keys of `size` bytes, drawn in one read"""
+    data = token_bytes(count * size)
+    return [data[i:i + size] for i in range(0, count * size, size)]
+
+
+def randbelow(n):
+    """Uniform integer in [0, n), like secrets.randbelow (rejection sampling, no modulo bias)"""
+    if n <= 0:
+        raise ValueError("Upper bound must be positive.")
+    bits = (n - 1).bit_length()
+    nbytes = (bits + 7) // 8 or 1
+    mask = (1 << bits) - 1
+    while True:
+        value = int.from_bytes(token_bytes(nbytes), 'big') & mask
+        if value < n:
+            return value
+
+
+def lede_params(count=None):
+    """LEDE (alpha, beta, gamma) triples, each value uniform in [0, 256).
+
+    One triple for count=None, else a list of count triples from a single draw.
+    """
+    if count is not None and count < 0:
+        raise ValueError("count must be non-negative")
+    data = token_bytes(3 * (1 if count is None else count))
+    triples = [tuple(data[i:i + 3]) for i in range(0, len(data), 3)]
+    return triples[0] if count is None else triples
@@ -0,0 +1,133 @@
+"""Encrypt arbitrary files with ButterflyAES or LEDE in fixed-size buffers.
+
+Usage:
+    python encrypt_file.py butterfly archive.tar archive.tar.enc
+    python encrypt_file.py lede archive.tar archive.tar.enc --key-file archive.key
+    python encrypt_file.py lede archive.tar.enc archive.tar --decrypt
+
+The key is read from --key-file (default: OUTPUT.key), or generated and written there
+if the file does not exist. Cipher parameters needed for decryption (the LEDE system
+time and alpha/beta/gamma) are written to OUTPUT.json. With --decrypt the key and
+parameters default to INPUT.key and INPUT.json.
+
+Only LEDE output can be decrypted: Butterfly S-boxes are not bijections, so butterfly
+output is one-way. The CLI warns when writing it and refuses to --decrypt it.
+"""
+import argparse
+import json
+import os
+import secrets
+import sys
+from ciphers import ButterflyAES, LEDECipher
+from batch_engine import STREAM_CHUNK_SIZE, NonInvertibleSBoxError
+
+CIPHERS = ('butterfly', 'lede')
+UNRECOVERABLE_WARNING = ("Warning: butterfly output cannot be decrypted (its S-boxes are not "
+                         "bijections); use lede for files that must be recovered")
+
+
+def load_or_create_key(key_file):
+    """Read a raw AES key from key_file, generating a 16-byte key if it does not exist"""
+    if os.path.exists(key_file):
+        with open(key_file, 'rb') as f:
+            key = f.read()
+        if len(key) not in (16, 24, 32):
+            raise ValueError(f"{key_file} must hold a 16, 24 or 32 byte key")
+        return key
+
+    key = secrets.token_bytes(16)
+    fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    print(f"Generated new key: {key_file}", file=sys.stderr)
+    return key
+
+
+def encrypt_file(cipher_name, input_path, output_path, key, chunk_size=STREAM_CHUNK_SIZE):
+    """Stream input_path through the chosen cipher into output_path; returns the metadata"""
+    metadata = {'cipher': cipher_name, 'chunk_size': chunk_size}
+
+    with open(input_path, 'rb') as src, open(output_path, 'wb') as dst:
+        if cipher_name == 'butterfly':
+            chunks = ButterflyAES().encrypt_stream(src, key, chunk_size)
+        else:
+            lede = LEDECipher()
+            system_time, params = lede.generate_params()
+            metadata.update({
+                'system_time': system_time,
+                'params': list(params),
+                've': lede.verification_message(system_time, params)
+            })
+            chunks = lede.encrypt_stream(src, key, system_time, params, chunk_size)
+
+        for chunk in chunks:
+            dst.write(chunk)
+        metadata['plaintext_size'] = src.tell()
+        metadata['ciphertext_size'] = dst.tell()
+
+    return metadata
+
+
+def decrypt_file(input_path, output_path, key, metadata, chunk_size=STREAM_CHUNK_SIZE):
+    """Stream an encrypt_file output back to plaintext; returns the plaintext size"""
+    with open(input_path, 'rb') as src, open(output_path, 'wb') as dst:
+        if metadata['cipher'] == 'butterfly':
+            chunks = ButterflyAES().decrypt_stream(src, key, chunk_size)
+        else:
+            chunks = LEDECipher().decrypt_stream(
+                src, key, metadata['system_time'], metadata['params'], metadata.get('ve'), chunk_size
+            )
+        for chunk in chunks:
+            dst.write(chunk)
+        return dst.tell()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Encrypt a file with ButterflyAES or LEDE")
+    parser.add_argument('cipher', choices=CIPHERS)
+    parser.add_argument('input')
+    parser.add_argument('output')
+    parser.add_argument('--key-file', help="Raw key file (default: OUTPUT.key)")
+    parser.add_argument('--chunk-size', type=int, default=STREAM_CHUNK_SIZE,
+                        help="Bytes read and encrypted per buffer")
+    parser.add_argument('--decrypt', action='store_true',
+                        help="Decrypt INPUT, an earlier output of this tool")
+    parser.add_argument('--metadata', help="Parameter file for --decrypt (default: INPUT.json)")
+    args = parser.parse_args(argv)
+
+    if args.chunk_size < 16:
+        parser.error("--chunk-size must be at least one block (16 bytes)")
+
+    if args.decrypt:
+        if args.cipher == 'butterfly':
+            parser.error("butterfly output cannot be decrypted: its S-boxes are not bijections")
+        with open(args.metadata or f"{args.input}.json") as f:
+            metadata = json.load(f)
+        if metadata['cipher'] != args.cipher:
+            parser.error(f"{args.input} was encrypted with {metadata['cipher']}, not {args.cipher}")
+        key_file = args.key_file or f"{args.input}.key"
+        if not os.path.exists(key_file):
+            parser.error(f"Key file not found: {key_file}")
+        try:
+            size = decrypt_file(args.input, args.output, load_or_create_key(key_file), metadata, args.chunk_size)
+        except (NonInvertibleSBoxError, ValueError) as e:
+            os.remove(args.output)
+            print(f"Decryption failed: {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Decrypted {args.input} -> {args.output} ({size} bytes)")
+        return
+
+    if args.cipher == 'butterfly':
+        print(UNRECOVERABLE_WARNING, file=sys.stderr)
+    key = load_or_create_key(args.key_file or f"{args.output}.key")
+    metadata = encrypt_file(args.cipher, args.input, args.output, key, args.chunk_size)
+
+    with open(f"{args.output}.json", 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+    print(f"Encrypted {metadata['plaintext_size']} bytes -> {args.output} "
+          f"({metadata['ciphertext_size']} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Energy accounting from Linux RAPL counters, with a fake source for machines without them.
+
+RAPL exposes cumulative package energy in microjoules under /sys/class/powercap. Each
+counter wraps at its max_energy_range_uj. A measured interval must be shorter than one
+wrap period (minutes to hours depending on load), which per-page measurements are.
+
+ENERGY_SOURCE selects the source: auto (RAPL when readable, else fake), rapl, fake or off.
+Readings are package-wide, so concurrent work in other threads or processes is included.
+
+Jobs read the meter once around the whole job (JobEnergy) and split the energy across the
+ciphers by CPU time. Meter windows around single encrypt calls would overlap when pages
+run concurrently, counting the same energy once per thread.
+"""
+import glob
+import os
+import threading
+import psutil
+
+RAPL_ROOT = '/sys/class/powercap'
+DEFAULT_FAKE_WATTS = 15.0  # Per busy core
+FAKE_MAX_RANGE_UJ = 2 ** 32  # Small enough that the fake counter wraps too
+MB = 1024 * 1024
+
+
+class RaplSource:
+    """Package-level RAPL zones (intel-rapl:N); their subzones are included in them"""
+    name = 'rapl'
+
+    def __init__(self, root=RAPL_ROOT):
+        self.zones = {}
+        for path in sorted(glob.glob(os.path.join(root, '*-rapl:*'))):
+            if path.count(':') != 1:
+                continue  # core/uncore/dram subzones are part of the package
+            try:
+                with open(os.path.join(path, 'max_energy_range_uj')) as f:
+                    max_range = int(f.read())
+                with open(os.path.join(path, 'energy_uj')) as f:
+                    int(f.read())
+            except (OSError, ValueError):
+                continue  # Unreadable, usually energy_uj restricted to root
+            self.zones[os.path.join(path, 'energy_uj')] = max_range
+
+    def available(self):
+        return bool(self.zones)
+
+    def read(self):
+        counters = {}
+        for path in self.zones:
+            with open(path) as f:
+                counters[path] = int(f.read())
+        return counters
+
+    def max_range(self, zone):
+        return self.zones[zone]
+
+
+def process_cpu_time():
+    """User + system CPU seconds of this process and its live child processes (pool workers)"""
+    process = psutil.Process()
+    total = sum(process.cpu_times()[:2])
+    for child in process.children(recursive=True):
+        try:
+            total += sum(child.cpu_times()[:2])
+        except psutil.Error:
+            pass  # Exited in between
+    return total
+
+
+class FakeSource:
+    """Energy proportional to the CPU time of this process and its workers, as a wrapping
+    microjoule counter"""
+    name = 'fake'
+
+    def __init__(self, watts=None, max_range_uj=FAKE_MAX_RANGE_UJ, clock=process_cpu_time):
+        self.watts = watts or float(os.environ.get('ENERGY_FAKE_WATTS', DEFAULT_FAKE_WATTS))
+        self.max_range_uj = max_range_uj
+        self.clock = clock
+
+    def available(self):
+        return True
+
+    def read(self):
+        return {'fake': int(self.clock() * self.watts * 1e6) % self.max_range_uj}
+
+    def max_range(self, zone):
+        return self.max_range_uj
+
+
+class EnergyMeter:
+    def __init__(self, source):
+        self.source = source
+
+    @property
+    def source_name(self):
+        return self.source.name
+
+    def read(self):
+        return self.source.read()
+
+    def joules(self, start, end):
+        """Energy between two readings, correcting for counters that wrapped once"""
+        total = 0
+        for zone, before in start.items():
+            after = end.get(zone, before)
+            if after < before:
+                after += self.source.max_range(zone)
+            total += after - before
+        return total / 1e6
+
+
+_meter = None
+_meter_lock = threading.Lock()
+
+
+def create_source(kind=None):
+    kind = (kind or os.environ.get('ENERGY_SOURCE', 'auto')).lower()
+    if kind == 'off':
+        return None
+    if kind in ('auto', 'rapl'):
+        rapl = RaplSource()
+        if rapl.available():
+            return rapl
+        if kind == 'rapl':
+            print("Energy measurement error: RAPL counters are not readable, using fake source")
+    elif kind != 'fake':
+        raise ValueError(f"Unknown energy source: {kind}")
+    return FakeSource()
+
+
+def get_meter():
+    """The process-wide EnergyMeter, or None when ENERGY_SOURCE=off"""
+    global _meter
+    with _meter_lock:
+        if _meter is None:
+            source = create_source()
+            _meter = EnergyMeter(source) if source else False
+        return _meter or None
+
+
+def set_source(source):
+    """Plug in a different source (e.g. FakeSource in tests); None disables measurement"""
+    global _meter
+    with _meter_lock:
+        _meter = EnergyMeter(source) if source else False
+
+
+class JobEnergy:
+    """Energy of one job: one meter reading around the whole job, split across ciphers.
+
+    The job's energy per CPU second of this process tree is measured once, and each cipher
+    is charged for the CPU time of its encrypt calls (thread CPU time, measured in the
+    worker that ran them). Other work, such as text extraction and PDF writes, is not
+    charged to either cipher. The split is the same for the thread and process backends.
+    """
+
+    def __init__(self, meter):
+        self.meter = meter
+        self.start = meter.read()
+        self.cpu_start = process_cpu_time()
+
+    def summarize(self, butterfly_cpu_time, lede_cpu_time, plaintext_bytes, pages):
+        total_joules = self.meter.joules(self.start, self.meter.read())
+        cpu_time = max(process_cpu_time() - self.cpu_start, butterfly_cpu_time + lede_cpu_time)
+        joules_per_cpu_second = total_joules / cpu_time if cpu_time > 0 else 0
+        summary = summarize(
+            self.meter.source_name, butterfly_cpu_time * joules_per_cpu_second,
+            lede_cpu_time * joules_per_cpu_second, plaintext_bytes, pages, total_joules
+        )
+        summary.update({
+            'cpu_time': cpu_time,
+            'butterfly_cpu_time': butterfly_cpu_time,
+            'lede_cpu_time': lede_cpu_time,
+            'joules_per_cpu_second': joules_per_cpu_second
+        })
+        return summary
+
+
+def start_job():
+    """JobEnergy for a job starting now, or None when ENERGY_SOURCE=off"""
+    meter = get_meter()
+    return JobEnergy(meter) if meter else None
+
+
+def summarize(source_name, butterfly_joules, lede_joules, plaintext_bytes, pages, total_joules=None):
+    """Joules per MB of page text and per page, per cipher, for the run history"""
+    mb = plaintext_bytes / MB
+    summary = {
+        'source': source_name,
+        'butterfly_joules': butterfly_joules,
+        'lede_joules': lede_joules,
+        'butterfly_joules_per_mb': butterfly_joules / mb if mb else 0,
+        'lede_joules_per_mb': lede_joules / mb if mb else 0,
+        'butterfly_joules_per_page': butterfly_joules / pages if pages else 0,
+        'lede_joules_per_page': lede_joules / pages if pages else 0
+    }
+    if total_joules is not None:
+        summary['total_joules'] = total_joules
+    return summary
@@ -0,0 +1,25 @@
+"""gunicorn settings for production serving: gunicorn -c gunicorn.conf.py app:app
+
+Every setting can be overridden from the environment; see serving.py for the hooks.
+"""
+import os
+import serving
+
+bind = os.environ.get('SERVE_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('SERVE_WORKERS', os.cpu_count() or 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('SERVE_THREADS', 4))  # Concurrent requests per worker, e.g. status polls
+timeout = int(os.environ.get('SERVE_TIMEOUT', 120))
+
+# Import the app in the master, so workers fork from one warmed-up interpreter
+preload_app = True
+
+# Each worker runs its own job threads; keep the per-worker pool small on many-worker hosts
+raw_env = [
+    f"PDF_JOB_WORKERS={os.environ.get('PDF_JOB_WORKERS', 1)}",
+    f"PDF_WORKER_BACKEND={os.environ.get('PDF_WORKER_BACKEND', 'thread')}",
+]
+
+on_starting = serving.on_starting
+when_ready = serving.when_ready
+on_exit = serving.on_exit
@@ -0,0 +1,165 @@
+"""Upload ingestion: each uploaded file is written once, straight into its own directory.
+
+The app's request class hands the multipart parser an IngestFile, so the request body is
+streamed into UPLOAD_DIR/<upload id>/<filename> and hashed in the same pass; there is no
+spooled temp file followed by a save. PDFs are opened through a read-only mmap rather
+than PdfReader's default of reading the whole file into a BytesIO.
+
+Upload directories (with the encrypted outputs written next to the input) are removed
+once older than UPLOAD_RETENTION_SECONDS, by a sweep that runs as uploads arrive.
+"""
+import os
+import mmap
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+from PyPDF2 import PdfReader
+from werkzeug.utils import secure_filename
+
+DEFAULT_UPLOAD_DIR = 'uploads'
+DEFAULT_RETENTION_SECONDS = 24 * 60 * 60
+SWEEP_INTERVAL = 60  # Seconds between retention sweeps
+DEFAULT_FILENAME = 'upload.pdf'
+COPY_BUFFER_SIZE = 1024 * 1024
+
+_last_sweep = 0.0
+_sweep_lock = threading.Lock()
+
+
+def upload_dir():
+    return os.environ.get('UPLOAD_DIR', DEFAULT_UPLOAD_DIR)
+
+
+def retention_seconds():
+    return float(os.environ.get('UPLOAD_RETENTION_SECONDS', DEFAULT_RETENTION_SECONDS))
+
+
+class Upload:
+    """A stored upload: its directory and path, size in bytes and SHA-256"""
+
+    def __init__(self, upload_id, directory, path, filename, size, sha256):
+        self.id = upload_id
+        self.directory = directory
+        self.path = path
+        self.filename = filename
+        self.size = size
+        self.sha256 = sha256
+
+    def output_path(self, name):
+        return os.path.join(self.directory, name)
+
+    def discard(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def to_dict(self):
+        return {'id': self.id, 'filename': self.filename, 'bytes': self.size, 'sha256': self.sha256}
+
+
+class IngestFile:
+    """Writable upload file that counts and hashes bytes as the parser writes them.
+
+    Reads, seeks and close go to the underlying file, as the parser and FileStorage expect.
+    """
+
+    def __init__(self, filename=None, root=None):
+        self.id = uuid.uuid4().hex
+        self.directory = os.path.join(root or upload_dir(), self.id)
+        os.makedirs(self.directory)
+        self.filename = secure_filename(filename or '') or DEFAULT_FILENAME
+        self.path = os.path.join(self.directory, self.filename)
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._file = open(self.path, 'w+b')
+
+    def write(self, data):
+        self._hash.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def finish(self):
+        """Close the file and return its Upload"""
+        self._file.close()
+        return Upload(self.id, self.directory, self.path, self.filename, self.size, self._hash.hexdigest())
+
+
+def finish_upload(file_storage, root=None):
+    """Upload for a werkzeug FileStorage.
+
+    Files parsed through IngestFile are already on disk; any other stream (a request not
+    using the app's request class) is copied in one pass.
+    """
+    stream = file_storage.stream
+    if isinstance(stream, IngestFile):
+        upload = stream.finish()
+    else:
+        target = IngestFile(file_storage.filename, root)
+        try:
+            shutil.copyfileobj(stream, target, COPY_BUFFER_SIZE)
+        finally:
+            upload = target.finish()
+    sweep_if_due(root)
+    return upload
+
+
+def copy_file(src_path, dst_paths, buffer_size=COPY_BUFFER_SIZE):
+    """Copy src_path to every path in dst_paths, reading the source once"""
+    with open(src_path, 'rb') as src:
+        files = [open(path, 'wb') for path in dst_paths]
+        try:
+            while True:
+                buffer = src.read(buffer_size)
+                if not buffer:
+                    break
+                for f in files:
+                    f.write(buffer)
+        finally:
+            for f in files:
+                f.close()
+
+
+def open_pdf(path):
+    """PdfReader over a read-only mmap of path, so pages are read from the page cache on
+    demand instead of being copied into memory up front"""
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return PdfReader(mapped)
+
+
+def sweep(root=None, retention=None, now=None):
+    """Delete upload directories (and legacy flat files) older than the retention period"""
+    root = root or upload_dir()
+    retention = retention_seconds() if retention is None else retention
+    cutoff = (now or time.time()) - retention
+    removed = 0
+    try:
+        entries = list(os.scandir(root))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.stat(follow_symlinks=False).st_mtime >= cutoff:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:
+                os.remove(entry.path)
+            removed += 1
+        except OSError as e:
+            print(f"Upload cleanup error: {str(e)}")
+    return removed
+
+
+def sweep_if_due(root=None):
+    """Run sweep() at most once per SWEEP_INTERVAL seconds"""
+    global _last_sweep
+    with _sweep_lock:
+        now = time.time()
+        if now - _last_sweep < SWEEP_INTERVAL:
+            return 0
+        _last_sweep = now
+    return sweep(root, now=now)
@@ -0,0 +1,225 @@
+import os
+import json
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from sqlite_connections import ThreadConnections
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 16
+DEFAULT_RETAINED_JOBS = 1000  # Finished jobs kept for status/result lookups
+PROGRESS_WRITE_INTERVAL = 0.5  # Seconds between progress writes to a JobStore
+STORE_RETENTION_SECONDS = 24 * 60 * 60
+
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    pages_done INTEGER NOT NULL,
+    total_pages INTEGER,
+    error TEXT,
+    result TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished);
+"""
+
+
+class QueueFullError(Exception):
+    """Raised by JobQueue.submit when the queue is at capacity"""
+
+
+class Job:
+    """One queued unit of work with its status, per-page progress and result"""
+
+    def __init__(self, func, args, store=None):
+        self.id = uuid.uuid4().hex
+        self.store = store
+        self.func = func
+        self.args = args
+        self.status = STATUS_QUEUED
+        self.pages_done = 0
+        self.total_pages = None
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+        self._progress_written = 0.0
+
+    @classmethod
+    def from_record(cls, record):
+        """Read-only Job rebuilt from a JobStore row"""
+        job = cls(None, ())
+        for field in ('id', 'status', 'pages_done', 'total_pages', 'error', 'created', 'started', 'finished'):
+            setattr(job, field, record[field])
+        job.result = json.loads(record['result']) if record['result'] else None
+        return job
+
+    def report_progress(self, pages, total_pages):
+        """Progress callback: `pages` more pages finished out of total_pages"""
+        with self._lock:
+            self.total_pages = total_pages
+            self.pages_done += pages
+            now = time.monotonic()
+            write = self.store is not None and now - self._progress_written >= PROGRESS_WRITE_INTERVAL
+            if write:
+                self._progress_written = now
+        if write:
+            self.store.save(self)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'id': self.id,
+                'status': self.status,
+                'pages_done': self.pages_done,
+                'total_pages': self.total_pages,
+                'error': self.error,
+                'created': self.created,
+                'started': self.started,
+                'finished': self.finished
+            }
+
+
+class JobStore:
+    """Job status and results in SQLite, so any server worker process can report on a job.
+
+    Jobs are written when queued, started and finished, and progress at most every
+    PROGRESS_WRITE_INTERVAL seconds. Finished jobs are pruned after `retention` seconds.
+    """
+
+    def __init__(self, db_file, retention=STORE_RETENTION_SECONDS):
+        self.db_file = db_file
+        self.retention = retention
+        self._connections = ThreadConnections(self.db_file)
+        self._connect().executescript(STORE_SCHEMA)
+
+    def _connect(self):
+        return self._connections.get()
+
+    def save(self, job):
+        record = job.to_dict()
+        result = json.dumps(job.result, default=str) if job.result is not None else None
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, status, pages_done, total_pages, error, result, "
+                "created, started, finished) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    record['id'], record['status'], record['pages_done'], record['total_pages'],
+                    record['error'], result, record['created'], record['started'], record['finished']
+                )
+            )
+
+    def load(self, job_id):
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_record(row) if row else None
+
+    def prune(self):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM jobs WHERE finished < ?", (time.time() - self.retention,))
+
+
+class JobQueue:
+    """Bounded job queue drained by a fixed set of worker threads.
+
+    submit() never blocks: when max_queued jobs are already waiting it raises
+    QueueFullError so the caller can push back on the client. With a JobStore, get()
+    also finds jobs queued by other processes sharing the store.
+    """
+
+    def __init__(self, workers=None, max_queued=None, retained=DEFAULT_RETAINED_JOBS, store=None):
+        self.workers = workers or int(os.environ.get('PDF_JOB_WORKERS', DEFAULT_WORKERS))
+        self.max_queued = max_queued or int(os.environ.get('PDF_JOB_QUEUE_SIZE', DEFAULT_QUEUE_SIZE))
+        self.retained = retained
+        self.store = store
+        self._queue = queue.Queue(maxsize=self.max_queued)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"pdf-job-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, func, *args):
+        """Queue func(*args, job) and return the Job; raises QueueFullError when full"""
+        self.start()
+        job = Job(func, args, self.store)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._forget_finished()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+            raise QueueFullError(f"Job queue is full ({self.max_queued} waiting)")
+        self._save(job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            job = self.store.load(job_id)
+        return job
+
+    def _save(self, job):
+        if self.store is None:
+            return
+        try:
+            self.store.save(job)
+        except Exception as e:
+            print(f"Job store error: {str(e)}")
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _forget_finished(self):
+        """Drop the oldest finished jobs beyond the retention limit"""
+        excess = len(self._jobs) - self.retained
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].status in (STATUS_DONE, STATUS_FAILED):
+                del self._jobs[job_id]
+                excess -= 1
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            job.status = STATUS_RUNNING
+            job.started = time.time()
+            self._save(job)
+            try:
+                job.result = job.func(*job.args, job)
+                job.status = STATUS_DONE
+            except Exception as e:
+                print(f"Job {job.id} error: {str(e)}")
+                job.error = str(e)
+                job.status = STATUS_FAILED
+            finally:
+                job.func = job.args = None
+                job.finished = time.time()
+                self._save(job)
+                if self.store is not None:
+                    self.store.prune()
+                self._queue.task_done()
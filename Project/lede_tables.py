@@ -0,0 +1,180 @@
+import threading
+import numpy as np
+from batch_engine import invert_sboxes
+
+# LEDE time arrays are 128 bytes built from one 8-byte counter repeated 16 times. Every
+# update in generate_time_arrays is position-wise, pairing KB[i] with KB[127-i], so each
+# 64-byte half stays periodic with period 8. Bytes [0:8] and [64:72] of KA, KB and KC
+# therefore describe a block's arrays completely.
+HALF_PERIOD = 8
+COMPACT_WIDTH = 2 * HALF_PERIOD
+DEFAULT_RETAIN_BLOCKS = 1 << 16  # Compact arrays kept per table set (48 bytes per block)
+INVERSE_CACHE_BLOCKS = 1024  # Inverse tables kept per set for repeated decryption (3 KB per block)
+MISSING_KEY_BASE = 256  # Sort key offset that places unused values after every used position
+
+
+def compact_time_arrays(system_time, params, round_numbers):
+    """Compute compact KA, KB, KC for many block round numbers at once.
+
+    Returns an [n, 3, 16] uint8 array holding bytes [0:8] + [64:72] of each array, matching
+    LEDECipher.generate_time_arrays exactly.
+    """
+    alpha, beta, gamma = params
+    rn = np.asarray(round_numbers, dtype=np.int64)
+    n = len(rn)
+
+    # uint64 multiplication wraps modulo 2**64, as the scalar counter does
+    counters = rn.astype(np.uint64) * np.uint64(system_time % (1 << 64))
+    pattern = counters.astype('>u8').view(np.uint8).reshape(n, HALF_PERIOD).astype(np.int64)
+    KA = np.concatenate([pattern, pattern], axis=1)
+    KB = KA.copy()
+    KC = np.zeros_like(KA)
+    rn = rn[:, None]
+
+    for pass_num in range(3):
+        # KB[i] (class i % 8 of the low half) pairs with KB[127 - i] (class 7 - i % 8 of
+        # the high half); both are updated together, then swapped and mixed
+        lo = (KB[:, :HALF_PERIOD] + alpha + rn * pass_num) % 256
+        hi = (KB[:, :HALF_PERIOD - 1:-1] + beta + rn * pass_num) % 256
+        lo, hi = hi, lo
+        mid = (lo * hi + gamma) % 256
+        KB[:, :HALF_PERIOD] = (lo + mid) % 256
+        KB[:, :HALF_PERIOD - 1:-1] = (hi ^ mid) % 256
+
+        KC = (KA * KB + gamma * rn + pass_num) % 256
+        KA = (KA + KC) % 256
+
+    return np.stack([KA, KB, KC], axis=1).astype(np.uint8)
+
+
+def expand_time_arrays(compact):
+    """Expand one block's [3, 16] compact arrays back to the full 128-byte KA, KB, KC"""
+    return tuple(
+        bytearray(bytes(row[:HALF_PERIOD]) * 8 + bytes(row[HALF_PERIOD:]) * 8)
+        for row in compact
+    )
+
+
+def round_sboxes(compact, round_number):
+    """Build the LEDE S-box for one round number across many blocks.
+
+    Vectorized form of LEDECipher.generate_sbox: values keep their first-occurrence order
+    across the three passes over KA, KB, KC, and unused values follow in ascending order
+    (descending for odd round numbers). Returns an [n, 256] uint8 array.
+    """
+    n = len(compact)
+    flat = compact.reshape(n, -1).astype(np.int32)
+    seq = np.concatenate(
+        [(flat * round_number + pass_num) % 256 for pass_num in range(3)], axis=1
+    )
+
+    # Pack (value, position) into one int so a plain sort groups each value with its
+    # positions in order; the first of each group is the value's first occurrence
+    packed = np.sort((seq << 8) | np.arange(seq.shape[1], dtype=np.int32), axis=1)
+    values = packed >> 8
+    first = np.empty(values.shape, dtype=bool)
+    first[:, 0] = True
+    np.not_equal(values[:, 1:], values[:, :-1], out=first[:, 1:])
+
+    if round_number % 2:
+        missing_rank = np.arange(255, -1, -1, dtype=np.int32)
+    else:
+        missing_rank = np.arange(256, dtype=np.int32)
+    sort_key = np.empty((n, 256), dtype=np.int32)
+    sort_key[:] = MISSING_KEY_BASE + missing_rank
+    offsets = (np.arange(n, dtype=np.int32) * 256)[:, None]
+    sort_key.reshape(-1)[(offsets + values)[first]] = (packed & 0xFF)[first]
+
+    ordered = np.sort((sort_key << 8) | np.arange(256, dtype=np.int32), axis=1)
+    return (ordered & 0xFF).astype(np.uint8)
+
+
+class LEDETableSet:
+    """Time arrays and per-round S-boxes for one LEDE (system_time, params) pair.
+
+    Compact time arrays are computed once per block index and retained for the first
+    `retain_blocks` blocks; round S-boxes are built from them in slabs, once per distinct
+    set of time arrays, so blocks whose arrays coincide share their tables.
+    """
+
+    def __init__(self, system_time, params, rounds=12, retain_blocks=DEFAULT_RETAIN_BLOCKS):
+        self.system_time = system_time
+        self.params = tuple(params)
+        self.rounds = rounds
+        self.retain_blocks = retain_blocks
+        self._compact = np.empty((0, 3, COMPACT_WIDTH), dtype=np.uint8)
+        self._inverse = {}
+        self._inverse_blocks = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nblocks(self):
+        """Number of block indices whose time arrays are retained"""
+        return len(self._compact)
+
+    @property
+    def nbytes(self):
+        return self._compact.nbytes + sum(tables.nbytes for tables in self._inverse.values())
+
+    def compact(self, start, stop):
+        """Compact time arrays for blocks [start, stop), i.e. round numbers start+1..stop"""
+        retained = self._compact
+        if stop <= len(retained):
+            return retained[start:stop]
+
+        with self._lock:
+            retained = self._compact
+            if len(retained) < self.retain_blocks and start <= len(retained):
+                grow_to = min(max(stop, 2 * len(retained)), self.retain_blocks)
+                extra = compact_time_arrays(
+                    self.system_time, self.params, range(len(retained) + 1, grow_to + 1)
+                )
+                retained = self._compact = np.concatenate([retained, extra])
+                if stop <= len(retained):
+                    return retained[start:stop]
+
+        # Beyond the retained prefix: compute on demand without keeping it
+        return compact_time_arrays(self.system_time, self.params, range(start + 1, stop + 1))
+
+    def time_arrays(self, round_number):
+        """Full KA, KB, KC for one block, as returned by LEDECipher.generate_time_arrays"""
+        return expand_time_arrays(self.compact(round_number - 1, round_number)[0])
+
+    def round_tables(self, start, stop):
+        """Per-round S-boxes for blocks [start, stop) as a [rounds, n, 256] uint8 array"""
+        compact = self.compact(start, stop)
+        unique, inverse = np.unique(
+            compact.reshape(len(compact), -1), axis=0, return_inverse=True
+        )
+        unique = unique.reshape(-1, 3, COMPACT_WIDTH)
+        inverse = inverse.reshape(-1)
+
+        tables = np.empty((self.rounds, len(compact), 256), dtype=np.uint8)
+        for round_idx in range(self.rounds):
+            tables[round_idx] = round_sboxes(unique, round_idx + 1)[inverse]
+        return tables
+
+    def inverse_round_tables(self, start, stop):
+        """Inverse of round_tables, for decryption; LEDE S-boxes are always permutations.
+
+        Small ranges are kept, so decrypting the same message again skips table construction.
+        """
+        tables = self._inverse.get((start, stop))
+        if tables is not None:
+            return tables
+
+        tables = self.round_tables(start, stop)
+        round_numbers = range(start + 1, stop + 1)
+        for round_idx in range(self.rounds):
+            tables[round_idx] = invert_sboxes(tables[round_idx], round_numbers)
+
+        with self._lock:
+            if self._inverse_blocks + (stop - start) <= INVERSE_CACHE_BLOCKS:
+                self._inverse[(start, stop)] = tables
+                self._inverse_blocks += stop - start
+        return tables
+
+    def sbox(self, round_number, round_idx):
+        """S-box used for block `round_number` in round `round_idx` (0-based)"""
+        compact = self.compact(round_number - 1, round_number)
+        return round_sboxes(compact, round_idx + 1)[0].tobytes()
@@ -0,0 +1,135 @@
+"""Opt-in tracemalloc profiling of ButterflyAES and LEDECipher, per cipher and per stage.
+
+Profiling runs as a separate pass after the timed encryption, so tracemalloc overhead
+never shows up in the stored timings. Passes are serialised by a lock because tracemalloc
+is process-wide; allocations made by other threads during a pass are still traced.
+
+Stage boundaries come from the batch_engine stage_times hook: every time a stage ends,
+the peak since the previous boundary is attributed to it, then the peak is reset.
+"""
+import os
+import threading
+import tracemalloc
+from ingest import open_pdf
+from ciphers import ButterflyAES, LEDECipher
+from page_text_cache import page_text_cache
+from sbox_cache import SBoxCache
+
+DEFAULT_SAMPLE_PAGES = 4
+TOP_SITES = 10
+TRACE_FRAMES = 1
+# The profiler's own snapshots are traced too; leave them out of the site statistics
+SNAPSHOT_FILTERS = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+
+_profile_lock = threading.Lock()
+
+
+def is_enabled(requested=False):
+    return requested or os.environ.get('PDF_MEMORY_PROFILE', '0') == '1'
+
+
+def sample_pages():
+    return int(os.environ.get('PDF_MEMORY_PROFILE_PAGES', DEFAULT_SAMPLE_PAGES))
+
+
+class StageMemory(dict):
+    """A stage_times dict that also records tracemalloc peaks and allocation sites per stage"""
+
+    def __init__(self, stages, sites):
+        super().__init__()
+        self.stages = stages
+        self.sites = sites
+        self.max_traced = 0
+        self._snapshot = None
+        self._boundary()
+
+    def _boundary(self):
+        # Snapshot first, so its own memory is part of the baseline rather than the peak
+        snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+        self._snapshot = snapshot
+        tracemalloc.reset_peak()
+        self._start_bytes = tracemalloc.get_traced_memory()[0]
+
+    def __setitem__(self, stage, value):
+        super().__setitem__(stage, value)
+        peak = tracemalloc.get_traced_memory()[1]
+        self.max_traced = max(self.max_traced, peak)
+        snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+        record = self.stages.setdefault(stage, {
+            'calls': 0, 'peak_bytes': 0, 'allocations': 0, 'allocated_bytes': 0
+        })
+        record['calls'] += 1
+        record['peak_bytes'] = max(record['peak_bytes'], peak - self._start_bytes)
+
+        # Blocks still alive at the end of the stage that it allocated
+        stage_sites = self.sites.setdefault(stage, {})
+        for stat in snapshot.compare_to(self._snapshot, 'lineno'):
+            if stat.count_diff <= 0:
+                continue
+            record['allocations'] += stat.count_diff
+            record['allocated_bytes'] += stat.size_diff
+            frame = stat.traceback[0]
+            site = f"{os.path.basename(frame.filename)}:{frame.lineno}"
+            count, size = stage_sites.get(site, (0, 0))
+            stage_sites[site] = (count + stat.count_diff, size + stat.size_diff)
+        del snapshot
+        self._boundary()
+
+
+def top_sites(sites, limit=TOP_SITES):
+    ranked = sorted(sites.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+    return [{'site': site, 'count': count, 'bytes': size} for site, (count, size) in ranked]
+
+
+def profile_cipher(encrypt, texts):
+    """Profile encrypt(data, stage_times) over texts; returns peak and per-stage records"""
+    stages = {}
+    sites = {}
+    tracemalloc.start(TRACE_FRAMES)
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        overall_peak = 0
+        for text in texts:
+            stage_memory = StageMemory(stages, sites)
+            encrypt(text, stage_memory)
+            overall_peak = max(overall_peak, stage_memory.max_traced - base)
+    finally:
+        tracemalloc.stop()
+
+    merged = {}
+    for stage_sites in sites.values():
+        for site, (count, size) in stage_sites.items():
+            total_count, total_size = merged.get(site, (0, 0))
+            merged[site] = (total_count + count, total_size + size)
+    for stage, record in stages.items():
+        record['top_sites'] = top_sites(sites.get(stage, {}), limit=5)
+    return {
+        'peak_bytes': overall_peak,
+        'allocations': sum(record['allocations'] for record in stages.values()),
+        'stages': stages,
+        'top_sites': top_sites(merged)
+    }
+
+
+def profile_pdf(input_pdf, key, pages=None):
+    """Memory profile of both ciphers over the text of the first `pages` non-empty pages"""
+    pages = pages or sample_pages()
+    texts = []
+    for page in open_pdf(input_pdf).pages:
+        text = page_text_cache.extract_text(page)
+        if text:
+            texts.append(text.encode('utf-8'))
+            if len(texts) >= pages:
+                break
+
+    # Private caches, so S-box generation is profiled as for a cold request
+    butterfly_aes = ButterflyAES(sbox_cache=SBoxCache())
+    lede = LEDECipher(table_cache=SBoxCache())
+    with _profile_lock:
+        if tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is already tracing in this process")
+        return {
+            'pages': len(texts),
+            'butterfly': profile_cipher(lambda data, stages: butterfly_aes.encrypt(data, key, stages), texts),
+            'lede': profile_cipher(lambda data, stages: lede.encrypt(data, key, stages), texts)
+        }
@@ -0,0 +1,187 @@
+import os
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+import PyPDF2
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+from sbox_cache import SBoxCache
+
+DEFAULT_MEMORY_BYTES = 32 * 1024 * 1024
+DEFAULT_DISK_BYTES = 256 * 1024 * 1024
+DEFAULT_CACHE_DIR = os.path.join("cache", "page_text")
+
+# Part of every key, so texts from another extractor version are never reused
+KEY_PREFIX = f"pypdf2-{PyPDF2.__version__}-text-v1".encode()
+
+
+class PageTextCache:
+    """Extracted page text, keyed by a hash of the page's content streams and resources.
+
+    Two tiers: an in-memory LRU (SBoxCache) in front of a directory of text files that is
+    shared by all processes and evicted least recently used first once it grows past
+    disk_bytes. Identical pages hit the cache across uploads and revisions of a document.
+    """
+
+    def __init__(self, memory_bytes=None, cache_dir=None, disk_bytes=None):
+        self.memory = SBoxCache(
+            max_bytes=memory_bytes or int(os.environ.get('PAGE_TEXT_CACHE_MEMORY_BYTES', DEFAULT_MEMORY_BYTES))
+        )
+        self.cache_dir = cache_dir or os.environ.get('PAGE_TEXT_CACHE_DIR', DEFAULT_CACHE_DIR)
+        self.disk_bytes = disk_bytes or int(os.environ.get('PAGE_TEXT_CACHE_DISK_BYTES', DEFAULT_DISK_BYTES))
+        self._lock = threading.Lock()
+        self._disk_index = None  # key -> size, least recently used first
+        self._disk_total = 0
+        self._object_digests = weakref.WeakKeyDictionary()  # reader -> {(idnum, generation): digest}
+        self.disk_hits = 0
+        self.disk_evictions = 0
+        self.misses = 0
+
+    def _digest_object(self, obj, digests, pending):
+        """Stable sha256 digest of a PDF object, resolving indirect references once per reader"""
+        if isinstance(obj, IndirectObject):
+            ref = (obj.idnum, obj.generation)
+            if ref not in digests:
+                if ref in pending:  # Reference cycle: identify by object number only
+                    return f"R{ref[0]}.{ref[1]}".encode()
+                pending.add(ref)
+                digests[ref] = self._digest_object(obj.get_object(), digests, pending)
+                pending.discard(ref)
+            return digests[ref]
+
+        h = hashlib.sha256()
+        if isinstance(obj, DictionaryObject):
+            h.update(b'd' if not isinstance(obj, StreamObject) else b's')
+            for name in sorted(obj):
+                h.update(name.encode())
+                h.update(self._digest_object(obj.raw_get(name), digests, pending))
+            if isinstance(obj, StreamObject):
+                h.update(obj._data)
+        elif isinstance(obj, ArrayObject):
+            h.update(b'a')
+            for item in obj:
+                h.update(self._digest_object(item, digests, pending))
+        else:
+            h.update(repr(obj).encode())
+        return h.digest()
+
+    def page_key(self, page):
+        """Content address of a page: its content streams plus resources (fonts, XObjects)"""
+        reader = page.pdf
+        digests = self._object_digests.get(reader) if reader is not None else None
+        if digests is None:
+            digests = {}
+            if reader is not None:
+                self._object_digests[reader] = digests
+
+        h = hashlib.sha256(KEY_PREFIX)
+        for name in ('/Contents', '/Resources'):
+            value = page.raw_get(name) if name in page else None
+            h.update(self._digest_object(value, digests, set()) if value is not None else b'-')
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def _load_disk_index(self):
+        """Scan the cache directory once, oldest access first"""
+        if self._disk_index is not None:
+            return
+        entries = []
+        if os.path.isdir(self.cache_dir):
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    try:
+                        stat = os.stat(os.path.join(root, name))
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, name, stat.st_size))
+        entries.sort()
+        self._disk_index = OrderedDict((name, size) for _, name, size in entries)
+        self._disk_total = sum(self._disk_index.values())
+
+    def _disk_get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # Mark as recently used for eviction
+        except OSError:
+            return None
+        with self._lock:
+            self._load_disk_index()
+            if key in self._disk_index:
+                self._disk_index.move_to_end(key)
+        return data.decode('utf-8')
+
+    def _disk_put(self, key, text):
+        data = text.encode('utf-8')
+        if len(data) > self.disk_bytes:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Page text cache error: {str(e)}")
+            return
+
+        with self._lock:
+            self._load_disk_index()
+            self._disk_total += len(data) - self._disk_index.pop(key, 0)
+            self._disk_index[key] = len(data)
+            while self._disk_total > self.disk_bytes and self._disk_index:
+                old_key, size = self._disk_index.popitem(last=False)
+                self._disk_total -= size
+                self.disk_evictions += 1
+                try:
+                    os.remove(self._path(old_key))
+                except OSError:
+                    pass  # Already evicted by another process
+
+    def get(self, key):
+        text = self.memory.get(key)
+        if text is not None:
+            return text.decode('utf-8')
+        text = self._disk_get(key)
+        if text is not None:
+            self.disk_hits += 1
+            self.memory.put(key, text.encode('utf-8'))
+        return text
+
+    def put(self, key, text):
+        self.memory.put(key, text.encode('utf-8'))
+        self._disk_put(key, text)
+
+    def extract_text(self, page):
+        """page.extract_text(), served from the cache when this page content was seen before"""
+        key = self.page_key(page)
+        text = self.get(key)
+        if text is None:
+            self.misses += 1
+            text = page.extract_text()
+            self.put(key, text)
+        return text
+
+    def stats(self):
+        memory = self.memory.stats()
+        lookups = memory['hits'] + self.disk_hits + self.misses
+        with self._lock:
+            disk_entries = len(self._disk_index or ())
+            disk_total = self._disk_total
+        return {
+            'memory': memory,
+            'disk_entries': disk_entries,
+            'disk_bytes': disk_total,
+            'disk_max_bytes': self.disk_bytes,
+            'disk_hits': self.disk_hits,
+            'disk_evictions': self.disk_evictions,
+            'misses': self.misses,
+            'hit_rate': (memory['hits'] + self.disk_hits) / lookups if lookups else 0.0
+        }
+
+
+page_text_cache = PageTextCache()
@@ -0,0 +1,383 @@
+import os
+import time
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from PyPDF2.generic import IndirectObject
+from ingest import open_pdf
+from ciphers import ButterflyAES, LEDECipher
+from cipher_mode import CIPHER_BUTTERFLY, CIPHER_LEDE, CIPHERS
+from page_text_cache import page_text_cache
+import tracing
+
+BACKEND_THREAD = 'thread'
+BACKEND_PROCESS = 'process'
+BACKENDS = (BACKEND_THREAD, BACKEND_PROCESS)
+PAGE_BASE_COST = 512  # Per-page overhead in content-stream bytes, for cost estimates
+TASKS_PER_WORKER = 4  # Batches per worker the cost-aware scheduler aims for
+MAX_BATCH_PAGES = 32
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+# Per worker process: the last opened reader, so consecutive chunks of one upload share it
+_worker_reader = None
+_worker_reader_id = None
+
+
+def process_page_chunk(chunk_data, progress=None):
+    """Process a chunk of pages in parallel; progress(1) is called after each page.
+
+    Either cipher in chunk_data may be None, in which case it is skipped and its totals
+    stay 0. Returns the chunk totals as a dict: butterfly_time, lede_time (wall time),
+    butterfly_cpu_time, lede_cpu_time (this thread's CPU time, for energy attribution),
+    cpu_time (this thread's CPU time for the whole chunk, extraction included) and bytes
+    (page text encrypted).
+    """
+    pages, key, butterfly_aes, lede = chunk_data
+    chunk_butterfly_time = 0
+    chunk_time_based_time = 0
+    chunk_butterfly_cpu_time = 0
+    chunk_time_based_cpu_time = 0
+    chunk_bytes = 0
+    chunk_cpu_start = time.thread_time()
+
+    for page in pages:
+        with tracing.span('page_extraction'):
+            content = page_text_cache.extract_text(page)
+        if content:
+            content_bytes = content.encode('utf-8')
+            chunk_bytes += len(content_bytes)
+
+        if content and butterfly_aes is not None:
+            stage_times = tracing.stage_times()
+            cpu_start = time.thread_time()
+            butterfly_start = time.perf_counter()
+            butterfly_aes.encrypt(content_bytes, key, stage_times)
+            butterfly_end = time.perf_counter()
+            chunk_butterfly_cpu_time += time.thread_time() - cpu_start
+            chunk_butterfly_time += (butterfly_end - butterfly_start)
+            tracing.observe('encrypt', butterfly_end - butterfly_start, 'butterfly')
+            tracing.observe_stage_times(stage_times, 'butterfly')
+
+        if content and lede is not None:
+            stage_times = tracing.stage_times()
+            cpu_start = time.thread_time()
+            time_start = time.perf_counter()
+            lede.encrypt(content_bytes, key, stage_times)
+            time_end = time.perf_counter()
+            chunk_time_based_cpu_time += time.thread_time() - cpu_start
+            chunk_time_based_time += (time_end - time_start)
+            tracing.observe('encrypt', time_end - time_start, 'lede')
+            tracing.observe_stage_times(stage_times, 'lede')
+
+        if progress:
+            progress(1)
+
+    return {
+        'butterfly_time': chunk_butterfly_time,
+        'lede_time': chunk_time_based_time,
+        'butterfly_cpu_time': chunk_butterfly_cpu_time,
+        'lede_cpu_time': chunk_time_based_cpu_time,
+        'cpu_time': time.thread_time() - chunk_cpu_start,
+        'bytes': chunk_bytes
+    }
+
+
+def evict_resolved(reader, cached):
+    """Drop the objects resolved since `cached` (a set of resolved_objects keys) from reader"""
+    for key in set(reader.resolved_objects) - cached:
+        # Concurrent batches may evict the same object first
+        reader.resolved_objects.pop(key, None)
+
+
+def process_reader_chunk(reader, chunk_data, progress=None):
+    """process_page_chunk over pages of reader, then drop the objects it resolved.
+
+    Text extraction and page hashing resolve every page's content streams into the
+    reader's object cache; evicting them after each batch keeps a long document's memory
+    flat instead of growing with the pages processed. Objects shared between pages (fonts)
+    are re-read by the next batch that needs them.
+    """
+    cached = set(reader.resolved_objects)
+    try:
+        return process_page_chunk(chunk_data, progress)
+    finally:
+        evict_resolved(reader, cached)
+
+
+def get_backend(backend=None):
+    """Resolve the page worker backend from the argument or PDF_WORKER_BACKEND"""
+    backend = (backend or os.environ.get('PDF_WORKER_BACKEND', BACKEND_THREAD)).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown PDF worker backend: {backend}")
+    return backend
+
+
+def process_pool_size():
+    return int(os.environ.get('PDF_WORKER_PROCESSES', 0)) or os.cpu_count() or 1
+
+
+def get_process_pool():
+    """Return the persistent process pool, starting it on first use"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            # spawn rather than fork: the web server is multi-threaded
+            _process_pool = ProcessPoolExecutor(
+                max_workers=process_pool_size(),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _process_pool
+
+
+def shutdown_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=True, cancel_futures=True)
+            _process_pool = None
+
+
+atexit.register(shutdown_process_pool)
+
+
+def _open_reader(input_pdf):
+    """Open input_pdf in a worker, reusing the reader while the file is unchanged"""
+    global _worker_reader, _worker_reader_id
+    stat = os.stat(input_pdf)
+    reader_id = (os.path.abspath(input_pdf), stat.st_mtime_ns, stat.st_size)
+    if reader_id != _worker_reader_id:
+        _worker_reader = open_pdf(input_pdf)
+        _worker_reader_id = reader_id
+    return _worker_reader
+
+
+def create_ciphers(ciphers=CIPHERS):
+    """(ButterflyAES or None, LEDECipher or None) for the cipher names in `ciphers`"""
+    return (
+        ButterflyAES() if CIPHER_BUTTERFLY in ciphers else None,
+        LEDECipher() if CIPHER_LEDE in ciphers else None
+    )
+
+
+def process_page_range(task):
+    """Process-pool entry point: (input_pdf, page_indices, key, ciphers) -> (chunk timings, trace observations)"""
+    input_pdf, page_indices, key, ciphers = task
+    if tracing.is_enabled():
+        tracing.registry.record_for_drain()
+    reader = _open_reader(input_pdf)
+    pages = [reader.pages[i] for i in page_indices]
+    timings = process_reader_chunk(reader, (pages, key) + create_ciphers(ciphers))
+    return timings, tracing.registry.drain()
+
+
+def run_timed(func, *args):
+    """Run func(*args) and return (result, worker name, busy seconds)"""
+    started = time.perf_counter()
+    result = func(*args)
+    worker = f"{os.getpid()}/{threading.current_thread().name}"
+    return result, worker, time.perf_counter() - started
+
+
+def object_sizes(reader):
+    """{object number: (file offset, bytes up to the next object)} for uncompressed objects.
+
+    Taken from the cross-reference offsets alone, so nothing is parsed or cached.
+    """
+    offsets = sorted((offset, idnum) for table in reader.xref.values() for idnum, offset in table.items())
+    reader.stream.seek(0, os.SEEK_END)
+    ends = [offset for offset, _ in offsets[1:]] + [reader.stream.tell()]
+    return {idnum: (offset, end - offset) for (offset, idnum), end in zip(offsets, ends)}
+
+
+def _is_array_object(reader, offset):
+    """True if the object at this offset is an array ("N G obj [ ... ]")"""
+    reader.stream.seek(offset)
+    return reader.stream.read(64).split(b'obj', 1)[-1].lstrip()[:1] == b'['
+
+
+def estimate_page_cost(page, sizes=None):
+    """Relative cost of a page: its content stream bytes, which drive both text
+    extraction and the number of blocks encrypted, plus a fixed per-page overhead.
+
+    With sizes (from object_sizes), a content stream's size is read from the file's
+    object offsets without loading the stream. Other layouts (content arrays, direct
+    streams) are resolved; schedule_documents drops what that caches afterwards.
+    """
+    cost = PAGE_BASE_COST
+    contents = page.raw_get('/Contents') if '/Contents' in page else None
+    if contents is None:
+        return cost
+    if sizes and isinstance(contents, IndirectObject) and contents.idnum in sizes:
+        offset, size = sizes[contents.idnum]
+        if not _is_array_object(contents.pdf, offset):
+            return cost + size
+    contents = contents.get_object()
+    streams = contents if isinstance(contents, list) else [contents]
+    for stream in streams:
+        if sizes and isinstance(stream, IndirectObject) and stream.idnum in sizes:
+            cost += sizes[stream.idnum][1]
+            continue
+        stream = stream.get_object()
+        length = stream.get('/Length')
+        cost += length if isinstance(length, int) else len(getattr(stream, '_data', b''))
+    return cost
+
+
+def schedule_page_batches(costs, workers, tasks_per_worker=TASKS_PER_WORKER, max_pages=MAX_BATCH_PAGES,
+                          target=None):
+    """Group page indices into batches of roughly equal cost, most expensive first.
+
+    Pages are sorted by cost (longest processing time first). Each batch is closed once it
+    reaches 1 / (workers * tasks_per_worker) of the total cost (or `target`), so heavy
+    pages run alone and early while cheap pages are packed together at the tail, where
+    idle workers pick them up. Returns [(indices, cost)].
+    """
+    order = sorted(range(len(costs)), key=lambda i: costs[i], reverse=True)
+    if target is None:
+        target = sum(costs) / max(workers * tasks_per_worker, 1)
+    batches = []
+    indices, batch_cost = [], 0
+    for i in order:
+        indices.append(i)
+        batch_cost += costs[i]
+        if batch_cost >= target or len(indices) >= max_pages:
+            batches.append((indices, batch_cost))
+            indices, batch_cost = [], 0
+    if indices:
+        batches.append((indices, batch_cost))
+    return batches
+
+
+def schedule_documents(documents, workers, tasks_per_worker=TASKS_PER_WORKER):
+    """Schedule the pages of several documents together.
+
+    documents is a list of (document, input_pdf, reader). All documents share one cost
+    target, and their batches are ordered by cost across documents, so the pages of small
+    documents fill the gaps left by large ones. A batch never mixes documents.
+    Returns [(document, input_pdf, reader, indices, cost)].
+    """
+    costs = []
+    for _, _, reader in documents:
+        # Estimating must not leave content streams cached in the reader, or every page's
+        # contents would stay in memory until its document is done
+        cached = set(reader.resolved_objects)
+        sizes = object_sizes(reader)
+        costs.append([estimate_page_cost(page, sizes) for page in reader.pages])
+        evict_resolved(reader, cached)
+    target = sum(map(sum, costs)) / max(workers * tasks_per_worker, 1)
+    batches = []
+    for (document, input_pdf, reader), document_costs in zip(documents, costs):
+        for indices, cost in schedule_page_batches(document_costs, workers, tasks_per_worker, target=target):
+            batches.append((document, input_pdf, reader, indices, cost))
+    batches.sort(key=lambda batch: batch[4], reverse=True)
+    return batches
+
+
+def resolve_workers(backend=None, workers=None):
+    """Worker count for a backend: `workers`, else the process pool size or the CPU count"""
+    if workers:
+        return workers
+    return process_pool_size() if get_backend(backend) == BACKEND_PROCESS else os.cpu_count() or 1
+
+
+def iter_document_batches(batches, key, backend=None, workers=None, progress=None, worker_stats=None,
+                          ciphers=CIPHERS, return_errors=False):
+    """Run scheduled batches on one pool; yield (document, indices, totals) in completion order.
+
+    batches is an iterable of (document, input_pdf, reader, indices, cost), as returned by
+    schedule_documents. It is consumed lazily: at most 2 * workers batches are in flight,
+    and a new one is submitted as soon as any finishes. Pages are pulled from the reader
+    only when their batch is submitted. totals is the process_page_chunk dict.
+
+    Only the ciphers named in `ciphers` are run. With return_errors, a batch that raises is
+    yielded with the exception in place of its totals, and the run carries on; otherwise
+    (and always for a broken process pool) the exception ends the run.
+
+    The thread backend calls progress(1) per page. The process backend calls
+    progress(pages) per finished batch.
+
+    If worker_stats is a dict, it is filled with
+    {worker: {'batches', 'pages', 'cost', 'busy_time'}}.
+    """
+    workers = resolve_workers(backend, workers)
+    if get_backend(backend) == BACKEND_PROCESS:
+        executor = None
+        pool = get_process_pool()
+        submit = lambda batch: pool.submit(run_timed, process_page_range, (batch[1], batch[3], key, ciphers))
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers)
+        butterfly_aes, lede = create_ciphers(ciphers)
+        submit = lambda batch: executor.submit(
+            run_timed, process_reader_chunk,
+            batch[2], ([batch[2].pages[i] for i in batch[3]], key, butterfly_aes, lede), progress
+        )
+
+    def finish(future):
+        document, indices, cost = pending.pop(future)
+        try:
+            result, worker, busy_time = future.result()
+        except BrokenProcessPool:
+            raise
+        except Exception as e:
+            if not return_errors:
+                raise
+            return document, indices, e
+        if executor is None:
+            result, observations = result
+            tracing.registry.merge(observations)
+            if progress:
+                progress(len(indices))
+        if worker_stats is not None:
+            stats = worker_stats.setdefault(worker, {'batches': 0, 'pages': 0, 'cost': 0, 'busy_time': 0.0})
+            stats['batches'] += 1
+            stats['pages'] += len(indices)
+            stats['cost'] += cost
+            stats['busy_time'] += busy_time
+        return document, indices, result
+
+    pending = {}
+    try:
+        for batch in batches:
+            document, _, _, indices, cost = batch
+            try:
+                future = submit(batch)
+            except BrokenProcessPool:
+                raise
+            except Exception as e:
+                # The thread backend reads the batch's pages here, before submitting
+                if not return_errors:
+                    raise
+                yield document, indices, e
+                continue
+            pending[future] = (document, indices, cost)
+            if len(pending) >= 2 * workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield finish(future)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield finish(future)
+    except BrokenProcessPool:
+        # A worker died; drop the pool so the next request starts a fresh one
+        shutdown_process_pool()
+        raise
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def iter_page_batches(input_pdf, reader, key, backend=None, workers=None, progress=None,
+                      worker_stats=None, ciphers=CIPHERS):
+    """Yield process_page_chunk totals per batch of pages of one document, in completion order.
+
+    See iter_document_batches for scheduling, progress and worker_stats.
+    """
+    workers = resolve_workers(backend, workers)
+    batches = schedule_documents([(None, input_pdf, reader)], workers)
+    for _, _, result in iter_document_batches(batches, key, backend, workers, progress, worker_stats, ciphers):
+        yield result
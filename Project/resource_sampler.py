@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+from collections import deque, namedtuple
+import psutil
+
+DEFAULT_INTERVAL = 0.1  # Seconds between samples
+DEFAULT_CAPACITY = 6000  # Samples kept; 10 minutes at the default interval
+
+# cpu_time is user + system seconds of the server and its child processes (pool workers);
+# jobs is the number of job windows open when the sample was taken
+Sample = namedtuple('Sample', 'timestamp cpu_time rss threads jobs')
+
+
+class ResourceSampler:
+    """Background thread keeping a ring buffer of process CPU time, RSS and thread count.
+
+    Callers never sleep for measurement: mark() takes one immediate sample and returns
+    its timestamp, and window(start, end) summarises the samples between two marks.
+    Jobs use open_window() and close_window() instead, so the sampler knows how many
+    jobs overlap and can report a job's own CPU time rather than the whole server's.
+    """
+
+    def __init__(self, interval=None, capacity=None, include_children=True):
+        self.interval = interval or float(os.environ.get('RESOURCE_SAMPLE_INTERVAL', DEFAULT_INTERVAL))
+        capacity = capacity or int(os.environ.get('RESOURCE_SAMPLE_CAPACITY', DEFAULT_CAPACITY))
+        self.include_children = include_children
+        self.samples = deque(maxlen=capacity)
+        self._process = psutil.Process()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._open_windows = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def _read(self):
+        processes = [self._process]
+        if self.include_children:
+            try:
+                processes += self._process.children(recursive=True)
+            except psutil.Error:
+                pass
+        cpu_time = 0.0
+        rss = 0
+        threads = 0
+        for process in processes:
+            try:
+                with process.oneshot():
+                    times = process.cpu_times()
+                    cpu_time += times.user + times.system
+                    rss += process.memory_info().rss
+                    threads += process.num_threads()
+            except psutil.Error:
+                continue  # Child exited between listing and reading
+        return Sample(time.monotonic(), cpu_time, rss, threads, self._open_windows)
+
+    def sample(self):
+        """Take one sample now and append it to the ring buffer"""
+        try:
+            sample = self._read()
+        except Exception as e:
+            print(f"Resource sampling error: {str(e)}")
+            return None
+        with self._lock:
+            self.samples.append(sample)
+        return sample
+
+    def mark(self):
+        """Sample immediately and return the timestamp, to open or close a window"""
+        sample = self.sample()
+        return sample.timestamp if sample else time.monotonic()
+
+    def open_window(self):
+        """Start a job's window (starting the sampler if needed); returns its start mark"""
+        self.start()
+        with self._lock:
+            self._open_windows += 1
+        return self.mark()
+
+    def close_window(self, start, cpu_time=None):
+        """End a window opened with open_window() and return window(start, now, cpu_time)"""
+        end = self.mark()
+        with self._lock:
+            self._open_windows -= 1
+        return self.window(start, end, cpu_time)
+
+    def latest(self):
+        with self._lock:
+            return self.samples[-1] if self.samples else None
+
+    def window(self, start, end, cpu_time=None):
+        """CPU, RSS and thread statistics for samples taken in [start, end].
+
+        process_cpu_percent is the server's CPU time (with its worker processes) over wall
+        time as a share of all cores, on the same 0-100 scale as psutil.cpu_percent().
+        cpu_percent is the same figure for `cpu_time`, the job's own CPU seconds summed
+        over its threads, when given; otherwise it is process_cpu_percent. Overlapping
+        jobs each count only their own threads that way.
+
+        RSS, thread counts and cpu_percent_peak (the busiest interval between two
+        consecutive samples) are process-wide: when concurrent_jobs (the most job windows
+        open at any sample) is above 1, other jobs' usage is included in them.
+        CPU percentages are capped at 100: CPU time counters advance in clock ticks,
+        which overstates the load of short windows.
+        """
+        with self._lock:
+            samples = [s for s in self.samples if start <= s.timestamp <= end]
+        if not samples:
+            return None
+
+        cores = psutil.cpu_count() or 1
+        wall = samples[-1].timestamp - samples[0].timestamp
+        process_cpu_time = max(0.0, samples[-1].cpu_time - samples[0].cpu_time)
+        percent = lambda seconds: min(100.0, seconds / wall / cores * 100) if wall > 0 else 0.0
+        if cpu_time is None:
+            cpu_time = process_cpu_time
+        interval_loads = [
+            max(0.0, b.cpu_time - a.cpu_time) / (b.timestamp - a.timestamp)
+            for a, b in zip(samples, samples[1:]) if b.timestamp > a.timestamp
+        ]
+        rss = [s.rss for s in samples]
+        threads = [s.threads for s in samples]
+        return {
+            'samples': len(samples),
+            'wall_time': wall,
+            'cpu_time': cpu_time,
+            'cpu_percent': percent(cpu_time),
+            'process_cpu_time': process_cpu_time,
+            'process_cpu_percent': percent(process_cpu_time),
+            'cpu_percent_peak': min(100.0, max(interval_loads) / cores * 100) if interval_loads else 0.0,
+            'rss_peak': max(rss),
+            'rss_avg': sum(rss) / len(rss),
+            'threads_peak': max(threads),
+            'threads_avg': sum(threads) / len(threads),
+            'concurrent_jobs': max(s.jobs for s in samples)
+        }
+
+
+resource_sampler = ResourceSampler()
@@ -0,0 +1,160 @@
+"""Mergeable running statistics for the run history rollups (see storage.py).
+
+RunningStats keeps count, mean, variance (Welford's M2), min and max, plus a
+QuantileSketch, and can be updated one value at a time or merged with another window's
+stats. Both serialize to plain dicts so they can be stored as JSON.
+"""
+import math
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+MAX_BINS = 1024  # Per sign; the lowest bins are collapsed beyond this
+
+
+class QuantileSketch:
+    """Streaming percentile sketch with bounded relative error (a DDSketch).
+
+    Values fall into logarithmic bins: bin i holds magnitudes in (gamma^(i-1), gamma^i],
+    so any quantile is returned within `relative_accuracy` of a true value. Negative
+    values (efficiency gains can be negative) have their own bins. Sketches with the
+    same accuracy merge exactly by adding bin counts.
+    """
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY, max_bins=MAX_BINS):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zero = 0
+        self.count = 0
+
+    def _index(self, magnitude):
+        return math.ceil(math.log(magnitude) / self._log_gamma)
+
+    def _value(self, index):
+        # Midpoint of the bin in relative terms
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, value, count=1):
+        if value > 0:
+            bins = self.positive
+        elif value < 0:
+            bins = self.negative
+        else:
+            self.zero += count
+            self.count += count
+            return
+        index = self._index(abs(value))
+        bins[index] = bins.get(index, 0) + count
+        self.count += count
+        if len(bins) > self.max_bins:
+            self._collapse(bins)
+
+    def _collapse(self, bins):
+        """Fold the smallest-magnitude bins into one, keeping max_bins"""
+        indices = sorted(bins)
+        excess = indices[:len(indices) - self.max_bins + 1]
+        bins[excess[-1]] = sum(bins.pop(index) for index in excess[:-1]) + bins[excess[-1]]
+
+    def merge(self, other):
+        for bins, other_bins in ((self.positive, other.positive), (self.negative, other.negative)):
+            for index, count in other_bins.items():
+                bins[index] = bins.get(index, 0) + count
+            if len(bins) > self.max_bins:
+                self._collapse(bins)
+        self.zero += other.zero
+        self.count += other.count
+        return self
+
+    def quantile(self, q):
+        """Approximate q-quantile (0 <= q <= 1), or None if empty"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return -self._value(index)
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return self._value(index)
+        return self._value(max(self.positive))
+
+    def to_dict(self):
+        return {
+            'accuracy': self.relative_accuracy,
+            'positive': self.positive,
+            'negative': self.negative,
+            'zero': self.zero
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['accuracy'])
+        # JSON object keys are strings
+        sketch.positive = {int(index): count for index, count in data['positive'].items()}
+        sketch.negative = {int(index): count for index, count in data['negative'].items()}
+        sketch.zero = data['zero']
+        sketch.count = sketch.zero + sum(sketch.positive.values()) + sum(sketch.negative.values())
+        return sketch
+
+
+class RunningStats:
+    """Count, mean, variance, min, max and a quantile sketch of one metric"""
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, minimum=None, maximum=None, sketch=None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = minimum
+        self.max = maximum
+        self.sketch = sketch or QuantileSketch()
+
+    def add(self, value):
+        """Welford's update"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.sketch.add(value)
+        return self
+
+    def merge(self, other):
+        """Combine with another window's stats (Chan et al.)"""
+        if not other.count:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def variance(self):
+        """Sample variance"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def summary(self, quantiles=(0.5, 0.9, 0.99)):
+        summary = {
+            'count': self.count,
+            'mean': self.mean if self.count else None,
+            'variance': self.variance,
+            'std': math.sqrt(self.variance),
+            'min': self.min,
+            'max': self.max
+        }
+        for q in quantiles:
+            summary[f'p{round(q * 100)}'] = self.sketch.quantile(q)
+        return summary
@@ -0,0 +1,115 @@
+from collections import OrderedDict
+import hashlib
+import threading
+
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024  # 16 MB of cached tables
+ENTRY_OVERHEAD = 128  # Rough per-entry cost of the key tuple and dict slot
+
+
+def key_fingerprint(key):
+    """Return a short, stable fingerprint so raw keys are never kept in the cache"""
+    return hashlib.sha256(bytes(key)).digest()[:16]
+
+
+def entry_size(value):
+    """Approximate the memory held by a cached value"""
+    nbytes = getattr(value, 'nbytes', None)
+    if nbytes is None:
+        nbytes = len(value)
+    return nbytes + ENTRY_OVERHEAD
+
+
+class SBoxCache:
+    """Bounded, thread-safe LRU cache for generated S-boxes"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cache_key):
+        """Return the cached value, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            return entry[0]
+
+    def get_many(self, cache_keys):
+        """Look up several keys under one lock acquisition; misses come back as None"""
+        values = []
+        with self._lock:
+            for cache_key in cache_keys:
+                entry = self._entries.get(cache_key)
+                if entry is None:
+                    self.misses += 1
+                    values.append(None)
+                else:
+                    self._entries.move_to_end(cache_key)
+                    self.hits += 1
+                    values.append(entry[0])
+        return values
+
+    def put(self, cache_key, value):
+        """Insert a value, evicting least recently used entries to fit the budget.
+
+        Sizes are recorded at insertion, so a value that grows afterwards should be put again.
+        """
+        size = entry_size(value)
+        with self._lock:
+            old = self._entries.pop(cache_key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._entries[cache_key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_create(self, cache_key, factory):
+        """Return the cached value, building and storing it with factory() on a miss"""
+        value = self.get(cache_key)
+        if value is None:
+            # Built outside the lock; a concurrent miss may build the same table twice
+            value = factory()
+            self.put(cache_key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits / lookups) if lookups else 0
+            }
+
+
+# Shared across requests so every page encrypted under the same key reuses its tables
+butterfly_sbox_cache = SBoxCache()
+# LEDE table sets, keyed by (system_time, params); each one is reused by encrypt and later passes
+lede_table_cache = SBoxCache(max_bytes=32 * 1024 * 1024)
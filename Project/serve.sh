@@ -0,0 +1,7 @@
+#!/bin/bash
+# Production serving: preforked gunicorn workers sharing precomputed S-box tables.
+# Set up the virtual environment with run.sh first. See gunicorn.conf.py for settings.
+
+source venv/bin/activate 2>/dev/null
+mkdir -p uploads
+exec gunicorn -c gunicorn.conf.py app:app "$@"
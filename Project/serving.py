@@ -0,0 +1,102 @@
+"""Production serving with a preforking WSGI server (gunicorn; see gunicorn.conf.py).
+
+The master imports the app once, builds the shared S-box segment for the deployment's
+keys, warms up both ciphers and freezes the heap, then forks the workers. Workers inherit
+the warmed-up interpreter and map the shared tables instead of each building their own.
+"""
+import gc
+import os
+import time
+import psutil
+import shared_tables
+from ciphers import ButterflyAES, LEDECipher
+from sbox_cache import SBoxCache
+
+WARMUP_BYTES = 4096
+
+
+def deployment_keys():
+    """Keys whose S-boxes are precomputed: PDF_KEY_FILE plus SHARED_TABLE_KEY_FILES.
+
+    Tables are only used by requests encrypted under one of these keys; uploads get random
+    keys unless PDF_FIXED_KEY=1 (see app.upload_key).
+    """
+    paths = ','.join(filter(None, [os.environ.get('PDF_KEY_FILE'), os.environ.get('SHARED_TABLE_KEY_FILES')]))
+    return list(dict.fromkeys(shared_tables.read_key_files(paths)))
+
+
+def warmup():
+    """Build the shared tables and run both ciphers once; returns timings in seconds"""
+    timings = {}
+    started = time.perf_counter()
+    keys = deployment_keys()
+    if keys:
+        tables = shared_tables.publish(keys)
+        timings['shared_tables'] = time.perf_counter() - started
+        print(f"Shared S-box tables: {len(keys)} keys x {tables.rounds} rounds, "
+              f"{tables.nbytes / 1024 / 1024:.1f} MB in {tables.name}")
+
+    # Private caches, so warmup tables are not inherited by every worker
+    started = time.perf_counter()
+    sample = os.urandom(WARMUP_BYTES)
+    key = keys[0] if keys else os.urandom(16)
+    ButterflyAES(sbox_cache=SBoxCache()).encrypt(sample, key)
+    LEDECipher(table_cache=SBoxCache()).encrypt(sample, key)
+    timings['ciphers'] = time.perf_counter() - started
+
+    # Keep the warmed-up objects out of the collector, so workers do not touch (and copy)
+    # the inherited pages when they collect
+    gc.freeze()
+    return timings
+
+
+def is_multiprocessing_helper(process):
+    try:
+        return any('multiprocessing' in arg for arg in process.cmdline())
+    except psutil.Error:
+        return False
+
+
+def memory_report(master_pid=None):
+    """Memory of the master and all its worker processes.
+
+    rss double-counts pages shared between processes; pss splits them across the
+    processes mapping them, so total pss is the real footprint. uss is private memory.
+    """
+    master_pid = master_pid or int(os.environ.get('SERVE_MASTER_PID', 0)) or os.getpid()
+    master = psutil.Process(master_pid)
+    # Server workers; the master's other children are multiprocessing helpers
+    workers = [child for child in master.children() if not is_multiprocessing_helper(child)]
+    processes = [master] + master.children(recursive=True)
+    report = {'workers': len(workers), 'processes': [], 'rss': 0, 'uss': 0, 'pss': 0}
+    for process in processes:
+        try:
+            info = process.memory_full_info()
+        except psutil.Error:
+            continue  # Exited, or not readable by this user
+        pss = getattr(info, 'pss', info.uss)
+        report['processes'].append({'pid': process.pid, 'rss': info.rss, 'uss': info.uss, 'pss': pss})
+        report['rss'] += info.rss
+        report['uss'] += info.uss
+        report['pss'] += pss
+    tables = shared_tables.stats()
+    report['shared_tables'] = tables
+    if tables:
+        # Memory saved compared with every worker building its own copy
+        report['shared_tables_saved_bytes'] = tables['bytes'] * max(len(workers) - 1, 0)
+    return report
+
+
+def on_starting(server):
+    os.environ['SERVE_MASTER_PID'] = str(os.getpid())
+
+
+def when_ready(server):
+    timings = warmup()
+    server.log.info("Warmup done: %s", ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items()))
+
+
+def on_exit(server):
+    tables = shared_tables.get_shared_tables()
+    if tables and tables.owner:
+        tables.close()
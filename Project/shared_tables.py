@@ -0,0 +1,175 @@
+"""Precomputed ButterflyAES S-boxes in a read-only multiprocessing.shared_memory segment.
+
+The serving master builds the S-boxes of the deployment's keys once, for round numbers
+1..SHARED_TABLE_ROUNDS, and publishes the segment name in SHARED_TABLES_NAME. Worker
+processes (forked server workers and spawned page workers alike) map the segment and
+read slabs of S-boxes as zero-copy views, instead of regenerating them per process.
+
+Segment layout: header (magic, key count, rounds), key count 16-byte key fingerprints,
+then a [keys, rounds, 256] uint8 table; row r - 1 of a key holds round number r.
+
+LEDE round tables are not shared: they depend on each message's system time and random
+parameters, so there is nothing to precompute.
+"""
+import os
+import struct
+import threading
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+from batch_engine import butterfly_sboxes
+from sbox_cache import key_fingerprint
+
+MAGIC = b'BSBOX001'
+HEADER = struct.Struct('<8sII')
+FINGERPRINT_SIZE = 16
+DEFAULT_ROUNDS = 4096  # Blocks covered per key: 64 KB of page text
+BUILD_BATCH = 512  # Rounds generated per butterfly_sboxes call during warmup
+
+_attached = None
+_attach_lock = threading.Lock()
+
+
+def table_rounds():
+    return int(os.environ.get('SHARED_TABLE_ROUNDS', DEFAULT_ROUNDS))
+
+
+def read_key_files(paths):
+    """Raw keys from a comma-separated list of key files (as written by encrypt_file.py)"""
+    keys = []
+    for path in filter(None, (p.strip() for p in (paths or '').split(','))):
+        with open(path, 'rb') as f:
+            keys.append(f.read())
+    return keys
+
+
+class SharedTables:
+    """Read-only view of a shared S-box segment"""
+
+    def __init__(self, shm, owner=False):
+        self.shm = shm
+        self.owner = owner
+        magic, nkeys, rounds = HEADER.unpack_from(shm.buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Shared memory segment {shm.name} does not hold S-box tables")
+        self.rounds = rounds
+        index_size = nkeys * FINGERPRINT_SIZE
+        index = bytes(shm.buf[HEADER.size:HEADER.size + index_size])
+        self.fingerprints = {
+            index[i * FINGERPRINT_SIZE:(i + 1) * FINGERPRINT_SIZE]: i for i in range(nkeys)
+        }
+        self.tables = np.ndarray(
+            (nkeys, rounds, 256), dtype=np.uint8, buffer=shm.buf, offset=HEADER.size + index_size
+        )
+        if not owner:
+            self.tables.flags.writeable = False
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def nbytes(self):
+        return self.shm.size
+
+    @classmethod
+    def create(cls, keys, rounds=None, name=None):
+        """Build the S-boxes of `keys` for round numbers 1..rounds into a new segment"""
+        rounds = rounds or table_rounds()
+        fingerprints = list(dict.fromkeys(key_fingerprint(key) for key in keys))
+        keys = {key_fingerprint(key): key for key in keys}
+        index_size = len(fingerprints) * FINGERPRINT_SIZE
+        size = HEADER.size + index_size + len(fingerprints) * rounds * 256
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        try:
+            HEADER.pack_into(shm.buf, 0, MAGIC, len(fingerprints), rounds)
+            shm.buf[HEADER.size:HEADER.size + index_size] = b''.join(fingerprints)
+            tables = cls(shm, owner=True)
+            for idx, fingerprint in enumerate(fingerprints):
+                for start in range(0, rounds, BUILD_BATCH):
+                    stop = min(start + BUILD_BATCH, rounds)
+                    tables.tables[idx, start:stop] = butterfly_sboxes(keys[fingerprint], range(start + 1, stop + 1))
+            tables.tables.flags.writeable = False
+            return tables
+        except Exception:
+            shm.close()
+            shm.unlink()
+            raise
+
+    @classmethod
+    def attach(cls, name):
+        """Map an existing segment read-only; the creating process stays responsible for unlinking it"""
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Before Python 3.13 attaching registers the segment with the resource tracker,
+            # which would unlink it when this process exits
+            shm = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return cls(shm)
+
+    def lookup(self, fingerprint, round_numbers):
+        """[n, 256] S-boxes for these round numbers, or None if the segment lacks any of them.
+
+        A contiguous ascending range (what the batch engine asks for) is a zero-copy view.
+        """
+        idx = self.fingerprints.get(fingerprint)
+        if idx is None:
+            return None
+        if isinstance(round_numbers, range) and round_numbers.step == 1:
+            if round_numbers.start < 1 or round_numbers.stop - 1 > self.rounds:
+                return None
+            return self.tables[idx, round_numbers.start - 1:round_numbers.stop - 1]
+        rows = np.asarray(round_numbers, dtype=np.int64)
+        if len(rows) == 0 or rows.min() < 1 or rows.max() > self.rounds:
+            return None
+        return self.tables[idx][rows - 1]
+
+    def close(self):
+        self.tables = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'keys': len(self.fingerprints),
+            'rounds': self.rounds,
+            'bytes': self.nbytes
+        }
+
+
+def publish(keys, rounds=None):
+    """Create the segment in the serving master and export its name to child processes"""
+    global _attached
+    tables = SharedTables.create(keys, rounds)
+    with _attach_lock:
+        _attached = tables
+    os.environ['SHARED_TABLES_NAME'] = tables.name
+    return tables
+
+
+def get_shared_tables():
+    """The segment named by SHARED_TABLES_NAME, attached on first use; None without one"""
+    global _attached
+    if _attached is not None:
+        return _attached or None
+    with _attach_lock:
+        if _attached is None:
+            name = os.environ.get('SHARED_TABLES_NAME')
+            try:
+                _attached = SharedTables.attach(name) if name else False
+            except Exception as e:
+                print(f"Shared table attach error: {str(e)}")
+                _attached = False
+        return _attached or None
+
+
+def lookup(fingerprint, round_numbers):
+    tables = get_shared_tables()
+    return tables.lookup(fingerprint, round_numbers) if tables else None
+
+
+def stats():
+    tables = get_shared_tables()
+    return tables.stats() if tables else None
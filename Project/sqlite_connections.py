@@ -0,0 +1,27 @@
+"""Per-thread SQLite connections shared by the run history and job stores."""
+import os
+import sqlite3
+import threading
+
+
+class ThreadConnections:
+    """One WAL-mode connection per thread, so readers never block the writer.
+
+    A connection is never used across fork: a child process opens its own.
+    """
+
+    def __init__(self, db_file, timeout=30):
+        self.db_file = db_file
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def get(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_file, timeout=self.timeout)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
@@ -0,0 +1,356 @@
+import os
+import json
+from datetime import datetime
+from rollups import QuantileSketch, RunningStats
+from cipher_mode import RUN_BATCH
+from sqlite_connections import ThreadConnections
+
+DEFAULT_DB_FILE = "encryption_results.db"
+LEGACY_JSON_FILE = "encryption_results.json"
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+DEFAULT_SERIES_POINTS = 200
+MAX_SERIES_POINTS = 2000
+
+# File size classes in KB, matching the units of the stored file_size
+SIZE_BUCKETS = (
+    ('small', 0, 100),
+    ('medium', 100, 1024),
+    ('large', 1024, 10 * 1024),
+    ('xlarge', 10 * 1024, None),
+)
+# Multi-document batch runs: their file_size is the total of all inputs, so they are kept
+# out of the per-file size classes (and their rollups)
+BATCH_BUCKET = 'batch'
+BUCKET_NAMES = [name for name, _, _ in SIZE_BUCKETS] + [BATCH_BUCKET]
+
+RUN_FIELDS = ('timestamp', 'butterfly_time', 'lede_time', 'cpu_usage', 'memory_usage',
+              'file_size', 'efficiency_gain')
+
+# Metrics with incrementally maintained rollups
+ROLLUP_METRICS = ('butterfly_time', 'lede_time', 'efficiency_gain', 'cpu_usage', 'memory_usage')
+# Rollup resolutions: the length of the timestamp prefix identifying a window, and the
+# suffix that turns it into the window's start time. 'all' is one window for all time.
+ROLLUP_RESOLUTIONS = (
+    ('hour', 13, ':00:00'),
+    ('day', 10, ' 00:00:00'),
+    ('all', 0, ''),
+)
+HOURS_PER_SERIES_POINT = 4  # Series over more hours than points * this are drawn from day windows
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    butterfly_time REAL NOT NULL,
+    lede_time REAL NOT NULL,
+    cpu_usage REAL NOT NULL,
+    memory_usage REAL NOT NULL,
+    file_size REAL NOT NULL,
+    efficiency_gain REAL NOT NULL,
+    size_bucket TEXT NOT NULL,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_timestamp ON runs (timestamp);
+CREATE INDEX IF NOT EXISTS runs_bucket_timestamp ON runs (size_bucket, timestamp);
+CREATE TABLE IF NOT EXISTS rollups (
+    resolution TEXT NOT NULL,
+    window_start TEXT NOT NULL,
+    size_bucket TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    mean REAL NOT NULL,
+    m2 REAL NOT NULL,
+    min REAL,
+    max REAL,
+    sketch TEXT NOT NULL,
+    PRIMARY KEY (resolution, window_start, size_bucket, metric)
+) WITHOUT ROWID;
+"""
+
+
+def size_bucket(file_size):
+    """Return the size class name for a file size in KB"""
+    for name, low, high in SIZE_BUCKETS:
+        if file_size >= low and (high is None or file_size < high):
+            return name
+    return SIZE_BUCKETS[0][0]
+
+
+def run_bucket(run_data):
+    """Bucket a run is stored and rolled up under"""
+    if run_data.get('run_type') == RUN_BATCH:
+        return BATCH_BUCKET
+    return size_bucket(run_data['file_size'])
+
+
+def efficiency_gain(butterfly_time, lede_time):
+    return ((butterfly_time - lede_time) / butterfly_time * 100) if butterfly_time > 0 else 0
+
+
+def rollup_windows(timestamp):
+    """(resolution, window start) of every rollup window a run's timestamp falls in"""
+    return [(resolution, timestamp[:length] + suffix if length else '')
+            for resolution, length, suffix in ROLLUP_RESOLUTIONS]
+
+
+class PerformanceStorage:
+    """Run history in SQLite: O(1) appends, safe for concurrent writers, indexed queries.
+
+    On first use an existing encryption_results.json is imported, so history carries over.
+
+    Every insert also updates the rollups of its hour, day and all-time windows and size
+    class in the same transaction: count, mean, variance, min, max and a percentile
+    sketch per metric. Summaries and chart series are read from the rollups, so their
+    cost does not grow with the number of runs.
+    """
+
+    def __init__(self, db_file=None, legacy_file=LEGACY_JSON_FILE):
+        self.db_file = db_file or os.environ.get('PERFORMANCE_DB', DEFAULT_DB_FILE)
+        self.legacy_file = legacy_file
+        self._connections = ThreadConnections(self.db_file)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        self.import_legacy_json()
+        self.rebuild_rollups()
+
+    def _connect(self):
+        return self._connections.get()
+
+    def import_legacy_json(self):
+        """Copy runs from the old JSON file into an empty database"""
+        if not self.legacy_file or not os.path.exists(self.legacy_file):
+            return 0
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("SELECT 1 FROM runs LIMIT 1").fetchone():
+                return 0
+            with open(self.legacy_file, 'r') as f:
+                runs = json.load(f)
+            for run in runs:
+                self._insert(conn, run)
+        return len(runs)
+
+    def _insert(self, conn, run_data):
+        extra = {k: v for k, v in run_data.items() if k not in RUN_FIELDS}
+        cursor = conn.execute(
+            "INSERT INTO runs (timestamp, butterfly_time, lede_time, cpu_usage, memory_usage, "
+            "file_size, efficiency_gain, size_bucket, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                run_data['timestamp'], run_data['butterfly_time'], run_data['lede_time'],
+                run_data['cpu_usage'], run_data['memory_usage'], run_data['file_size'],
+                run_data['efficiency_gain'], run_bucket(run_data),
+                json.dumps(extra) if extra else None
+            )
+        )
+        self._update_rollups(conn, run_data)
+        return cursor.lastrowid
+
+    def _update_rollups(self, conn, run_data):
+        """Add one run to its rollup rows; runs inside the insert's write transaction"""
+        bucket = run_bucket(run_data)
+        for resolution, window_start in rollup_windows(run_data['timestamp']):
+            for metric in ROLLUP_METRICS:
+                row = conn.execute(
+                    "SELECT * FROM rollups WHERE resolution = ? AND window_start = ? AND size_bucket = ? "
+                    "AND metric = ?", (resolution, window_start, bucket, metric)
+                ).fetchone()
+                stats = self._row_to_stats(row) if row else RunningStats()
+                stats.add(run_data[metric])
+                self._write_rollup(conn, resolution, window_start, bucket, metric, stats)
+
+    @staticmethod
+    def _write_rollup(conn, resolution, window_start, bucket, metric, stats):
+        conn.execute(
+            "INSERT OR REPLACE INTO rollups (resolution, window_start, size_bucket, metric, count, mean, m2, "
+            "min, max, sketch) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                resolution, window_start, bucket, metric, stats.count, stats.mean, stats.m2,
+                stats.min, stats.max, json.dumps(stats.sketch.to_dict())
+            )
+        )
+
+    @staticmethod
+    def _row_to_stats(row, sketch=True):
+        return RunningStats(
+            row['count'], row['mean'], row['m2'], row['min'], row['max'],
+            QuantileSketch.from_dict(json.loads(row['sketch'])) if sketch else None
+        )
+
+    def rebuild_rollups(self, force=False):
+        """Compute the rollups from all runs, for databases written before rollups existed.
+
+        Does nothing if rollups are already present, unless force is set.
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if not force and (conn.execute("SELECT 1 FROM rollups LIMIT 1").fetchone()
+                              or not conn.execute("SELECT 1 FROM runs LIMIT 1").fetchone()):
+                return 0
+            rollups = {}
+            count = 0
+            for row in conn.execute("SELECT timestamp, size_bucket, " + ", ".join(ROLLUP_METRICS) + " FROM runs"):
+                count += 1
+                for resolution, window_start in rollup_windows(row['timestamp']):
+                    for metric in ROLLUP_METRICS:
+                        key = (resolution, window_start, row['size_bucket'], metric)
+                        rollups.setdefault(key, RunningStats()).add(row[metric])
+            conn.execute("DELETE FROM rollups")
+            for key, stats in rollups.items():
+                self._write_rollup(conn, *key, stats)
+        return count
+
+    def save_run(self, butterfly_time, lede_time, cpu_usage, memory_usage, file_size, extra=None):
+        run_data = {
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'butterfly_time': butterfly_time,
+            'lede_time': lede_time,
+            'cpu_usage': cpu_usage,
+            'memory_usage': memory_usage,
+            'file_size': file_size,
+            'efficiency_gain': efficiency_gain(butterfly_time, lede_time)
+        }
+        if extra:
+            run_data.update(extra)
+        conn = self._connect()
+        with conn:
+            run_data['id'] = self._insert(conn, run_data)
+        return run_data
+
+    @staticmethod
+    def _row_to_run(row):
+        run = {field: row[field] for field in RUN_FIELDS}
+        run['id'] = row['id']
+        run['size_bucket'] = row['size_bucket']
+        if row['extra']:
+            run.update(json.loads(row['extra']))
+        return run
+
+    def _where(self, start=None, end=None, bucket=None, after_id=None):
+        clauses, args = [], []
+        if start:
+            clauses.append("timestamp >= ?")
+            args.append(start)
+        if end:
+            clauses.append("timestamp <= ?")
+            args.append(end)
+        if bucket:
+            clauses.append("size_bucket = ?")
+            args.append(bucket)
+        if after_id is not None:
+            clauses.append("id > ?")
+            args.append(after_id)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+    def iter_runs(self, start=None, end=None, bucket=None, after_id=None, limit=None):
+        """Yield runs oldest first, filtered by timestamp range and size bucket.
+
+        Pagination is by cursor: pass the last seen id as after_id for the next page.
+        """
+        where, args = self._where(start, end, bucket, after_id)
+        query = "SELECT * FROM runs" + where + " ORDER BY id"
+        if limit is not None:
+            query += " LIMIT ?"
+            args.append(limit)
+        for row in self._connect().execute(query, args):
+            yield self._row_to_run(row)
+
+    def count_runs(self, start=None, end=None, bucket=None):
+        where, args = self._where(start, end, bucket)
+        return self._connect().execute("SELECT COUNT(*) FROM runs" + where, args).fetchone()[0]
+
+    def recent_runs(self, limit=DEFAULT_PAGE_SIZE):
+        """The newest `limit` runs, oldest first"""
+        rows = self._connect().execute(
+            "SELECT * FROM (SELECT * FROM runs ORDER BY id DESC LIMIT ?) ORDER BY id", (limit,)
+        )
+        return [self._row_to_run(row) for row in rows]
+
+    def get_all_runs(self):
+        return list(self.iter_runs())
+
+    def _rollup_where(self, resolution, start=None, end=None, bucket=None, exclude_batch=False):
+        clauses, args = ["resolution = ?"], [resolution]
+        if start:
+            # Include the window the start time falls in
+            clauses.append("window_start >= ?")
+            args.append(dict(rollup_windows(start))[resolution])
+        if end:
+            clauses.append("window_start <= ?")
+            args.append(end)
+        if bucket:
+            clauses.append("size_bucket = ?")
+            args.append(bucket)
+        elif exclude_batch:
+            clauses.append("size_bucket != ?")
+            args.append(BATCH_BUCKET)
+        return " WHERE " + " AND ".join(clauses), args
+
+    def summary(self, start=None, end=None, bucket=None, quantiles=(0.5, 0.9, 0.99)):
+        """Count, mean, variance, std, min, max and percentiles of each rollup metric,
+        overall and per size class. Batch runs get their own entry and are left out of the
+        overall figures, unless bucket='batch' is asked for.
+
+        Without a time range this reads the all-time rollups; with one, the hour windows
+        it covers (so the range is rounded out to whole hours).
+        """
+        resolution = 'hour' if start or end else 'all'
+        where, args = self._rollup_where(resolution, start, end, bucket)
+        total = {metric: RunningStats() for metric in ROLLUP_METRICS}
+        buckets = {}
+        for row in self._connect().execute("SELECT * FROM rollups" + where, args):
+            stats = self._row_to_stats(row)
+            bucket_stats = buckets.setdefault(row['size_bucket'], {})
+            if row['metric'] in bucket_stats:
+                bucket_stats[row['metric']].merge(stats)
+            else:
+                bucket_stats[row['metric']] = RunningStats().merge(stats)
+            if bucket or row['size_bucket'] != BATCH_BUCKET:
+                total[row['metric']].merge(stats)
+        return {
+            'total': {metric: stats.summary(quantiles) for metric, stats in total.items()},
+            'buckets': {
+                name: {metric: stats.summary(quantiles) for metric, stats in buckets[name].items()}
+                for name in sorted(buckets, key=BUCKET_NAMES.index)
+            }
+        }
+
+    def series(self, points=DEFAULT_SERIES_POINTS, start=None, end=None, bucket=None):
+        """Mean of each rollup metric over time, in at most `points` points, oldest first.
+
+        Points are hour windows, or day windows for long ranges, with consecutive windows
+        merged (weighted by run count) until they fit. Each point has the start of its
+        first window as 'timestamp' and its number of runs as 'runs'. Batch runs are
+        only included with bucket='batch'.
+        """
+        conn = self._connect()
+        where, args = self._rollup_where('hour', start, end, bucket, exclude_batch=True)
+        hours = conn.execute("SELECT COUNT(DISTINCT window_start) FROM rollups" + where, args).fetchone()[0]
+        resolution = 'hour' if hours <= points * HOURS_PER_SERIES_POINT else 'day'
+        where, args = self._rollup_where(resolution, start, end, bucket, exclude_batch=True)
+
+        # Per window, merged across size classes: {metric: [count, mean]}
+        windows = {}
+        for row in conn.execute(
+            "SELECT window_start, metric, count, mean FROM rollups" + where + " ORDER BY window_start", args
+        ):
+            merged = windows.setdefault(row['window_start'], {}).setdefault(row['metric'], [0, 0.0])
+            merged[1] += (row['mean'] - merged[1]) * row['count'] / (merged[0] + row['count'])
+            merged[0] += row['count']
+
+        starts = list(windows)
+        per_point = -(-len(starts) // points) if starts else 1
+        series = []
+        for i in range(0, len(starts), per_point):
+            group = [windows[window_start] for window_start in starts[i:i + per_point]]
+            point = {'timestamp': starts[i], 'runs': 0}
+            for metric in ROLLUP_METRICS:
+                count = sum(window[metric][0] for window in group if metric in window)
+                point[metric] = sum(
+                    window[metric][0] * window[metric][1] for window in group if metric in window
+                ) / count if count else None
+                point['runs'] = max(point['runs'], count)
+            series.append(point)
+        return series
@@ -0,0 +1,157 @@
+"""The ButterflyAES and LEDECipher of the original app.py, kept unchanged as the reference
+the optimized ciphers must match byte for byte.
+"""
+import secrets
+import time
+import hashlib
+import struct
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad
+
+
+class ButterflyAES:
+    def __init__(self):
+        self.rounds = 12  # Increased rounds for better comparison
+        
+    def generate_butterfly_sbox(self, key, round_number):
+        """Generate more complex S-box using butterfly effect"""
+        sbox = bytearray(range(256))
+        
+        # Add round-specific complexity
+        round_key = bytes([(b + round_number) % 256 for b in key])
+        
+        # Multiple transformation passes
+        for pass_num in range(3):
+            # Forward transformation
+            for i in range(256):
+                j = (i + round_key[i % 16] + pass_num) % 256
+                sbox[i], sbox[j] = sbox[j], sbox[i]
+                
+                # Add butterfly effect
+                k = (sbox[i] + sbox[j] + round_number) % 256
+                sbox[k] = (sbox[k] * 7 + round_number) % 256
+            
+            # Reverse transformation
+            for i in range(255, -1, -1):
+                j = (sbox[i] + round_key[(i * round_number) % 16]) % 256
+                sbox[i], sbox[j] = sbox[j], sbox[i]
+        
+        return bytes(sbox)
+
+    def encrypt_block(self, block, key, round_number):
+        """Encrypt a single block with round-specific S-box"""
+        sbox = self.generate_butterfly_sbox(key, round_number)
+        cipher = AES.new(key, AES.MODE_ECB)
+        
+        # Apply multiple rounds
+        result = block
+        for _ in range(self.rounds):
+            result = bytes(sbox[b] for b in result)
+            result = cipher.encrypt(result)
+        
+        return result
+
+    def encrypt(self, plaintext, key):
+        """Perform enhanced butterfly-based encryption"""
+        try:
+            padded_data = pad(plaintext, AES.block_size)
+            blocks = [padded_data[i:i+AES.block_size] for i in range(0, len(padded_data), AES.block_size)]
+            
+            encrypted_blocks = []
+            for i, block in enumerate(blocks):
+                encrypted_block = self.encrypt_block(block, key, i + 1)
+                encrypted_blocks.append(encrypted_block)
+            
+            return b''.join(encrypted_blocks)
+        except Exception as e:
+            print(f"Butterfly encryption error: {str(e)}")
+            raise
+
+class LEDECipher:
+    def __init__(self):
+        self.rounds = 12
+        
+    def generate_time_arrays(self, system_time, alpha, beta, gamma, round_number):
+        """Generate time arrays with round-specific modifications"""
+        time_bytes = struct.pack('>Q', system_time * round_number) * 16
+        
+        KA = bytearray(time_bytes)
+        KB = bytearray(time_bytes)
+        KC = bytearray(128)
+        
+        for pass_num in range(3):
+            for i in range(64):
+                KB[i] = (KB[i] + alpha + round_number * pass_num) % 256
+                KB[127-i] = (KB[127-i] + beta + round_number * pass_num) % 256
+                KB[i], KB[127-i] = KB[127-i], KB[i]
+                
+                mid = (KB[i] * KB[127-i] + gamma) % 256
+                KB[i] = (KB[i] + mid) % 256
+                KB[127-i] = (KB[127-i] ^ mid) % 256
+            
+            for i in range(128):
+                KC[i] = (KA[i] * KB[i] + gamma * round_number + pass_num) % 256
+                KA[i] = (KA[i] + KC[i]) % 256
+        
+        return KA, KB, KC
+
+    def generate_sbox(self, KA, KB, KC, round_number):
+        """Generate dynamic S-box"""
+        sbox = []
+        used_values = set()
+        
+        for pass_num in range(3):
+            for arr in [KA, KB, KC]:
+                for i, value in enumerate(arr):
+                    modified_value = (value * round_number + pass_num) % 256
+                    if modified_value not in used_values:
+                        sbox.append(modified_value)
+                        used_values.add(modified_value)
+        
+        remaining = set(range(256)) - used_values
+        for value in sorted(remaining, reverse=bool(round_number % 2)):
+            sbox.append(value)
+            
+        return bytes(sbox[:256])
+
+    def encrypt_block(self, block, key, system_time, params, round_number):
+        """Encrypt a single block"""
+        alpha, beta, gamma = params
+        KA, KB, KC = self.generate_time_arrays(system_time, alpha, beta, gamma, round_number)
+        sbox = self.generate_sbox(KA, KB, KC, round_number)
+        
+        cipher = AES.new(key, AES.MODE_ECB)
+        result = block
+        
+        for round_idx in range(self.rounds):
+            round_sbox = self.generate_sbox(KA, KB, KC, round_idx + 1)
+            result = bytes(round_sbox[b] for b in result)
+            result = cipher.encrypt(result)
+        
+        return result
+
+    def encrypt(self, plaintext, key):
+        """Perform LEDE encryption"""
+        try:
+            alpha = secrets.randbelow(256)
+            beta = secrets.randbelow(256)
+            gamma = secrets.randbelow(256)
+            system_time = int(time.time() * 1000)
+            
+            padded_data = pad(plaintext, AES.block_size)
+            blocks = [padded_data[i:i+AES.block_size] for i in range(0, len(padded_data), AES.block_size)]
+            
+            encrypted_blocks = []
+            for i, block in enumerate(blocks):
+                encrypted_block = self.encrypt_block(block, key, system_time, (alpha, beta, gamma), i + 1)
+                encrypted_blocks.append(encrypted_block)
+            
+            return {
+                'ciphertext': b''.join(encrypted_blocks),
+                'system_time': system_time,
+                'params': (alpha, beta, gamma),
+                've': hashlib.sha256(f"{system_time}{alpha}{beta}{gamma}".encode()).hexdigest()
+            }
+        except Exception as e:
+            print(f"LEDE encryption error: {str(e)}")
+            raise
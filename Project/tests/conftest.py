@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+
+# The Project modules import each other as top-level modules; so do the Concept prototypes
+_project = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _project)
+sys.path.append(os.path.join(os.path.dirname(_project), 'Concept'))
+
+# Modules that open state at import time (app.py's run history, uploads, page text cache)
+# get a scratch directory instead of the working tree
+_scratch = tempfile.mkdtemp(prefix='pdf-tests-')
+os.environ.setdefault('PERFORMANCE_DB', os.path.join(_scratch, 'encryption_results.db'))
+os.environ.setdefault('UPLOAD_DIR', os.path.join(_scratch, 'uploads'))
+os.environ.setdefault('PAGE_TEXT_CACHE_DIR', os.path.join(_scratch, 'page_text_cache'))
@@ -0,0 +1,26 @@
+"""Small text PDFs built with PyPDF2, for tests that need real pages"""
+from PyPDF2 import PageObject, PdfWriter
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+
+def make_pdf(path, texts):
+    """Write a PDF with one page per string in texts (Helvetica, ASCII text)"""
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type1'),
+        NameObject('/BaseFont'): NameObject('/Helvetica'),
+    }))
+    for text in texts:
+        page = PageObject.create_blank_page(None, 612, 792)
+        content = DecodedStreamObject()
+        escaped = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+        content.set_data(f"BT /F1 12 Tf 72 720 Td ({escaped}) Tj ET".encode())
+        page[NameObject('/Contents')] = writer._add_object(content)
+        page[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject('/F1'): font})
+        })
+        writer.add_page(page)
+    with open(path, 'wb') as f:
+        writer.write(f)
+    return path
@@ -0,0 +1,117 @@
+"""Batch encryption: input discovery, manifest resume and the 'batch' history bucket"""
+import os
+import pytest
+import cipher_mode
+from batch import STATUS_DONE, STATUS_FAILED, Manifest, encrypt_batch, find_pdfs, run_batch
+from pdf_fixtures import make_pdf
+from storage import BATCH_BUCKET, PerformanceStorage
+
+KEY = b'k' * 16
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    root = tmp_path / 'reports'
+    (root / 'q1').mkdir(parents=True)
+    make_pdf(str(root / 'a.pdf'), ['alpha one', 'alpha two'])
+    make_pdf(str(root / 'q1' / 'b.pdf'), ['bravo'])
+    return root
+
+
+def run(documents, manifest):
+    return run_batch(documents, KEY, backend='thread', workers=2, manifest=manifest)
+
+
+def test_find_pdfs_keeps_layout_and_skips_outputs(inputs, tmp_path):
+    output_dir = str(inputs / 'encrypted')
+    os.makedirs(output_dir)
+    make_pdf(os.path.join(output_dir, 'old.pdf'), ['already encrypted'])
+    (inputs / 'notes.txt').write_text('not a pdf')
+
+    documents = find_pdfs([str(inputs)], output_dir)
+    assert [(os.path.basename(pdf), out) for _, pdf, out in documents] == [
+        ('a.pdf', os.path.normpath(output_dir)),
+        ('b.pdf', os.path.join(output_dir, 'q1'))
+    ]
+    assert all(name == os.path.realpath(pdf) for name, pdf, _ in documents)
+
+    other = tmp_path / 'other' / 'reports'
+    other.mkdir(parents=True)
+    make_pdf(str(other / 'a.pdf'), ['other'])
+    out = str(tmp_path / 'out')
+    targets = [target for _, _, target in find_pdfs([str(inputs), str(other)], out)]
+    assert os.path.join(out, 'reports') in targets
+    assert os.path.join(out, 'reports-2') in targets
+
+
+def test_manifest_resume_skips_unchanged_documents(inputs, tmp_path):
+    output_dir = str(tmp_path / 'out')
+    documents = find_pdfs([str(inputs)], output_dir)
+    manifest_path = str(tmp_path / 'manifest.jsonl')
+
+    manifest = Manifest(manifest_path)
+    first = run(documents, manifest)
+    manifest.close()
+    assert (first['done'], first['skipped'], first['pages']) == (2, 0, 3)
+    for result in first['documents']:
+        assert all(os.path.exists(path) for path in result['outputs'].values())
+
+    # A torn line left by an interrupted run is ignored
+    with open(manifest_path, 'a') as f:
+        f.write('{"document": "trunc')
+    manifest = Manifest(manifest_path)
+    assert all(manifest.is_done(name, pdf) for name, pdf, _ in documents)
+    second = run(documents, manifest)
+    assert (second['done'], second['skipped']) == (0, 2)
+
+    # Changing a document makes it due again; the other stays skipped
+    changed = documents[1][1]
+    stat = os.stat(changed)
+    os.utime(changed, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert not manifest.is_done(documents[1][0], changed)
+    third = run(documents, manifest)
+    manifest.close()
+    assert (third['done'], third['skipped']) == (1, 1)
+    assert third['documents'][0]['document'] == documents[1][0]
+    # Entries written after the torn line are read back
+    reopened = Manifest(manifest_path)
+    assert all(reopened.is_done(name, pdf) for name, pdf, _ in documents)
+    reopened.close()
+
+
+def test_failed_document_does_not_stop_the_batch(inputs, tmp_path):
+    (inputs / 'broken.pdf').write_bytes(b'not a pdf at all')
+    documents = find_pdfs([str(inputs)], str(tmp_path / 'out'))
+    manifest = Manifest(str(tmp_path / 'manifest.jsonl'))
+    aggregate = run(documents, manifest)
+    manifest.close()
+
+    statuses = {os.path.basename(result['input']): result['status'] for result in aggregate['documents']}
+    assert statuses == {'a.pdf': STATUS_DONE, 'b.pdf': STATUS_DONE, 'broken.pdf': STATUS_FAILED}
+    assert (aggregate['done'], aggregate['failed']) == (2, 1)
+    # Failed documents are retried on the next run
+    reopened = Manifest(manifest.path)
+    broken = next(document for document in documents if document[1].endswith('broken.pdf'))
+    assert not reopened.is_done(broken[0], broken[1])
+    reopened.close()
+
+
+def test_batch_runs_are_kept_out_of_file_buckets(inputs, tmp_path):
+    storage = PerformanceStorage(str(tmp_path / 'runs.db'), legacy_file=None)
+    storage.save_run(butterfly_time=0.2, lede_time=0.1, cpu_usage=10, memory_usage=1, file_size=10)
+    documents = find_pdfs([str(inputs)], str(tmp_path / 'out'))
+
+    aggregate = encrypt_batch(
+        documents, KEY, cipher_mode.MODE_COMPARE, backend='thread', workers=2, storage=storage
+    )
+
+    run = next(run for run in storage.get_all_runs() if run['id'] == aggregate['run_id'])
+    assert run['size_bucket'] == BATCH_BUCKET
+    assert run['run_type'] == cipher_mode.RUN_BATCH
+    assert run['batch']['pages'] == 3
+    summary = storage.summary()
+    assert summary['total']['butterfly_time']['count'] == 1
+    assert summary['buckets'][BATCH_BUCKET]['butterfly_time']['count'] == 1
+    assert storage.summary(bucket=BATCH_BUCKET)['total']['butterfly_time']['count'] == 1
+    assert sum(point['runs'] for point in storage.series()) == 1
+    assert sum(point['runs'] for point in storage.series(bucket=BATCH_BUCKET)) == 1
@@ -0,0 +1,96 @@
+"""Single-cipher mode with sampled shadow comparisons, and run_type tagging"""
+import os
+import random
+import time
+import pytest
+import cipher_mode
+import ingest
+from jobs import STATUS_DONE, JobQueue
+from pdf_fixtures import make_pdf
+from storage import PerformanceStorage
+
+KEY = b'k' * 16
+
+
+class FakeJob:
+    def report_progress(self, pages, total_pages):
+        pass
+
+
+@pytest.fixture
+def run_job(tmp_path, monkeypatch):
+    """run_encryption_job on a fresh upload, with its own run history and shadow queue"""
+    import app
+    storage = PerformanceStorage(str(tmp_path / 'runs.db'), legacy_file=None)
+    monkeypatch.setattr(app, 'storage', storage)
+    monkeypatch.setattr(app, 'shadow_queue', JobQueue(workers=1, max_queued=4))
+
+    def run(mode):
+        directory = tmp_path / f'upload-{len(os.listdir(tmp_path))}'
+        directory.mkdir()
+        path = make_pdf(str(directory / 'doc.pdf'), [f'page {i} ' * 30 for i in range(4)])
+        upload = ingest.Upload(directory.name, str(directory), path, 'doc.pdf', os.path.getsize(path), '')
+        return app.run_encryption_job(upload, KEY, False, mode, FakeJob()), storage, app.shadow_queue
+    return run
+
+
+def wait_for_job(queue, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while queue.get(job_id).status != STATUS_DONE:
+        assert time.monotonic() < deadline, queue.get(job_id).error
+        time.sleep(0.01)
+    return queue.get(job_id)
+
+
+def test_compare_mode_stores_a_compare_run(run_job):
+    result, storage, _ = run_job(cipher_mode.MODE_COMPARE)
+    assert result['butterfly_pdf'] and result['timebased_pdf']
+    assert result['shadow_job_id'] is None
+    [run] = storage.get_all_runs()
+    assert run['run_type'] == cipher_mode.RUN_COMPARE
+    assert run['butterfly_time'] > 0 and run['lede_time'] > 0
+
+
+def test_single_cipher_mode_without_sample_stores_nothing(run_job, monkeypatch):
+    monkeypatch.setenv('PDF_SHADOW_SAMPLE_RATE', '0')
+    result, storage, _ = run_job(cipher_mode.CIPHER_LEDE)
+    assert result['butterfly_time'] is None and result['butterfly_pdf'] is None
+    assert result['timebased_time'] > 0 and os.path.exists(result['timebased_pdf'])
+    assert result['shadow_job_id'] is None
+    assert storage.count_runs() == 0
+
+
+@pytest.mark.parametrize('primary', [cipher_mode.CIPHER_LEDE, cipher_mode.CIPHER_BUTTERFLY])
+def test_sampled_upload_stores_a_shadow_run(run_job, monkeypatch, primary):
+    monkeypatch.setenv('PDF_SHADOW_SAMPLE_RATE', '1')
+    result, storage, shadow_queue = run_job(primary)
+    shadow = cipher_mode.other_cipher(primary)
+    job = wait_for_job(shadow_queue, result['shadow_job_id'])
+
+    [run] = storage.get_all_runs()
+    assert run['id'] == job.result['id']
+    assert run['run_type'] == cipher_mode.RUN_SHADOW
+    assert (run['primary_cipher'], run['shadow_cipher']) == (primary, shadow)
+    assert run['butterfly_time'] > 0 and run['lede_time'] > 0
+    # The shadow cipher writes no output file
+    upload_dir = os.path.dirname(result['butterfly_pdf'] or result['timebased_pdf'])
+    assert not os.path.exists(os.path.join(upload_dir, cipher_mode.output_name(shadow, 'doc.pdf')))
+
+
+def test_sampling_rate(monkeypatch):
+    assert not any(cipher_mode.should_shadow(0) for _ in range(1000))
+    assert all(cipher_mode.should_shadow(1) for _ in range(1000))
+    random.seed(5)
+    share = sum(cipher_mode.should_shadow(0.2) for _ in range(10000)) / 10000
+    assert share == pytest.approx(0.2, abs=0.02)
+    monkeypatch.setenv('PDF_SHADOW_SAMPLE_RATE', '7')
+    assert cipher_mode.shadow_sample_rate() == 1.0
+
+
+def test_mode_selection(monkeypatch):
+    monkeypatch.setenv('PDF_CIPHER_MODE', 'LEDE')
+    assert cipher_mode.get_mode() == cipher_mode.CIPHER_LEDE
+    assert cipher_mode.mode_ciphers(cipher_mode.CIPHER_LEDE) == (cipher_mode.CIPHER_LEDE,)
+    assert cipher_mode.mode_ciphers(cipher_mode.MODE_COMPARE) == cipher_mode.CIPHERS
+    with pytest.raises(ValueError):
+        cipher_mode.get_mode('fastest')
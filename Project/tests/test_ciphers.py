@@ -0,0 +1,39 @@
+"""Ciphertext of the slab engine against the original per-block implementation"""
+import hashlib
+import os
+import pytest
+from Crypto.Util.Padding import pad
+from Crypto.Cipher import AES
+import baseline_ciphers
+from ciphers import ButterflyAES, LEDECipher
+
+SIZES = [0, 1, 15, 16, 17, 700]
+
+
+def baseline_lede(plaintext, key, system_time, params):
+    lede = baseline_ciphers.LEDECipher()
+    padded = pad(plaintext, AES.block_size)
+    return b''.join(
+        lede.encrypt_block(padded[i:i + AES.block_size], key, system_time, params, i // AES.block_size + 1)
+        for i in range(0, len(padded), AES.block_size)
+    )
+
+
+@pytest.fixture
+def key():
+    return os.urandom(16)
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_butterfly_matches_baseline(key, size):
+    plaintext = os.urandom(size)
+    assert ButterflyAES().encrypt(plaintext, key) == baseline_ciphers.ButterflyAES().encrypt(plaintext, key)
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_lede_matches_baseline(key, size):
+    plaintext = os.urandom(size)
+    result = LEDECipher().encrypt(plaintext, key)
+    assert result['ciphertext'] == baseline_lede(plaintext, key, result['system_time'], result['params'])
+    alpha, beta, gamma = result['params']
+    assert result['ve'] == hashlib.sha256(f"{result['system_time']}{alpha}{beta}{gamma}".encode()).hexdigest()
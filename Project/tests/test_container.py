@@ -0,0 +1,102 @@
+"""Container pack / range read / parallel unpack round-trips"""
+import io
+import os
+import psutil
+import pytest
+from container import HEADER, ContainerError, ContainerReader, write_container
+
+FRAME_BLOCKS = 4
+
+
+@pytest.fixture
+def packed(tmp_path):
+    key = os.urandom(16)
+    plaintext = os.urandom(1000)
+    path = tmp_path / 'data.cspc'
+    with open(path, 'wb') as dst:
+        fields = write_container(dst, io.BytesIO(plaintext), key, 'lede', frame_blocks=FRAME_BLOCKS, chunk_size=100)
+    return str(path), key, plaintext, fields
+
+
+def test_header_fields(packed):
+    path, key, plaintext, fields = packed
+    with ContainerReader(path, key) as reader:
+        assert reader.cipher_name == 'lede'
+        assert reader.plaintext_length == len(plaintext) == fields['plaintext_length']
+        assert reader.frame_count == fields['frame_count'] == len(reader.frame_offsets)
+        assert reader.params == fields['params']
+
+
+@pytest.mark.parametrize('offset, length', [
+    (0, 1000), (0, 1), (15, 2), (16, 16), (63, 65), (500, 10_000), (999, 1), (1000, 5), (0, 0)
+])
+def test_read_range(packed, offset, length):
+    path, key, plaintext, _ = packed
+    with ContainerReader(path, key) as reader:
+        assert reader.read_range(offset, length) == plaintext[offset:offset + length]
+
+
+def test_read_frame(packed):
+    path, key, plaintext, _ = packed
+    frame_bytes = FRAME_BLOCKS * 16
+    with ContainerReader(path, key) as reader:
+        frames = [reader.read_frame(frame) for frame in range(reader.frame_count)]
+    assert frames == [plaintext[i:i + frame_bytes] for i in range(0, len(plaintext), frame_bytes)]
+
+
+@pytest.mark.parametrize('backend', ['thread', 'process'])
+def test_decrypt_to(packed, backend):
+    path, key, plaintext, _ = packed
+    out = io.BytesIO()
+    with ContainerReader(path, key) as reader:
+        assert reader.decrypt_to(out, max_workers=2, backend=backend) == len(plaintext)
+    assert out.getvalue() == plaintext
+
+
+def test_empty_plaintext(tmp_path):
+    key = os.urandom(16)
+    path = tmp_path / 'empty.cspc'
+    with open(path, 'wb') as dst:
+        write_container(dst, io.BytesIO(b''), key, 'lede')
+    out = io.BytesIO()
+    with ContainerReader(str(path), key) as reader:
+        assert reader.plaintext_length == 0
+        reader.decrypt_to(out)
+    assert out.getvalue() == b''
+
+
+def test_not_a_container(tmp_path):
+    path = tmp_path / 'bogus.cspc'
+    path.write_bytes(b'x' * 200)
+    with pytest.raises(ContainerError):
+        ContainerReader(str(path), os.urandom(16))
+
+
+def test_butterfly_is_rejected_at_pack_time():
+    dst = io.BytesIO()
+    with pytest.raises(ValueError, match='not bijections'):
+        write_container(dst, io.BytesIO(b'data'), os.urandom(16), 'butterfly')
+    assert dst.getvalue() == b''
+
+
+def test_index_must_match_length(packed):
+    path, key, _, _ = packed
+    with open(path, 'r+b') as f:
+        header = bytearray(f.read(HEADER.size))
+        fields = list(HEADER.unpack(header))
+        fields[5] += 1  # frame_count
+        f.seek(0)
+        f.write(HEADER.pack(*fields))
+    with pytest.raises(ContainerError, match='frame index'):
+        ContainerReader(path, key)
+
+
+def test_file_is_closed_when_open_fails(tmp_path):
+    path = tmp_path / 'bogus.cspc'
+    path.write_bytes(b'x' * 200)
+    process = psutil.Process()
+    # The traceback keeps the half-built reader alive, so only an explicit close frees it
+    with pytest.raises(ContainerError) as excinfo:
+        ContainerReader(str(path), os.urandom(16))
+    assert excinfo.tb is not None
+    assert str(path) not in [f.path for f in process.open_files()]
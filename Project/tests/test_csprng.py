@@ -0,0 +1,70 @@
+"""Buffered CSPRNG pool: fork safety, thread isolation and parameter draws"""
+import os
+import threading
+import pytest
+import csprng
+from ciphers import LEDECipher
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs os.fork")
+def test_child_does_not_reuse_parent_pool():
+    csprng.token_bytes(16)  # Fill this thread's pool
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(read_end)
+            os.write(write_end, csprng.token_bytes(32))
+        finally:
+            os._exit(0)
+    os.close(write_end)
+    child_bytes = b''
+    while len(child_bytes) < 32:
+        chunk = os.read(read_end, 32)
+        if not chunk:
+            break
+        child_bytes += chunk
+    os.close(read_end)
+    os.waitpid(pid, 0)
+
+    # Without reseeding, the child would serve the parent's next buffered bytes
+    assert len(child_bytes) == 32
+    assert child_bytes != csprng.token_bytes(32)
+
+
+def test_threads_have_separate_pools():
+    drawn = []
+    threads = [threading.Thread(target=lambda: drawn.append(csprng.token_bytes(16))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(drawn)) == 4
+
+
+def test_bytes_are_never_handed_out_twice():
+    draws = [csprng.token_bytes(16) for _ in range(10000)]  # Crosses several pool refills
+    assert len(set(draws)) == len(draws)
+    assert len(csprng.token_bytes(csprng.POOL_SIZE)) == csprng.POOL_SIZE
+
+
+def test_token_keys():
+    keys = csprng.token_keys(5)
+    assert len(keys) == 5 and all(len(key) == csprng.KEY_SIZE for key in keys)
+
+
+def test_randbelow_range():
+    assert {csprng.randbelow(3) for _ in range(500)} == {0, 1, 2}
+    assert csprng.randbelow(1) == 0
+    with pytest.raises(ValueError):
+        csprng.randbelow(0)
+
+
+def test_lede_params_counts():
+    triple = csprng.lede_params()
+    assert isinstance(triple, tuple) and len(triple) == 3
+    assert csprng.lede_params(0) == []
+    assert len(csprng.lede_params(7)) == 7
+    with pytest.raises(ValueError):
+        csprng.lede_params(-1)
+    assert LEDECipher().generate_params_batch(0) == []
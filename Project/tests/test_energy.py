@@ -0,0 +1,92 @@
+"""RAPL counters (from a fake sysfs tree), wraparound and the fake energy source"""
+import pytest
+import energy
+from energy import EnergyMeter, FakeSource, JobEnergy, RaplSource
+
+
+class Clock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def write_zone(root, name, energy_uj, max_range_uj=1_000_000):
+    zone = root / name
+    zone.mkdir()
+    (zone / 'energy_uj').write_text(f'{energy_uj}\n')
+    (zone / 'max_energy_range_uj').write_text(f'{max_range_uj}\n')
+    return zone
+
+
+def test_rapl_reads_package_zones_only(tmp_path):
+    write_zone(tmp_path, 'intel-rapl:0', 100)
+    write_zone(tmp_path, 'intel-rapl:0:0', 50)  # core subzone, part of the package
+    write_zone(tmp_path, 'intel-rapl:1', 200)
+    (tmp_path / 'intel-rapl:2').mkdir()  # Unreadable zone
+    source = RaplSource(str(tmp_path))
+    assert source.available()
+    assert sorted(source.read().values()) == [100, 200]
+
+
+def test_rapl_counter_wraparound(tmp_path):
+    zone = write_zone(tmp_path, 'intel-rapl:0', 999_000, max_range_uj=1_000_000)
+    meter = EnergyMeter(RaplSource(str(tmp_path)))
+    start = meter.read()
+    (zone / 'energy_uj').write_text('4000\n')  # Wrapped past 1_000_000
+    assert meter.joules(start, meter.read()) == pytest.approx(0.005)
+
+
+def test_rapl_unavailable_without_zones(tmp_path):
+    assert not RaplSource(str(tmp_path)).available()
+
+
+def test_fake_source_tracks_cpu_time_and_wraps():
+    clock = Clock(1.0)
+    meter = EnergyMeter(FakeSource(watts=10, max_range_uj=2 ** 24, clock=clock))
+    start = meter.read()
+    clock.now = 2.5
+    assert meter.joules(start, meter.read()) == pytest.approx(15.0)
+
+    # Past the counter range: the reading wraps and is corrected once
+    start = meter.read()
+    clock.now = 2.5 + 1.5
+    assert meter.read()['fake'] < start['fake']
+    assert meter.joules(start, meter.read()) == pytest.approx(15.0)
+
+
+def test_job_energy_splits_by_cpu_time():
+    clock = Clock(0.0)
+    job = JobEnergy(EnergyMeter(FakeSource(watts=10, clock=clock)))
+    clock.now = 2.0  # The job used 2 CPU seconds: 20 J
+    summary = job.summarize(butterfly_cpu_time=1.5, lede_cpu_time=0.5, plaintext_bytes=energy.MB, pages=4)
+
+    assert summary['source'] == 'fake'
+    assert summary['total_joules'] == pytest.approx(20.0)
+    assert summary['joules_per_cpu_second'] == pytest.approx(10.0)
+    assert (summary['butterfly_joules'], summary['lede_joules']) == (pytest.approx(15.0), pytest.approx(5.0))
+    assert summary['lede_joules_per_mb'] == pytest.approx(5.0)
+    assert summary['butterfly_joules_per_page'] == pytest.approx(3.75)
+
+
+def test_create_source(monkeypatch):
+    assert energy.create_source('off') is None
+    assert isinstance(energy.create_source('fake'), FakeSource)
+    with pytest.raises(ValueError):
+        energy.create_source('solar')
+    # Without readable counters (VMs, non-root) rapl falls back to the fake source
+    monkeypatch.setattr(RaplSource, 'available', lambda self: False)
+    assert isinstance(energy.create_source('rapl'), FakeSource)
+    monkeypatch.setenv('ENERGY_SOURCE', 'auto')
+    assert isinstance(energy.create_source(), FakeSource)
+
+
+def test_set_source_overrides_the_meter():
+    try:
+        energy.set_source(None)
+        assert energy.start_job() is None
+        energy.set_source(FakeSource(watts=1))
+        assert energy.get_meter().source_name == 'fake'
+    finally:
+        energy.set_source(energy.create_source())
@@ -0,0 +1,102 @@
+"""Upload ingestion: one-pass size and SHA-256, mmap reading, and the retention sweep"""
+import hashlib
+import io
+import os
+import time
+import pytest
+from werkzeug.datastructures import FileStorage
+import ingest
+from pdf_fixtures import make_pdf
+
+
+class CapturingQueue:
+    """Stands in for app.job_queue and keeps the submitted upload"""
+
+    class Job:
+        id = 'captured'
+
+    def __init__(self):
+        self.args = None
+
+    def submit(self, func, *args):
+        self.args = args
+        return self.Job()
+
+
+def test_upload_is_hashed_while_the_request_is_parsed(tmp_path, monkeypatch):
+    import app
+    monkeypatch.setenv('UPLOAD_DIR', str(tmp_path))
+    queue = CapturingQueue()
+    monkeypatch.setattr(app, 'job_queue', queue)
+    # The body must reach the upload directory through IngestFile, not a later copy
+    finish_upload = ingest.finish_upload
+    streams = []
+    monkeypatch.setattr(ingest, 'finish_upload', lambda file_storage: (
+        streams.append(file_storage.stream) or finish_upload(file_storage)
+    ))
+    data = open(make_pdf(str(tmp_path / 'source.pdf'), ['hello']), 'rb').read()
+
+    response = app.app.test_client().post(
+        '/encrypt_pdf', data={'pdf_file': (io.BytesIO(data), '../evil name.pdf')},
+        content_type='multipart/form-data'
+    )
+    assert response.status_code == 202
+    upload = queue.args[0]
+    assert [type(stream) for stream in streams] == [ingest.IngestFile]
+    assert upload.size == len(data)
+    assert upload.sha256 == hashlib.sha256(data).hexdigest()
+    assert os.path.dirname(upload.directory) == str(tmp_path)
+    assert upload.filename == 'evil_name.pdf'
+    with open(upload.path, 'rb') as f:
+        assert f.read() == data
+
+
+def test_finish_upload_copies_other_streams_once(tmp_path):
+    data = os.urandom(3 * ingest.COPY_BUFFER_SIZE // 2)
+    upload = ingest.finish_upload(FileStorage(io.BytesIO(data), 'report.pdf'), root=str(tmp_path))
+    assert (upload.size, upload.sha256) == (len(data), hashlib.sha256(data).hexdigest())
+    assert upload.to_dict() == {'id': upload.id, 'filename': 'report.pdf', 'bytes': len(data),
+                                'sha256': upload.sha256}
+    upload.discard()
+    assert not os.path.exists(upload.directory)
+
+
+def test_open_pdf_reads_through_mmap(tmp_path):
+    reader = ingest.open_pdf(make_pdf(str(tmp_path / 'doc.pdf'), ['one', 'two']))
+    assert [page.extract_text() for page in reader.pages] == ['one', 'two']
+
+
+def test_copy_file_writes_every_destination(tmp_path):
+    source = tmp_path / 'in.bin'
+    source.write_bytes(os.urandom(5000))
+    targets = [str(tmp_path / 'a.bin'), str(tmp_path / 'b.bin')]
+    ingest.copy_file(str(source), targets, buffer_size=1024)
+    assert all(open(path, 'rb').read() == source.read_bytes() for path in targets)
+
+
+def test_sweep_removes_only_expired_uploads(tmp_path):
+    now = time.time()
+    old_dir, new_dir = tmp_path / 'old', tmp_path / 'new'
+    for directory in (old_dir, new_dir):
+        directory.mkdir()
+        (directory / 'doc.pdf').write_bytes(b'x')
+    legacy = tmp_path / 'legacy.pdf'
+    legacy.write_bytes(b'x')
+    os.utime(old_dir, (now - 7200, now - 7200))
+    os.utime(legacy, (now - 7200, now - 7200))
+
+    assert ingest.sweep(str(tmp_path), retention=3600, now=now) == 2
+    assert sorted(os.listdir(tmp_path)) == ['new']
+    assert ingest.sweep(str(tmp_path / 'missing'), retention=0) == 0
+
+
+def test_sweep_runs_at_most_once_per_interval(tmp_path, monkeypatch):
+    monkeypatch.setenv('UPLOAD_RETENTION_SECONDS', '0')
+    monkeypatch.setattr(ingest, '_last_sweep', 0.0)
+    (tmp_path / 'a').mkdir()
+    os.utime(tmp_path / 'a', (0, 0))
+    assert ingest.sweep_if_due(str(tmp_path)) == 1
+    (tmp_path / 'b').mkdir()
+    os.utime(tmp_path / 'b', (0, 0))
+    assert ingest.sweep_if_due(str(tmp_path)) == 0
+    assert os.listdir(tmp_path) == ['b']
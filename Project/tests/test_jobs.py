@@ -0,0 +1,99 @@
+"""Background job queue, job progress and the 429 back-pressure of /encrypt_pdf"""
+import io
+import os
+import threading
+import time
+import pytest
+from jobs import STATUS_DONE, STATUS_QUEUED, STATUS_RUNNING, JobQueue, JobStore, QueueFullError
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def blocked_queue():
+    """One worker held on a job, with room for one more waiting job"""
+    release = threading.Event()
+    queue = JobQueue(workers=1, max_queued=1)
+    running = queue.submit(lambda job: release.wait(5))
+    wait_for(lambda: running.status == STATUS_RUNNING)
+    yield queue, release
+    release.set()
+
+
+def test_submit_raises_when_full(blocked_queue):
+    queue, release = blocked_queue
+    waiting = queue.submit(lambda job: 'done')
+    assert waiting.status == STATUS_QUEUED
+    with pytest.raises(QueueFullError):
+        queue.submit(lambda job: 'rejected')
+
+    release.set()
+    wait_for(lambda: waiting.status == STATUS_DONE)
+    assert waiting.result == 'done'
+
+
+def test_progress_is_reported_and_stored(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.db'))
+    queue = JobQueue(workers=1, max_queued=2, store=store)
+    release = threading.Event()
+
+    def work(job):
+        job.report_progress(3, 10)
+        job.report_progress(2, 10)
+        release.wait(5)
+        return {'pages': 10}
+
+    job = queue.submit(work)
+    wait_for(lambda: job.pages_done == 5)
+    assert job.to_dict()['total_pages'] == 10
+    # The first progress report is written through at once, later ones are throttled
+    stored = store.load(job.id)
+    assert (stored.status, stored.total_pages) == (STATUS_RUNNING, 10)
+    assert stored.pages_done in (3, 5)
+
+    release.set()
+    wait_for(lambda: job.status == STATUS_DONE)
+    stored = store.load(job.id)
+    assert (stored.status, stored.pages_done, stored.result) == (STATUS_DONE, 5, {'pages': 10})
+
+
+def test_encrypt_pdf_returns_429_when_queue_is_full(blocked_queue, monkeypatch):
+    import app
+    queue, _ = blocked_queue
+    queue.submit(lambda job: None)  # Fill the one waiting slot
+    monkeypatch.setattr(app, 'job_queue', queue)
+    os.makedirs(os.environ['UPLOAD_DIR'], exist_ok=True)
+    uploads = set(os.listdir(os.environ['UPLOAD_DIR']))
+
+    response = app.app.test_client().post(
+        '/encrypt_pdf', data={'pdf_file': (io.BytesIO(b'%PDF-1.4 test'), 'test.pdf')},
+        content_type='multipart/form-data'
+    )
+    assert response.status_code == 429
+    assert 'full' in response.get_json()['error']
+    # The rejected upload is not left behind
+    assert set(os.listdir(os.environ['UPLOAD_DIR'])) == uploads
+
+
+def test_job_status_route_reports_progress(monkeypatch):
+    import app
+    queue = JobQueue(workers=1, max_queued=1)
+    release = threading.Event()
+
+    def work(job):
+        job.report_progress(4, 8)
+        release.wait(5)
+
+    job = queue.submit(work)
+    monkeypatch.setattr(app, 'job_queue', queue)
+    wait_for(lambda: job.pages_done == 4)
+    status = app.app.test_client().get(f'/jobs/{job.id}').get_json()
+    release.set()
+    assert (status['status'], status['pages_done'], status['total_pages']) == (STATUS_RUNNING, 4, 8)
+    assert app.app.test_client().get('/jobs/unknown').status_code == 404
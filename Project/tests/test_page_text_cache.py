@@ -0,0 +1,61 @@
+"""Content-addressed page text cache: hits for unchanged pages, bounded disk tier"""
+import os
+import pytest
+from PyPDF2 import PdfReader
+from page_text_cache import PageTextCache
+from pdf_fixtures import make_pdf
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / 'page_text')
+
+
+def pages(tmp_path, name, texts):
+    return PdfReader(make_pdf(str(tmp_path / name), texts)).pages
+
+
+def test_unchanged_page_hits_across_documents(tmp_path, cache_dir):
+    cache = PageTextCache(cache_dir=cache_dir)
+    first = pages(tmp_path, 'v1.pdf', ['cover page', 'chapter one'])
+    # A revision that changes only the second page
+    second = pages(tmp_path, 'v2.pdf', ['cover page', 'chapter one, revised'])
+
+    assert [cache.extract_text(page) for page in first] == ['cover page', 'chapter one']
+    assert cache.misses == 2
+    assert cache.page_key(first[0]) == cache.page_key(second[0])
+    assert cache.page_key(first[1]) != cache.page_key(second[1])
+
+    assert [cache.extract_text(page) for page in second] == ['cover page', 'chapter one, revised']
+    stats = cache.stats()
+    assert (stats['memory']['hits'], cache.misses) == (1, 3)
+
+
+def test_disk_tier_is_shared_by_new_instances(tmp_path, cache_dir):
+    page = pages(tmp_path, 'doc.pdf', ['persisted text'])[0]
+    PageTextCache(cache_dir=cache_dir).extract_text(page)
+
+    fresh = PageTextCache(cache_dir=cache_dir)
+    assert fresh.extract_text(page) == 'persisted text'
+    assert (fresh.disk_hits, fresh.misses) == (1, 0)
+
+
+def test_disk_tier_evicts_least_recently_used(cache_dir):
+    cache = PageTextCache(cache_dir=cache_dir, disk_bytes=250)
+    for key in ('aa01', 'bb02', 'cc03'):
+        cache.put(key, 'x' * 100)
+
+    # Only the two most recent fit in 250 bytes
+    assert cache.disk_evictions == 1
+    assert not os.path.exists(cache._path('aa01'))
+    assert cache.stats()['disk_bytes'] == 200
+    fresh = PageTextCache(cache_dir=cache_dir)
+    assert fresh.get('aa01') is None
+    assert fresh.get('cc03') == 'x' * 100
+
+
+def test_text_larger_than_disk_budget_stays_in_memory(cache_dir):
+    cache = PageTextCache(cache_dir=cache_dir, disk_bytes=10)
+    cache.put('dd04', 'y' * 100)
+    assert not os.path.exists(cache._path('dd04'))
+    assert cache.get('dd04') == 'y' * 100
@@ -0,0 +1,33 @@
+"""Bounded-memory page pipeline: the reader's object cache does not grow with page count"""
+import pytest
+import page_workers
+from ingest import open_pdf
+from pdf_fixtures import make_pdf
+
+KEY = b'k' * 16
+PAGES = 400
+
+
+@pytest.fixture(scope='module')
+def large_pdf(tmp_path_factory):
+    path = tmp_path_factory.mktemp('pdf') / 'large.pdf'
+    return make_pdf(str(path), [f'page {i} ' * 20 for i in range(PAGES)])
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_resolved_objects_stay_bounded(large_pdf, workers, monkeypatch, tmp_path):
+    monkeypatch.setattr(page_workers.page_text_cache, 'cache_dir', str(tmp_path))
+    reader = open_pdf(large_pdf)
+    sizes = []
+    progress = lambda pages: sizes.append(len(reader.resolved_objects))
+
+    results = list(page_workers.iter_page_batches(
+        large_pdf, reader, KEY, backend='thread', workers=workers, progress=progress
+    ))
+
+    assert len(sizes) == PAGES
+    assert sum(result['bytes'] for result in results) > 0
+    # At most the batches being processed hold resolved objects, never the whole document
+    in_flight_pages = workers * page_workers.MAX_BATCH_PAGES
+    assert max(sizes) <= in_flight_pages + 1
+    assert len(reader.resolved_objects) <= 1
@@ -0,0 +1,99 @@
+"""Streaming randomness statistics (Concept/randomness_stats.py) on inputs with known values"""
+import io
+import math
+import numpy as np
+import pytest
+from randomness_stats import StreamingStats, analyze_stream
+
+
+def stats_of(data, chunk_size=None, window=64, step=16):
+    stats = StreamingStats(window, step)
+    chunk_size = chunk_size or len(data) or 1
+    for i in range(0, len(data), chunk_size):
+        stats.update(data[i:i + chunk_size])
+    return stats
+
+
+def test_uniform_bytes():
+    report = stats_of(bytes(range(256)) * 16).report()
+    assert report['entropy'] == pytest.approx(8.0)
+    assert report['chi_square']['statistic'] == 0.0
+    assert report['chi_square']['p_value'] == pytest.approx(1.0)
+    assert report['monobit']['ones_fraction'] == 0.5
+    assert report['monobit']['p_value'] == pytest.approx(1.0)
+
+
+def test_constant_bytes():
+    report = stats_of(bytes(1024)).report()
+    assert report['entropy'] == 0.0
+    assert report['chi_square']['p_value'] == pytest.approx(0.0)
+    assert report['monobit']['ones_fraction'] == 0.0
+    # One run of zeros; the runs test is skipped when monobit fails
+    assert report['runs'] == {'runs': 1, 'p_value': 0.0}
+    assert report['serial_correlation'] == 0.0
+    assert report['window_entropy']['max'] == 0.0
+
+
+def test_alternating_bits_have_a_run_per_bit():
+    report = stats_of(b'\x55' * 100).report()
+    assert report['monobit']['ones_fraction'] == 0.5
+    assert report['runs']['runs'] == 800
+    assert report['runs']['p_value'] == pytest.approx(0.0)
+
+
+def test_runs_of_a_known_sequence():
+    # 0x0F 0xF0 = 00001111 11110000: three runs
+    assert stats_of(b'\x0f\xf0').runs()['runs'] == 3
+
+
+def test_serial_correlation_matches_direct_formula():
+    data = np.random.default_rng(1).integers(0, 256, 5000, dtype=np.uint8)
+    x = data.astype(np.float64)
+    y = np.roll(x, -1)  # Circular, as in ent
+    n = len(x)
+    expected = (n * (x * y).sum() - x.sum() ** 2) / (n * (x * x).sum() - x.sum() ** 2)
+    assert stats_of(data.tobytes(), chunk_size=333).serial_correlation() == pytest.approx(expected)
+    # A perfectly alternating sequence is fully anti-correlated
+    assert stats_of(b'\x00\xff' * 50).serial_correlation() == pytest.approx(-1.0)
+
+
+def test_window_entropy_matches_brute_force():
+    data = np.random.default_rng(2).integers(0, 16, 1000, dtype=np.uint8).tobytes()
+    window, step = 64, 16
+    expected = []
+    for start in range(0, len(data) - window + 1, step):
+        counts = np.bincount(np.frombuffer(data[start:start + window], dtype=np.uint8), minlength=256)
+        p = counts[counts > 0] / window
+        expected.append(-(p * np.log2(p)).sum())
+
+    stats = stats_of(data, chunk_size=100, window=window, step=step).report()['window_entropy']
+    assert stats['windows'] == len(expected)
+    assert stats['min'] == pytest.approx(min(expected))
+    assert stats['max'] == pytest.approx(max(expected))
+    assert stats['mean'] == pytest.approx(sum(expected) / len(expected))
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 16, 1000])
+def test_report_does_not_depend_on_chunking(chunk_size):
+    data = np.random.default_rng(3).integers(0, 256, 3000, dtype=np.uint8).tobytes()
+    whole = stats_of(data).report()
+    chunked = stats_of(data, chunk_size=chunk_size).report()
+    assert analyze_stream(io.BytesIO(data), chunk_size, 64, 16) == chunked
+    assert chunked['bytes'] == whole['bytes']
+    for name in ('entropy', 'serial_correlation'):
+        assert chunked[name] == pytest.approx(whole[name])
+    for name in ('chi_square', 'monobit', 'runs', 'window_entropy'):
+        assert chunked[name] == pytest.approx(whole[name]), name
+
+
+def test_window_must_be_a_multiple_of_step():
+    with pytest.raises(ValueError):
+        StreamingStats(window=100, step=16)
+
+
+def test_random_data_passes():
+    report = stats_of(np.random.default_rng(4).integers(0, 256, 1 << 16, dtype=np.uint8).tobytes()).report()
+    assert report['entropy'] > 7.99
+    assert report['monobit']['p_value'] > 0.001 and report['runs']['p_value'] > 0.001
+    assert abs(report['serial_correlation']) < 0.02
+    assert not math.isnan(report['chi_square']['p_value'])
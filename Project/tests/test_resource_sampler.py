@@ -0,0 +1,48 @@
+"""Resource sampler windows: per-job CPU attribution and overlap reporting"""
+import time
+from resource_sampler import ResourceSampler
+
+
+def burn(seconds):
+    deadline = time.thread_time() + seconds
+    while time.thread_time() < deadline:
+        pass
+
+
+def test_window_summarises_process_usage():
+    sampler = ResourceSampler(interval=0.01)
+    start = sampler.open_window()
+    burn(0.05)
+    resources = sampler.close_window(start)
+    assert resources['samples'] >= 2
+    assert resources['cpu_time'] == resources['process_cpu_time'] > 0
+    assert 0 < resources['cpu_percent'] <= 100
+    assert resources['rss_peak'] >= resources['rss_avg'] > 0
+    assert resources['concurrent_jobs'] == 1
+    sampler.stop()
+
+
+def test_overlapping_jobs_get_their_own_cpu():
+    sampler = ResourceSampler(interval=0.01)
+    first = sampler.open_window()
+    second = sampler.open_window()
+    burn(0.05)
+    second_resources = sampler.close_window(second, cpu_time=0.0)
+    first_resources = sampler.close_window(first, cpu_time=0.05)
+
+    assert second_resources['concurrent_jobs'] == first_resources['concurrent_jobs'] == 2
+    assert second_resources['cpu_percent'] == 0.0
+    assert first_resources['cpu_percent'] > 0
+    # A later window sees only itself
+    third = sampler.open_window()
+    assert sampler.close_window(third)['concurrent_jobs'] == 1
+    sampler.stop()
+
+
+def test_cpu_percent_is_capped():
+    sampler = ResourceSampler(interval=0.01)
+    start = sampler.open_window()
+    time.sleep(0.02)
+    resources = sampler.close_window(start, cpu_time=1e6)
+    assert resources['cpu_percent'] == 100.0
+    sampler.stop()
@@ -0,0 +1,70 @@
+"""Bounded LRU S-box cache"""
+import os
+import pytest
+import baseline_ciphers
+from ciphers import ButterflyAES
+from sbox_cache import ENTRY_OVERHEAD, SBoxCache, key_fingerprint
+
+ENTRY_BYTES = 256 + ENTRY_OVERHEAD
+
+
+def test_hit_and_miss_counters():
+    cache = SBoxCache()
+    assert cache.get('a') is None
+    cache.put('a', bytes(256))
+    assert cache.get('a') == bytes(256)
+    assert cache.get_many(['a', 'b']) == [bytes(256), None]
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (2, 2)
+    assert stats['hit_rate'] == 0.5
+
+
+def test_evicts_least_recently_used_within_byte_budget():
+    cache = SBoxCache(max_bytes=3 * ENTRY_BYTES)
+    for name in 'abc':
+        cache.put(name, bytes(256))
+    cache.get('a')  # b is now the least recently used
+    cache.put('d', bytes(256))
+    assert cache.get('b') is None
+    assert all(cache.get(name) is not None for name in 'acd')
+    assert cache.current_bytes == 3 * ENTRY_BYTES <= cache.max_bytes
+    assert cache.evictions == 1
+
+
+def test_replacing_an_entry_does_not_double_count():
+    cache = SBoxCache(max_bytes=2 * ENTRY_BYTES)
+    cache.put('a', bytes(256))
+    cache.put('a', bytes(256))
+    assert (len(cache), cache.current_bytes, cache.evictions) == (1, ENTRY_BYTES, 0)
+
+
+def test_oversized_value_is_not_cached():
+    cache = SBoxCache(max_bytes=ENTRY_BYTES)
+    cache.put('big', bytes(1024))
+    assert len(cache) == 0 and cache.current_bytes == 0
+
+
+def test_rejects_non_positive_budget():
+    with pytest.raises(ValueError):
+        SBoxCache(max_bytes=0)
+
+
+def test_get_or_create_builds_once():
+    cache = SBoxCache()
+    calls = []
+    factory = lambda: calls.append(1) or b'x' * 256
+    assert cache.get_or_create('k', factory) == cache.get_or_create('k', factory)
+    assert len(calls) == 1
+
+
+def test_butterfly_sboxes_are_cached_by_key_fingerprint():
+    cache = SBoxCache()
+    butterfly = ButterflyAES(sbox_cache=cache)
+    key = os.urandom(16)
+    sbox = butterfly.get_sbox(key, 3)
+    assert sbox == baseline_ciphers.ButterflyAES().generate_butterfly_sbox(key, 3)
+    assert butterfly.get_sbox(key, 3) == sbox
+    assert (cache.hits, cache.misses) == (1, 1)
+    # Raw keys never appear in cache keys
+    assert (key_fingerprint(key), 3) in cache._entries
+    assert all(key not in cache_key for cache_key in cache._entries)
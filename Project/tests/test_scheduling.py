@@ -0,0 +1,62 @@
+"""Cost-aware page scheduling and worker utilization"""
+import pytest
+import page_workers
+from ingest import open_pdf
+from page_workers import estimate_page_cost, object_sizes, schedule_documents, schedule_page_batches
+from pdf_fixtures import make_pdf
+
+
+def test_batches_cover_every_page_once_most_expensive_first():
+    costs = [10, 500, 20, 30, 400, 10, 10, 15]
+    batches = schedule_page_batches(costs, workers=2, tasks_per_worker=2)
+    indices = [i for batch, _ in batches for i in batch]
+    assert sorted(indices) == list(range(len(costs)))
+    # Longest processing time first: pages appear in decreasing cost order
+    assert [costs[i] for i in indices] == sorted(costs, reverse=True)
+    # Pages heavier than the per-batch target run alone
+    assert batches[0] == ([1], 500) and batches[1] == ([4], 400)
+    assert all(cost == sum(costs[i] for i in batch) for batch, cost in batches)
+
+
+def test_batches_respect_max_pages():
+    batches = schedule_page_batches([1] * 100, workers=1, tasks_per_worker=1, max_pages=8)
+    assert all(len(batch) <= 8 for batch, _ in batches)
+    assert sum(len(batch) for batch, _ in batches) == 100
+
+
+def test_page_cost_follows_content_size(tmp_path):
+    reader = open_pdf(make_pdf(str(tmp_path / 'doc.pdf'), ['x', 'y' * 500, 'z' * 5000]))
+    sizes = object_sizes(reader)
+    estimated = [estimate_page_cost(page, sizes) for page in reader.pages]
+    resolved = [estimate_page_cost(page) for page in reader.pages]
+    assert estimated == sorted(estimated) and resolved == sorted(resolved)
+    assert all(cost > page_workers.PAGE_BASE_COST for cost in estimated)
+
+
+def test_documents_share_one_schedule(tmp_path):
+    small = open_pdf(make_pdf(str(tmp_path / 'small.pdf'), ['a' * 50] * 3))
+    large = open_pdf(make_pdf(str(tmp_path / 'large.pdf'), ['b' * 3000] * 6))
+    batches = schedule_documents([('small', 'small.pdf', small), ('large', 'large.pdf', large)], workers=2)
+
+    costs = [batch[4] for batch in batches]
+    assert costs == sorted(costs, reverse=True)
+    assert batches[0][0] == 'large' and batches[-1][0] == 'small'
+    for document, reader in (('small', small), ('large', large)):
+        indices = [i for batch in batches if batch[0] == document for i in batch[3]]
+        assert sorted(indices) == list(range(len(reader.pages)))
+    # Every batch reads one document only
+    assert all(batch[2] is (small if batch[0] == 'small' else large) for batch in batches)
+
+
+@pytest.mark.parametrize('backend', ['thread', 'process'])
+def test_worker_utilization(tmp_path, backend):
+    import app
+    pdf = make_pdf(str(tmp_path / 'doc.pdf'), [f'page {i} ' * 50 for i in range(12)])
+    results = app.encrypt_pdf(pdf, b'k' * 16, backend=backend, write_outputs=False)
+
+    workers = results['workers']
+    assert sum(stats['pages'] for stats in workers.values()) == 12
+    for stats in workers.values():
+        assert stats['batches'] >= 1 and stats['cost'] > 0
+        assert 0 < stats['utilization'] <= 1.0
+        assert stats['busy_time'] <= results['pipeline_time']
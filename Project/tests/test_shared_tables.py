@@ -0,0 +1,70 @@
+"""Shared-memory S-box tables"""
+import numpy as np
+import pytest
+import shared_tables
+from ciphers import ButterflyAES
+from sbox_cache import SBoxCache, key_fingerprint
+from shared_tables import SharedTables, read_key_files
+
+KEY = bytes(range(32))
+OTHER_KEY = bytes(range(1, 33))
+ROUNDS = 64
+
+
+@pytest.fixture
+def tables():
+    tables = SharedTables.create([KEY, KEY], rounds=ROUNDS)
+    yield tables
+    tables.close()
+
+
+def test_lookup_matches_generated_sboxes(tables):
+    cipher = ButterflyAES()
+    fingerprint = key_fingerprint(KEY)
+    assert tables.stats()['keys'] == 1
+    for round_number in (1, 17, ROUNDS):
+        row = tables.lookup(fingerprint, [round_number])
+        assert row[0].tobytes() == cipher.generate_butterfly_sbox(KEY, round_number)
+
+
+def test_contiguous_range_is_a_read_only_view(tables):
+    view = tables.lookup(key_fingerprint(KEY), range(5, 21))
+    assert view.shape == (16, 256)
+    assert np.shares_memory(view, tables.tables)
+    attached = SharedTables.attach(tables.name)
+    try:
+        shared = attached.lookup(key_fingerprint(KEY), range(5, 21))
+        assert np.array_equal(shared, view)
+        assert not shared.flags.writeable
+    finally:
+        attached.close()
+
+
+def test_lookup_misses_fall_through(tables):
+    fingerprint = key_fingerprint(KEY)
+    assert tables.lookup(key_fingerprint(OTHER_KEY), range(1, 4)) is None
+    assert tables.lookup(fingerprint, range(ROUNDS - 1, ROUNDS + 2)) is None
+    assert tables.lookup(fingerprint, [0, 1]) is None
+    assert tables.lookup(fingerprint, []) is None
+
+
+def test_cipher_reads_published_tables(monkeypatch, tables):
+    monkeypatch.setattr(shared_tables, '_attached', tables)
+    cipher = ButterflyAES(SBoxCache())
+    sboxes = cipher.get_sboxes(KEY, range(1, 9))
+    assert np.shares_memory(sboxes, tables.tables)
+    assert cipher.get_sbox(KEY, 3) == cipher.generate_butterfly_sbox(KEY, 3)
+    assert cipher.sbox_cache.stats()['misses'] == 0
+    # Rounds past the segment are generated and cached as before
+    assert cipher.get_sbox(KEY, ROUNDS + 1) == cipher.generate_butterfly_sbox(KEY, ROUNDS + 1)
+    assert cipher.sbox_cache.stats()['misses'] == 1
+
+
+def test_read_key_files(tmp_path):
+    paths = []
+    for name, key in (('a.key', KEY), ('b.key', OTHER_KEY)):
+        path = tmp_path / name
+        path.write_bytes(key)
+        paths.append(str(path))
+    assert read_key_files(f" {paths[0]}, ,{paths[1]}") == [KEY, OTHER_KEY]
+    assert read_key_files(None) == []
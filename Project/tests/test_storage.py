@@ -0,0 +1,99 @@
+"""Rollup-backed summary and series against the same figures computed from the raw runs"""
+import random
+import pytest
+from storage import ROLLUP_METRICS, PerformanceStorage
+
+TIMESTAMPS = [
+    f'2024-03-{day:02d} {hour:02d}:{minute:02d}:00'
+    for day in (1, 2, 5) for hour in (0, 9, 23) for minute in (0, 30, 59)
+]
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = PerformanceStorage(str(tmp_path / 'runs.db'), legacy_file=str(tmp_path / 'none.json'))
+    rng = random.Random(7)
+    for timestamp in TIMESTAMPS * 3:
+        storage.save_run(
+            butterfly_time=rng.uniform(0.001, 0.5),
+            lede_time=rng.uniform(0.001, 0.5),
+            cpu_usage=rng.choice([0.0, rng.uniform(0, 100)]),
+            memory_usage=rng.uniform(0, 5),
+            file_size=rng.choice([10, 500, 5000, 50000]),
+            extra={'timestamp': timestamp}
+        )
+    return storage
+
+
+def exact(values, quantiles=(0.5, 0.9, 0.99)):
+    values = sorted(values)
+    mean = sum(values) / len(values)
+    variance = sum((value - mean) ** 2 for value in values) / (len(values) - 1)
+    result = {'count': len(values), 'mean': mean, 'variance': variance, 'min': values[0], 'max': values[-1]}
+    for q in quantiles:
+        result[f'p{round(q * 100)}'] = values[int(q * (len(values) - 1))]
+    return result
+
+
+def assert_matches(summary, runs):
+    for metric in ROLLUP_METRICS:
+        expected = exact([run[metric] for run in runs])
+        got = summary[metric]
+        assert got['count'] == expected['count']
+        for field in ('mean', 'variance', 'min', 'max'):
+            assert got[field] == pytest.approx(expected[field], rel=1e-9, abs=1e-12), (metric, field)
+        for field in ('p50', 'p90', 'p99'):
+            # The sketch's relative accuracy
+            assert got[field] == pytest.approx(expected[field], rel=0.0101, abs=1e-12), (metric, field)
+
+
+def test_summary_matches_runs(storage):
+    runs = storage.get_all_runs()
+    summary = storage.summary()
+    assert_matches(summary['total'], runs)
+    assert len(summary['buckets']) > 1
+    for bucket, stats in summary['buckets'].items():
+        assert_matches(stats, [run for run in runs if run['size_bucket'] == bucket])
+
+
+def test_summary_bucket_filter(storage):
+    runs = storage.get_all_runs()
+    for bucket in ('small', 'large'):
+        assert_matches(storage.summary(bucket=bucket)['total'], [run for run in runs if run['size_bucket'] == bucket])
+
+
+def test_summary_time_range(storage):
+    start, end = '2024-03-01 09:00:00', '2024-03-02 09:59:59'
+    runs = list(storage.iter_runs(start=start, end=end))
+    assert_matches(storage.summary(start=start, end=end)['total'], runs)
+
+
+def test_rebuild_rollups_matches_incremental(storage):
+    before = storage.summary()
+    assert storage.rebuild_rollups(force=True) == storage.count_runs()
+    after = storage.summary()
+    for metric in ROLLUP_METRICS:
+        for field, value in before['total'][metric].items():
+            assert after['total'][metric][field] == pytest.approx(value, rel=1e-9, abs=1e-12)
+
+
+def test_series_matches_hourly_means(storage):
+    hours = {}
+    for run in storage.get_all_runs():
+        hours.setdefault(run['timestamp'][:13] + ':00:00', []).append(run)
+
+    series = storage.series(points=1000)
+    assert [point['timestamp'] for point in series] == sorted(hours)
+    for point in series:
+        runs = hours[point['timestamp']]
+        assert point['runs'] == len(runs)
+        for metric in ROLLUP_METRICS:
+            assert point[metric] == pytest.approx(sum(run[metric] for run in runs) / len(runs), rel=1e-9, abs=1e-12)
+
+
+def test_series_merges_windows_by_run_count(storage):
+    runs = storage.get_all_runs()
+    series = storage.series(points=1)
+    assert len(series) == 1
+    for metric in ROLLUP_METRICS:
+        assert series[0][metric] == pytest.approx(sum(run[metric] for run in runs) / len(runs), rel=1e-9)
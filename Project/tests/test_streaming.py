@@ -0,0 +1,72 @@
+"""Streaming encryption against whole-buffer encryption, and encrypt_file round-trips"""
+import json
+import os
+import pytest
+from ciphers import ButterflyAES, LEDECipher
+import encrypt_file
+
+# Small chunk sizes so streams cross several chunk (and block index) boundaries
+CHUNK_SIZES = [16, 100, 4096]
+STREAM_SIZES = [0, 15, 16, 1000, 5000]
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.fixture
+def key():
+    return os.urandom(16)
+
+
+@pytest.mark.parametrize('chunk_size', CHUNK_SIZES)
+@pytest.mark.parametrize('size', STREAM_SIZES)
+def test_butterfly_stream_matches_whole(key, size, chunk_size):
+    plaintext = os.urandom(size)
+    butterfly = ButterflyAES()
+    streamed = b''.join(butterfly.encrypt_stream(chunked(plaintext, 37), key, chunk_size))
+    assert streamed == butterfly.encrypt(plaintext, key)
+
+
+@pytest.mark.parametrize('chunk_size', CHUNK_SIZES)
+@pytest.mark.parametrize('size', STREAM_SIZES)
+def test_lede_stream_matches_whole(key, size, chunk_size):
+    plaintext = os.urandom(size)
+    lede = LEDECipher()
+    result = lede.encrypt(plaintext, key)
+    system_time, params = result['system_time'], result['params']
+    streamed = b''.join(lede.encrypt_stream(chunked(plaintext, 37), key, system_time, params, chunk_size))
+    assert streamed == result['ciphertext']
+
+    decrypted = b''.join(lede.decrypt_stream(chunked(streamed, 53), key, system_time, params, result['ve'], chunk_size))
+    assert decrypted == plaintext
+    assert lede.decrypt(streamed, key, system_time, params, result['ve']) == plaintext
+
+
+def test_encrypt_file_round_trip(tmp_path):
+    plaintext = os.urandom(10_000)
+    source = tmp_path / 'data.bin'
+    source.write_bytes(plaintext)
+    encrypted, restored = tmp_path / 'data.enc', tmp_path / 'data.out'
+
+    encrypt_file.main(['lede', str(source), str(encrypted), '--chunk-size', '1024'])
+    metadata = json.loads((tmp_path / 'data.enc.json').read_text())
+    assert metadata['plaintext_size'] == len(plaintext)
+    assert metadata['ciphertext_size'] == encrypted.stat().st_size
+
+    encrypt_file.main(['lede', str(encrypted), str(restored), '--decrypt'])
+    assert restored.read_bytes() == plaintext
+
+
+def test_butterfly_output_is_flagged_unrecoverable(tmp_path, capsys):
+    source = tmp_path / 'data.bin'
+    source.write_bytes(b'x' * 100)
+    encrypted = tmp_path / 'data.enc'
+
+    encrypt_file.main(['butterfly', str(source), str(encrypted)])
+    assert encrypt_file.UNRECOVERABLE_WARNING in capsys.readouterr().err
+
+    with pytest.raises(SystemExit) as exit_info:
+        encrypt_file.main(['butterfly', str(encrypted), str(tmp_path / 'data.out'), '--decrypt'])
+    assert exit_info.value.code == 2
+    assert not (tmp_path / 'data.out').exists()
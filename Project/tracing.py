@@ -0,0 +1,154 @@
+"""Stage timing spans and Prometheus text exposition.
+
+Disabled unless PDF_METRICS=1. When disabled, span() returns a shared no-op context
+manager and observe() returns at once, so instrumented code pays one function call.
+
+    with span('pdf_write'):
+        ...
+    observe_stage_times(stage_times, cipher='lede')  # batch_engine stage_times dict
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+# Upper bounds in seconds; one histogram per (stage, cipher)
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0)
+METRIC_NAME = 'pdf_stage_duration_seconds'
+
+_enabled = os.environ.get('PDF_METRICS', '0') == '1'
+_noop_span = nullcontext()
+
+
+def is_enabled():
+    return _enabled
+
+
+def set_enabled(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+
+class Histogram:
+    """Cumulative-bucket histogram of durations in seconds"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.counts[bisect_left(self.buckets, seconds)] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class Registry:
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._pending = None  # Raw observations kept for drain() in pool workers
+
+    def histogram(self, stage, cipher=''):
+        key = (stage, cipher)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram())
+        return histogram
+
+    def observe(self, stage, seconds, cipher=''):
+        self.histogram(stage, cipher).observe(seconds)
+        if self._pending is not None:
+            with self._lock:
+                self._pending.append((stage, cipher, seconds))
+
+    def record_for_drain(self):
+        """Keep raw observations so a pool worker can ship them back to the parent"""
+        with self._lock:
+            if self._pending is None:
+                self._pending = []
+
+    def drain(self):
+        """Return and clear the observations kept since the last drain"""
+        with self._lock:
+            pending = self._pending or []
+            if self._pending is not None:
+                self._pending = []
+        return pending
+
+    def merge(self, observations):
+        for stage, cipher, seconds in observations:
+            self.histogram(stage, cipher).observe(seconds)
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = [
+            f"# HELP {METRIC_NAME} Time spent in each processing stage.",
+            f"# TYPE {METRIC_NAME} histogram"
+        ]
+        with self._lock:
+            items = sorted(self._histograms.items())
+        for (stage, cipher), histogram in items:
+            counts, total, count = histogram.snapshot()
+            labels = f'stage="{stage}",cipher="{cipher}"'
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{METRIC_NAME}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            lines.append(f'{METRIC_NAME}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'{METRIC_NAME}_sum{{{labels}}} {total}')
+            lines.append(f'{METRIC_NAME}_count{{{labels}}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class Span:
+    def __init__(self, stage, cipher):
+        self.stage = stage
+        self.cipher = cipher
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        registry.observe(self.stage, time.perf_counter() - self.started, self.cipher)
+
+
+def span(stage, cipher=''):
+    """Context manager timing one stage; a no-op while metrics are disabled"""
+    if not _enabled:
+        return _noop_span
+    return Span(stage, cipher)
+
+
+def observe(stage, seconds, cipher=''):
+    if _enabled:
+        registry.observe(stage, seconds, cipher)
+
+
+def stage_times():
+    """A dict for the stage_times hook of the ciphers, or None while disabled"""
+    return {} if _enabled else None
+
+
+def observe_stage_times(times, cipher):
+    """Record a batch_engine stage_times dict (nanoseconds per stage)"""
+    if _enabled and times:
+        for stage, elapsed_ns in times.items():
+            registry.observe(stage, elapsed_ns / 1e9, cipher)
+
+
+def render():
+    return registry.render()